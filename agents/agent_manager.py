@@ -1,174 +1,422 @@
 import datetime
+import heapq
 import json
-from api.api_gateway import call_gas_function, log_action
-from agents.workflow_config import workflow_steps
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from api.api_gateway import call_gas_function, log_action, GasBatch, function_supported, mark_unsupported, is_unknown_function
+from agents.executor import RowExecutor
+from agents.pipeline_runs import PipelineRun
+from agents.workflow_config import workflow_steps_with_priority, workflow_transitions, workflow_first_step
 from agents.task_map import fn_map
-from agents.queue_gas_call import queue_gas_call
+from agents.queue_gas_call import queue_gas_call, reserve_gas_slot
+from models.job_model import LysticsJob, PROCESSING_PREFIX
+from models.job_store import JOB_STORE_ENABLED, get_job_store
+from agents.leases import LeaseKeeper, get_lease_backend, row_lease, PIPELINE_LEASE, PIPELINE_LEASE_TTL, ROW_LEASE_TTL
 
-def assign_unclaimed_jobs(unassigned_rows, worker_pool, load_map, max_rows_per_worker=50):
+ERROR_COUNT_FIELD    = "Error Count"
+ROW_MAX_STEPS        = int(os.environ.get("ROW_MAX_STEPS", 20))
+ROW_TIME_BUDGET      = float(os.environ.get("ROW_TIME_BUDGET", 600))
+# A claim with no lease record may belong to an instance whose lease store this
+# one cannot see (per-host SQLite); only reset it once any holder would be done.
+UNLEASED_CLAIM_GRACE = float(os.environ.get("UNLEASED_CLAIM_GRACE", max(900, ROW_TIME_BUDGET + ROW_LEASE_TTL)))
+
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+step_priority = {
+    (workflow_type, item["step"]): PRIORITY_RANK.get(item["priority"], len(PRIORITY_RANK))
+    for workflow_type, items in workflow_steps_with_priority.items()
+    for item in items
+}
+
+_NEVER_ATTEMPTED = datetime.datetime.min
+
+def state_batch():
+    """
+    Batch for row state writes (status, assignment, error count). With the job
+    store enabled these land in local SQLite and reach the sheet on the next sync;
+    otherwise they go straight to GAS.
     """
-    Assigns jobs from a provided list of unassigned rows.
+    return get_job_store().batch() if JOB_STORE_ENABLED else GasBatch()
+
+def record_batch_errors(run, batch, context):
+    """
+    Copies a flushed batch's failed operations onto the pipeline run, so writes
+    that never reached the sheet show up in /agent/runs rather than only in logs.
+    """
+    if run is None:
+        return
+    for r in batch.errors:
+        run.record_error(f"{context}: {r['function']} failed: {r['error']}")
+
+def assignment_order(job):
+    """
+    Sort key for unclaimed jobs: higher-priority workflow steps first, then the
+    longest-waiting jobs (never attempted counts as oldest), then sheet order.
+    """
+    priority = step_priority.get((job.workflow_type, job.status), len(PRIORITY_RANK))
+    return (priority, job.last_attempted or _NEVER_ATTEMPTED, job.row_id or 0)
+
+def assign_unclaimed_jobs(unassigned_jobs, worker_pool, load_map, max_rows_per_worker=50, run=None):
+    """
+    Assigns jobs from a provided list of unassigned jobs.
+    Jobs are taken in step-priority/age order and handed to the least-loaded worker
+    (kept in a heap); all assignments are written to the sheet in one bulk call and
+    then applied to the given jobs, so no refetch is needed. If the bulk write fails
+    the rows are written one updateRowAssignments at a time, and only the
+    assignments that landed are applied; failures are recorded on `run`.
     """
     assignments = {}
-    log_action("Manager", "Assignment", f"Attempting to assign {len(unassigned_rows)} unclaimed jobs.", agent="Manager")
+    log_action("Manager", "Assignment", f"Attempting to assign {len(unassigned_jobs)} unclaimed jobs.", agent="Manager")
 
-    for row in unassigned_rows:
-        row_id = row.get("Row")
-        least_loaded_worker = sorted(worker_pool, key=lambda w: load_map.get(w, 0))[0]
+    worker_heap = [(load_map.get(w, 0), i, w) for i, w in enumerate(worker_pool)]
+    heapq.heapify(worker_heap)
+    stamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    planned = []
 
-        if load_map.get(least_loaded_worker, 0) >= max_rows_per_worker:
-            continue
+    for job in sorted(unassigned_jobs, key=assignment_order):
+        load, order, least_loaded_worker = worker_heap[0]
+        if load >= max_rows_per_worker:
+            break
 
-        job_id = f"{least_loaded_worker}-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}-{row_id}"
+        job_id = f"{least_loaded_worker}-{stamp}-{job.row_id}"
+        planned.append((job, {"row": job.row_id, "job_id": job_id, "assigned_worker": least_loaded_worker}))
+        heapq.heapreplace(worker_heap, (load + 1, order, least_loaded_worker))
 
-        try:
-            queue_gas_call(
-                "updateRowAssignments",
-                lambda _: call_gas_function("updateRowAssignments", {
-                    "row": row_id,
-                    "job_id": job_id,
-                    "assigned_worker": least_loaded_worker
-                })
-            )
-            assignments[row_id] = least_loaded_worker
-            log_action("Manager", "Assignment", f"Assigned row {row_id} to {least_loaded_worker}", agent="Manager")
-            load_map[least_loaded_worker] = load_map.get(least_loaded_worker, 0) + 1
-        except Exception as e:
-            log_action("Manager", "Error", f"Failed to assign row {row_id}: {e}", agent="Manager")
+    if not planned:
+        return assignments
 
+    written = []
+    if function_supported("updateRowAssignmentsBulk"):
+        with state_batch() as batch:
+            batch.add("updateRowAssignmentsBulk", {"assignments": [a for _, a in planned]})
+        if not batch.errors:
+            written = planned
+        else:
+            error = batch.errors[0]["error"]
+            if is_unknown_function(error):
+                mark_unsupported("updateRowAssignmentsBulk")
+            else:
+                record_batch_errors(run, batch, "Assignment")
+                log_action("Manager", "Error", f"Bulk assignment of {len(planned)} rows failed: {error}", agent="Manager")
+
+    if not written:
+        # One updateRowAssignments per row (still a single batched request); rows
+        # whose write fails stay unassigned until the next run.
+        with state_batch() as batch:
+            for _, assignment in planned:
+                batch.add("updateRowAssignments", assignment)
+        record_batch_errors(run, batch, "Assignment")
+        written = [p for p, r in zip(planned, batch.results) if r["success"]]
+
+    for job, assignment in written:
+        job.assigned_worker = assignment["assigned_worker"]
+        job.job_id = assignment["job_id"]
+        assignments[assignment["row"]] = assignment["assigned_worker"]
+        load_map[assignment["assigned_worker"]] = load_map.get(assignment["assigned_worker"], 0) + 1
+
+    if written:
+        log_action("Manager", "Assignment", f"Assigned {len(written)} rows: " +
+                   ", ".join(f"{a['row']}→{a['assigned_worker']}" for _, a in written)[:500], agent="Manager")
     return assignments
 
-def run_worker_on_assigned_jobs(worker_id, assigned_rows):
+def run_task_for_row(task_function_name, row_id, reserved=False):
     """
-    Processes a provided list of rows for a specific worker.
+    Runs a single workflow task in GAS for a row, raising if it did not succeed.
+    A rate-limit deferral is returned as-is so the row can simply be retried later.
+    `reserved` means the caller already took the rate-limit slot for this call.
     """
-    log_action(f"Worker {worker_id}", "Start Run", f"Processing {len(assigned_rows)} assigned jobs.", agent=worker_id)
-    
-    for row in assigned_rows:
-        status = row.get("Status")
-        row_id = row.get("Row")
-        task_function_name = fn_map.get(status)
+    q_result = queue_gas_call(
+        task_function_name,
+        lambda _: call_gas_function(task_function_name, {"row": row_id}),
+        force=reserved
+    )
+    if q_result.get("status") not in ("ok", "deferred"):
+        raise Exception(q_result.get("error", "Unknown error from queue"))
+    return q_result
 
-        if not task_function_name:
-            continue
+def run_worker_on_assigned_jobs(worker_id, assigned_jobs, executor=None,
+                                max_steps=ROW_MAX_STEPS, time_budget=ROW_TIME_BUDGET, run=None):
+    """
+    Processes a provided list of jobs for a specific worker, driving each row
+    through consecutive workflow steps until it completes, fails, is rate limited,
+    or uses up `max_steps` / `time_budget` seconds (the rest waits for the next run).
+    Each step is submitted to the executor as the previous one finishes, so rows
+    advance concurrently within its per-worker and per-function limits while a
+    row's own steps stay in order. Rows are claimed in one batch and each row's
+    final status is written once, when it stops; failed writes are recorded on `run`.
+    Returns one {"row", "status", "steps", "success", "deferred", "error"} outcome per
+    actionable row, where `status` is the last step attempted and `steps` the steps
+    completed. A rate-limited step is reserved before it is submitted and waits
+    for its slot without holding an executor thread; one whose slot is too far
+    off ends the row as `deferred` (not failed) until the next run.
+    """
+    # Jobs already claimed ("Processing: ...") are left to their claim holder.
+    actionable = [job for job in assigned_jobs if not job.processing and fn_map.get(job.status)]
 
-        try:
-            call_gas_function("updateRowStatus", {"row": row_id, "new_status": f"Processing: {status}"})
-            
-            q_result = queue_gas_call(
-                task_function_name,
-                lambda _: call_gas_function(task_function_name, {"row": row_id})
-            )
-
-            if q_result.get("status") != "ok":
-                 raise Exception(q_result.get("error", "Unknown error from queue"))
-
-            next_status = determine_next_status(row.get("Workflow Type"), status)
-            final_status = next_status if next_status else "Completed"
-            
-            call_gas_function("updateRowStatus", {"row": row_id, "new_status": final_status})
-            log_action(f"Row {row_id}", "Success", f"Task '{status}' completed. New status: {final_status}", agent=worker_id)
+    own_executor = executor is None
+    executor = executor or RowExecutor()
+    outcomes = []
+    try:
+        with LeaseKeeper(ROW_LEASE_TTL) as leases, state_batch() as batch:
+            log_action(f"Worker {worker_id}", "Start Run", f"Processing {len(assigned_jobs)} assigned jobs.", agent=worker_id)
 
-        except Exception as e:
-            log_action(f"Row {row_id}", "Error", f"Task '{status}' failed: {e}", agent=worker_id)
-            call_gas_function("updateRowStatus", {"row": row_id, "new_status": status})
-            incrementProgressErrorCount(row_id)
+            # Rows leased by another worker or instance are skipped rather than run twice.
+            leased = set(leases.acquire(row_lease(job.row_id) for job in actionable))
+            skipped = [job.row_id for job in actionable if row_lease(job.row_id) not in leased]
+            if skipped:
+                log_action(f"Worker {worker_id}", "Skipped", f"{len(skipped)} rows leased elsewhere: {skipped[:20]}", agent=worker_id)
+            actionable = [job for job in actionable if row_lease(job.row_id) in leased]
+
+            with state_batch() as claims:
+                for job in actionable:
+                    claims.add("updateRowStatus", {"row": job.row_id, "new_status": f"{PROCESSING_PREFIX} {job.status}"})
+
+            def submit_step(job, status, steps, started):
+                task_function_name = fn_map[status]
+                wait_for = reserve_gas_slot(task_function_name)
+                if wait_for is None:
+                    log_action(f"Row {job.row_id}", "Deferred", f"Task '{status}' rate limited; will retry next run.", agent=worker_id)
+                    finish(job, status, steps, status, deferred=True)
+                    return
+                future = executor.submit(worker_id, job.row_id, task_function_name,
+                                         run_task_for_row, task_function_name, job.row_id, True, delay=wait_for)
+                running[future] = (job, status, steps, started)
+
+            def finish(job, status, steps, new_status, success=True, error=None, deferred=False):
+                if not leases.holds(row_lease(job.row_id)):
+                    # The lease expired and was reclaimed; the row's status now belongs to someone else.
+                    success, deferred, error = False, False, "Row lease lost before its status was written"
+                else:
+                    batch.add("updateRowStatus", {"row": job.row_id, "new_status": new_status})
+                    if not success:
+                        batch.add("incrementProgressErrorCount", {"row": job.row_id})
+                        if job.error_count is not None:
+                            # Diagnostics run on these jobs; count this failure without a refetch.
+                            job.error_count += 1
+                outcomes.append({"row": job.row_id, "status": status, "steps": steps, "success": success,
+                                 "deferred": deferred, "error": error})
+
+            # future -> (job, status being run, steps completed, started)
+            running = {}
+            for job, claim in zip(actionable, claims.results):
+                if not claim["success"]:
+                    outcomes.append({"row": job.row_id, "status": job.status, "steps": [], "success": False,
+                                     "deferred": False, "error": f"Could not mark row as processing: {claim['error']}"})
+                    continue
+                submit_step(job, job.status, [], time.monotonic())
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, status, steps, started = running.pop(future)
+                    row_id = job.row_id
+                    outcome = future.result()
+
+                    if not outcome["success"]:
+                        log_action(f"Row {row_id}", "Error", f"Task '{status}' failed: {outcome['error']}", agent=worker_id)
+                        finish(job, status, steps, status, success=False, error=outcome["error"])
+                        continue
+                    if outcome["result"].get("status") == "deferred":
+                        log_action(f"Row {row_id}", "Deferred", f"Task '{status}' rate limited; will retry next run.", agent=worker_id)
+                        finish(job, status, steps, status, deferred=True)
+                        continue
+
+                    steps = steps + [status]
+                    next_status = determine_next_status(job.workflow_type, status)
+                    final_status = next_status if next_status else "Completed"
+                    log_action(f"Row {row_id}", "Success", f"Task '{status}' completed. New status: {final_status}", agent=worker_id)
 
-def run_diagnostics(all_rows):
+                    within_budget = len(steps) < max_steps and time.monotonic() - started < time_budget
+                    if next_status and fn_map.get(next_status) and within_budget and leases.holds(row_lease(row_id)):
+                        submit_step(job, next_status, steps, started)
+                    else:
+                        finish(job, status, steps, final_status)
+        record_batch_errors(run, batch, f"Worker {worker_id}")
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    return outcomes
+
+def run_diagnostics(all_jobs, run=None):
     """
-    Runs diagnostic checks on a provided list of all actionable rows.
+    Runs diagnostic checks on a provided list of all actionable jobs.
+    Claimed rows whose lease expired (the holder stopped heartbeating) are reset so
+    they run again; so are claims with no lease record at all (made before leases,
+    by an instance using another lease store, or with the store lost) once they
+    are older than UNLEASED_CLAIM_GRACE.
+    Error counts come from the row payload or one bulk fetch, and every reset
+    goes out in a single batch, so this costs O(1) GAS round trips. Each reset is
+    logged with its reason.
     """
-    log_action("Manager", "Diagnostics Start", f"Running checks on {len(all_rows)} rows.", agent="Manager")
     now = datetime.datetime.utcnow()
-    for row in all_rows:
-        row_id = row.get("Row")
-        status = row.get("Status")
-        
-        if status.startswith("Processing:"):
-            last_attempted = row.get("Last Attempted")
-            try:
-                last_dt = datetime.datetime.fromisoformat(last_attempted) if last_attempted else None
-                if last_dt and (now - last_dt).total_seconds() > 900: # 15 minutes
-                    reason = f"⚠️ Auto-escalated: Stuck for >15 mins."
-                    original_status = status.replace("Processing: ", "")
-                    call_gas_function("updateRowStatus", {"row": row_id, "new_status": original_status})
-            except (ValueError, TypeError):
-                continue
-
-        error_count = getProgressErrorCount(row_id)
-        if error_count >= 3:
-            reason = f"Task '{status}' failed {error_count} times."
-            call_gas_function("updateRowStatus", {"row": row_id, "new_status": "Supervisor"})
-
-
-def runManagerPipeline():
+    log_action("Manager", "Diagnostics Start", f"Running checks on {len(all_jobs)} rows.", agent="Manager")
+    error_counts = getProgressErrorCounts(all_jobs)
+
+    lease_backend = get_lease_backend()
+    reclaimed = dict(lease_backend.reclaim_expired(row_lease("")))
+    claimed = [job for job in all_jobs if job.processing]
+    known = lease_backend.known(row_lease(job.row_id) for job in claimed)
+    if reclaimed:
+        log_action("Manager", "Lease Reclaim", f"Reclaimed {len(reclaimed)} expired row leases: " +
+                   ", ".join(f"{name} ({holder})" for name, holder in reclaimed.items())[:500], agent="Manager")
+
+    with state_batch() as batch:
+        for job in all_jobs:
+            row_id = job.row_id
+            status = job.sheet_status
+            new_status = None
+
+            if job.processing:
+                lease = row_lease(row_id)
+                last_dt = job.last_attempted
+                if lease in reclaimed:
+                    reason = f"Claim holder {reclaimed[lease]} stopped heartbeating."
+                    new_status = job.status
+                elif lease not in known and (not last_dt or (now - last_dt).total_seconds() > UNLEASED_CLAIM_GRACE):
+                    reason = "Claimed without a lease."
+                    new_status = job.status
+
+            error_count = error_counts.get(row_id, 0)
+            if error_count >= 3:
+                reason = f"Task '{status}' failed {error_count} times."
+                new_status = "Supervisor"
+
+            if new_status:
+                batch.add("updateRowStatus", {"row": row_id, "new_status": new_status})
+                log_action(f"Row {row_id}", "Escalated" if new_status == "Supervisor" else "Claim Reset",
+                           f"{reason} New status: {new_status}", agent="Manager")
+    record_batch_errors(run, batch, "Diagnostics")
+
+
+def runManagerPipeline(run=None):
     """
     The main orchestration function. Fetches data once, then processes it.
+    Progress (step timings, rows processed, errors) is recorded on `run`.
+    Only the holder of the pipeline lease runs; a trigger that reaches another
+    gunicorn worker or instance meanwhile is marked "skipped".
     """
+    run = run or PipelineRun()
+    with LeaseKeeper(PIPELINE_LEASE_TTL) as leader:
+        if not leader.acquire([PIPELINE_LEASE]):
+            print("⏭️ Pipeline lease held elsewhere; skipping this run.")
+            log_action("Manager", "Pipeline Skipped", "Another instance holds the pipeline lease.", agent="Manager")
+            run.status = "skipped"
+            return
+        _run_pipeline(run)
+
+
+def _run_pipeline(run):
     print("🟢 Manager pipeline started.")
     log_action("Manager", "Pipeline Start", "Fetching all actionable rows.", agent="Manager")
-    
-    try:
-        result = call_gas_function("getRowsNeedingProcessing", {})
-        print("📦 GAS result object:", json.dumps(result, indent=2))  # DEBUG
 
-        rows = result.get("rows", []) if isinstance(result, dict) else []
-        print(f"✅ Parsed {len(rows)} rows from GAS.")  # DEBUG
+    try:
+        if JOB_STORE_ENABLED:
+            store = get_job_store()
+            with run.step("fetch"):
+                synced = store.sync()
+            if not synced:
+                # Running on the stale mirror could redo rows another process already moved on.
+                print("⏭️ Job store sync lock busy; skipping this run.")
+                log_action("Manager", "Pipeline Skipped", "Could not sync the job store; another sync holds the lock.", agent="Manager")
+                run.record_error("Job store sync lock busy; run skipped.")
+                run.status = "skipped"
+                return
+            all_jobs = store.load_jobs()
+            log_action("Manager", "Data Received", f"Loaded {len(all_jobs)} jobs from the job store.", agent="Manager")
+        else:
+            with run.step("fetch"):
+                result = call_gas_function("getRowsNeedingProcessing", {})
+            rows = result.get("rows", []) if isinstance(result, dict) else []
+            print(f"✅ Parsed {len(rows)} rows from GAS.")  # DEBUG
 
-        log_action("Manager", "Data Received", f"Received {len(rows)} rows from GAS.", agent="Manager")
-        if rows:
-            log_action("Manager", "Data Sample", json.dumps(rows[0], indent=2), agent="Manager")
+            log_action("Manager", "Data Received", f"Received {len(rows)} rows from GAS.", agent="Manager")
+            if rows:
+                log_action("Manager", "Data Sample", json.dumps(rows[0])[:500], agent="Manager")
 
-        all_rows = rows
-        if not all_rows:
+            all_jobs = [LysticsJob.from_row(row, ERROR_COUNT_FIELD) for row in rows]
+        run.rows_total = len(all_jobs)
+        if not all_jobs:
             log_action("Manager", "Pipeline Info", "No actionable rows found in the sheet.", agent="Manager")
             return
     except Exception as e:
         print(f"❌ Exception during GAS fetch: {e}")
         log_action("Manager", "Pipeline Error", f"Could not fetch rows: {e}", agent="Manager")
+        run.fail(f"Could not fetch rows: {e}")
         return
 
     worker_pool = ["worker1", "worker2"]
-    unassigned_rows = [r for r in all_rows if not r.get("Assigned Worker", "").strip()]
-    
+    unassigned_jobs = [job for job in all_jobs if not job.assigned_worker]
+
     load_map = {}
-    for r in all_rows:
-        worker = r.get("Assigned Worker", "").strip()
-        if worker:
-            load_map[worker] = load_map.get(worker, 0) + 1
-
-    assign_unclaimed_jobs(unassigned_rows, worker_pool, load_map)
-    
-    # We must refetch data after assignments to ensure workers get the new jobs
-    try:
-        result = call_gas_function("getRowsNeedingProcessing", {})
-        all_rows_after_assign = result.get("rows", []) if isinstance(result, dict) else []
-        print(f"🔄 Refetched {len(all_rows_after_assign)} rows after assignment.")  # DEBUG
-    except Exception as e:
-        print(f"❌ Exception during GAS refetch: {e}")
-        log_action("Manager", "Pipeline Error", f"Could not refetch rows after assignment: {e}", agent="Manager")
-        return
+    for job in all_jobs:
+        if job.assigned_worker:
+            load_map[job.assigned_worker] = load_map.get(job.assigned_worker, 0) + 1
+
+    with run.step("assign"):
+        assign_unclaimed_jobs(unassigned_jobs, worker_pool, load_map, run=run)
 
-    for worker_id in worker_pool:
-        jobs_for_worker = [r for r in all_rows_after_assign if r.get("Assigned Worker") == worker_id]
-        if jobs_for_worker:
-            print(f"🚀 Running {len(jobs_for_worker)} jobs for {worker_id}")  # DEBUG
-            run_worker_on_assigned_jobs(worker_id, jobs_for_worker)
+    # Assignments are applied to all_jobs in place, so workers see them without a refetch.
+    jobs_by_worker = {}
+    for job in all_jobs:
+        if job.assigned_worker in worker_pool:
+            jobs_by_worker.setdefault(job.assigned_worker, []).append(job)
+    for worker_id, jobs_for_worker in jobs_by_worker.items():
+        print(f"🚀 Running {len(jobs_for_worker)} jobs for {worker_id}")  # DEBUG
 
-    run_diagnostics(all_rows_after_assign)
+    # Workers share one row executor and run side by side; a failing worker
+    # is logged without stopping the others.
+    if jobs_by_worker:
+        with run.step("workers"), RowExecutor() as executor, \
+                ThreadPoolExecutor(max_workers=len(jobs_by_worker)) as worker_threads:
+            runs = {
+                worker_threads.submit(run_worker_on_assigned_jobs, worker_id, jobs, executor, run=run): worker_id
+                for worker_id, jobs in jobs_by_worker.items()
+            }
+            for worker_run, worker_id in runs.items():
+                try:
+                    outcomes = worker_run.result()
+                except Exception as e:
+                    log_action("Manager", "Worker Error", f"{worker_id} run failed: {e}", agent="Manager")
+                    run.record_error(f"{worker_id} run failed: {e}")
+                    continue
+                failed = [o for o in outcomes if not o["success"]]
+                # A row deferred before its first step was not processed this run.
+                deferred = [o for o in outcomes if o["deferred"]]
+                run.add_rows(processed=sum(1 for o in outcomes if o["steps"] or not o["deferred"]),
+                             failed=len(failed), deferred=len(deferred),
+                             tasks=sum(len(o["steps"]) for o in outcomes))
+                for o in failed:
+                    run.record_error(f"Row {o['row']} '{o['status']}': {o['error']}")
+
+    if JOB_STORE_ENABLED:
+        # Get this run's outcomes (and error increments) into the sheet before
+        # diagnostics reads any counts from it, then push whatever diagnostics reset.
+        with run.step("sync"):
+            get_job_store().push()
+
+    with run.step("diagnostics"):
+        run_diagnostics(all_jobs, run=run)
+
+    if JOB_STORE_ENABLED:
+        with run.step("sync"):
+            get_job_store().push()
 
     print("✅ Manager pipeline complete.")
     log_action("Manager", "Pipeline Complete", "Full processing cycle finished.", agent="Manager")
 
 
 def determine_next_status(workflow_type, current_status):
-    steps = workflow_steps.get(workflow_type, [])
+    """
+    Next workflow step after current_status (None after the last step), from the
+    compiled transition table. Unknown steps restart at the workflow's first step.
+    """
+    if current_status.startswith(PROCESSING_PREFIX):
+        current_status = current_status[len(PROCESSING_PREFIX):].strip()
     try:
-        clean_status = current_status.replace("Processing: ", "")
-        current_index = steps.index(clean_status)
-        return steps[current_index + 1] if current_index + 1 < len(steps) else None
-    except (ValueError, IndexError):
-        return steps[0] if steps else None
+        return workflow_transitions[(workflow_type, current_status)]
+    except KeyError:
+        return workflow_first_step.get(workflow_type)
 
 def incrementProgressErrorCount(row_number):
     call_gas_function("incrementProgressErrorCount", {"row": row_number})
@@ -178,3 +426,32 @@ def getProgressErrorCount(row_number):
         return call_gas_function("getProgressErrorCount", {"row": row_number}).get("count", 0)
     except Exception:
         return 0
+
+def getProgressErrorCounts(jobs):
+    """
+    Returns {row_number: error_count} for the given jobs. Counts already present in
+    the row payload (plus this run's failures) are used as-is; the rest are read
+    with one bulk GAS call, or one call per row where the bulk function is missing.
+    """
+    counts = {}
+    missing = []
+    for job in jobs:
+        if job.error_count is not None:
+            counts[job.row_id] = job.error_count
+        else:
+            missing.append(job.row_id)
+
+    if missing and function_supported("getProgressErrorCounts"):
+        try:
+            fetched = call_gas_function("getProgressErrorCounts", {"rows": missing}).get("counts", {})
+            for row_number in missing:
+                counts[row_number] = int(fetched.get(str(row_number), fetched.get(row_number, 0)) or 0)
+            return counts
+        except Exception as e:
+            if not is_unknown_function(e):
+                print(f"⚠️ Bulk error-count fetch failed: {e}")
+                return counts
+            mark_unsupported("getProgressErrorCounts")
+    for row_number in missing:
+        counts[row_number] = getProgressErrorCount(row_number)
+    return counts
@@ -0,0 +1,115 @@
+import collections
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from agents.workflow_config import worker_concurrency, function_concurrency
+
+PIPELINE_MAX_THREADS = int(os.environ.get("PIPELINE_MAX_THREADS", 8))
+
+
+class RowExecutor:
+    """
+    Runs row tasks on a shared thread pool.
+
+    Concurrency is capped per worker label and per GAS function, and tasks
+    submitted for the same row always run one after another in submission order.
+    A failing task is recorded in its result; it never aborts the other rows.
+    Delayed tasks (e.g. waiting for a rate-limit slot) hold no thread or slot
+    until their delay has passed.
+    """
+    def __init__(self, max_threads=PIPELINE_MAX_THREADS, worker_limits=None, function_limits=None):
+        self.worker_limits = worker_limits or worker_concurrency
+        self.function_limits = function_limits or function_concurrency
+        self._pool = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="row-exec")
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._lanes = {}
+        self._delayed = {}  # future -> timer
+
+    def _semaphore(self, kind, key, limits):
+        with self._lock:
+            if (kind, key) not in self._semaphores:
+                self._semaphores[(kind, key)] = threading.BoundedSemaphore(limits.get(key, limits.get("default", 1)))
+            return self._semaphores[(kind, key)]
+
+    def submit(self, worker_id, row_id, function_name, fn, *args, delay=0, **kwargs):
+        """
+        Schedules fn(*args, **kwargs) for a row and returns a Future resolving to
+        {"worker", "row", "function", "success", "result", "error", "elapsed"}.
+        With `delay`, the task joins the row's lane only after that many seconds.
+        """
+        future = Future()
+        task = (worker_id, row_id, function_name, fn, args, kwargs, future)
+        if delay > 0:
+            timer = threading.Timer(delay, self._release, args=(task,))
+            timer.daemon = True
+            with self._lock:
+                self._delayed[future] = timer
+            timer.start()
+            return future
+        self._enqueue(task)
+        return future
+
+    def _release(self, task):
+        with self._lock:
+            if self._delayed.pop(task[-1], None) is None:
+                return  # cancelled by shutdown
+        self._enqueue(task)
+
+    def _enqueue(self, task):
+        row_id = task[1]
+        with self._lock:
+            lane = self._lanes.get(row_id)
+            if lane is not None:
+                lane.append(task)
+                return
+            self._lanes[row_id] = collections.deque([task])
+        self._pool.submit(self._drain_lane, row_id)
+
+    def _drain_lane(self, row_id):
+        while True:
+            with self._lock:
+                lane = self._lanes[row_id]
+                if not lane:
+                    del self._lanes[row_id]
+                    return
+                task = lane.popleft()
+            self._execute(*task)
+
+    @staticmethod
+    def _outcome(worker_id, row_id, function_name):
+        return {"worker": worker_id, "row": row_id, "function": function_name,
+                "success": False, "result": None, "error": None, "elapsed": 0.0}
+
+    def _execute(self, worker_id, row_id, function_name, fn, args, kwargs, future):
+        outcome = self._outcome(worker_id, row_id, function_name)
+        worker_slot = self._semaphore("worker", worker_id, self.worker_limits)
+        function_slot = self._semaphore("function", function_name, self.function_limits)
+        with worker_slot, function_slot:
+            started = time.monotonic()
+            try:
+                outcome["result"] = fn(*args, **kwargs)
+                outcome["success"] = True
+            except Exception as e:
+                outcome["error"] = str(e)
+            outcome["elapsed"] = time.monotonic() - started
+        future.set_result(outcome)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            delayed, self._delayed = self._delayed, {}
+        for future, timer in delayed.items():
+            timer.cancel()
+            worker_id, row_id, function_name = timer.args[0][:3]
+            outcome = self._outcome(worker_id, row_id, function_name)
+            outcome["error"] = "Executor shut down before the task started"
+            future.set_result(outcome)
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+        return False
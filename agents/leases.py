@@ -0,0 +1,405 @@
+"""
+Expiring leases shared between gunicorn workers and instances.
+
+A lease is a named lock with a holder and an expiry. Holders keep their leases
+alive with heartbeats; a holder that crashes stops renewing and its leases expire,
+at which point the work they covered can be reclaimed. Used for the single-leader
+pipeline lease and for per-row claims.
+
+Releasing a lease leaves a tombstone (no holder) so a cleanly finished claim can be
+told apart from one whose holder died.
+
+The SQLite backend is shared by the processes on one host only. With more than
+one instance (e.g. Cloud Run scaling out), set LEASE_REDIS_URL so every instance
+uses the Redis backend instead.
+"""
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+LEASE_REDIS_URL     = os.environ.get("LEASE_REDIS_URL", "")
+LEASE_REDIS_KEY     = os.environ.get("LEASE_REDIS_KEY", "lystics:leases")
+LEASE_BACKEND       = os.environ.get("LEASE_BACKEND", "redis" if LEASE_REDIS_URL else "sqlite")  # "redis", "sqlite" or "memory"
+LEASE_DB            = os.environ.get("LEASE_DB", os.path.join(tempfile.gettempdir(), "lystics-leases.db"))
+PIPELINE_LEASE_TTL  = float(os.environ.get("PIPELINE_LEASE_TTL", 60))
+ROW_LEASE_TTL       = float(os.environ.get("ROW_LEASE_TTL", 120))
+LEASE_TOMBSTONE_TTL = float(os.environ.get("LEASE_TOMBSTONE_TTL", 86400))
+
+PIPELINE_LEASE = "pipeline:manager"
+
+
+def row_lease(row_id):
+    return f"row:{row_id}"
+
+
+def new_holder_id():
+    """
+    Identifies one lease holder: host, process and a random suffix per run.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class MemoryLeaseBackend:
+    """
+    Leases held in this process only. Enough for tests and single-process runs.
+    """
+    def __init__(self):
+        self._leases = {}  # name -> (holder, expires)
+        self._lock = threading.Lock()
+
+    def acquire(self, names, holder, ttl):
+        with self._lock:
+            now = time.time()
+            acquired = []
+            for name in names:
+                current, expires = self._leases.get(name, (None, 0))
+                if current is None or current == holder or expires <= now:
+                    self._leases[name] = (holder, now + ttl)
+                    acquired.append(name)
+            return acquired
+
+    def renew(self, names, holder, ttl):
+        with self._lock:
+            now = time.time()
+            renewed = []
+            for name in names:
+                current, expires = self._leases.get(name, (None, 0))
+                if current == holder and expires > now:
+                    self._leases[name] = (holder, now + ttl)
+                    renewed.append(name)
+            return renewed
+
+    def release(self, names, holder):
+        with self._lock:
+            now = time.time()
+            for name in names:
+                if self._leases.get(name, (None, 0))[0] == holder:
+                    self._leases[name] = (None, now)
+
+    def reclaim_expired(self, prefix):
+        with self._lock:
+            now = time.time()
+            reclaimed = []
+            for name, (holder, expires) in list(self._leases.items()):
+                if not name.startswith(prefix):
+                    continue
+                if holder is not None and expires <= now:
+                    reclaimed.append((name, holder))
+                    self._leases[name] = (None, now)
+                elif holder is None and expires <= now - LEASE_TOMBSTONE_TTL:
+                    del self._leases[name]
+            return reclaimed
+
+    def known(self, names):
+        with self._lock:
+            return {name for name in names if name in self._leases}
+
+    def list(self, prefix=""):
+        with self._lock:
+            return [{"name": name, "holder": holder, "expires": expires}
+                    for name, (holder, expires) in sorted(self._leases.items())
+                    if name.startswith(prefix) and holder is not None]
+
+
+class SqliteLeaseBackend:
+    """
+    Leases kept in a SQLite file, shared by every process on the host.
+    Each operation is one IMMEDIATE transaction.
+    """
+    def __init__(self, path=LEASE_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY, holder TEXT, expires REAL NOT NULL)""")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, time.time())
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self, names, holder, ttl):
+        def run(conn, now):
+            acquired = []
+            for name in names:
+                changed = conn.execute(
+                    "INSERT INTO leases (name, holder, expires) VALUES (?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires = excluded.expires "
+                    "WHERE leases.holder IS NULL OR leases.holder = excluded.holder OR leases.expires <= ?",
+                    (name, holder, now + ttl, now)
+                ).rowcount
+                if changed:
+                    acquired.append(name)
+            return acquired
+        return self._transaction(run)
+
+    def renew(self, names, holder, ttl):
+        def run(conn, now):
+            return [name for name in names if conn.execute(
+                "UPDATE leases SET expires = ? WHERE name = ? AND holder = ? AND expires > ?",
+                (now + ttl, name, holder, now)
+            ).rowcount]
+        return self._transaction(run)
+
+    def release(self, names, holder):
+        def run(conn, now):
+            conn.executemany("UPDATE leases SET holder = NULL, expires = ? WHERE name = ? AND holder = ?",
+                             [(now, name, holder) for name in names])
+        self._transaction(run)
+
+    def reclaim_expired(self, prefix):
+        def run(conn, now):
+            expired = conn.execute(
+                "SELECT name, holder FROM leases WHERE name LIKE ? AND holder IS NOT NULL AND expires <= ?",
+                (prefix + "%", now)
+            ).fetchall()
+            conn.executemany("UPDATE leases SET holder = NULL, expires = ? WHERE name = ? AND holder = ?",
+                             [(now, name, holder) for name, holder in expired])
+            conn.execute("DELETE FROM leases WHERE name LIKE ? AND holder IS NULL AND expires <= ?",
+                         (prefix + "%", now - LEASE_TOMBSTONE_TTL))
+            return expired
+        return self._transaction(run)
+
+    def known(self, names):
+        conn = self._conn()
+        known = set()
+        names = list(names)
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            known.update(r[0] for r in conn.execute(
+                f"SELECT name FROM leases WHERE name IN ({','.join('?' * len(chunk))})", chunk))
+        return known
+
+    def list(self, prefix=""):
+        return [{"name": name, "holder": holder, "expires": expires} for name, holder, expires in self._conn().execute(
+            "SELECT name, holder, expires FROM leases WHERE name LIKE ? AND holder IS NOT NULL ORDER BY name",
+            (prefix + "%",))]
+
+
+# Every lease is one field of a Redis hash, "<holder>|<expires>" with an empty
+# holder for tombstones. Scripts run atomically and read the clock from the Redis
+# server (TIME), so instances with skewed clocks still agree on expiry.
+_REDIS_NOW = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local function parse(value)
+    local holder, expires = string.match(value, '^(.*)|([^|]*)$')
+    return holder, tonumber(expires)
+end
+local function stamp(holder, expires)
+    return holder .. '|' .. string.format('%.6f', expires)
+end
+"""
+
+_REDIS_ACQUIRE = _REDIS_NOW + """
+local acquired = {}
+for i = 3, #ARGV do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    local free = true
+    if current then
+        local holder, expires = parse(current)
+        free = holder == '' or holder == ARGV[1] or expires <= now
+    end
+    if free then
+        redis.call('HSET', KEYS[1], ARGV[i], stamp(ARGV[1], now + tonumber(ARGV[2])))
+        table.insert(acquired, ARGV[i])
+    end
+end
+return acquired
+"""
+
+_REDIS_RENEW = _REDIS_NOW + """
+local renewed = {}
+for i = 3, #ARGV do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if current then
+        local holder, expires = parse(current)
+        if holder == ARGV[1] and expires > now then
+            redis.call('HSET', KEYS[1], ARGV[i], stamp(ARGV[1], now + tonumber(ARGV[2])))
+            table.insert(renewed, ARGV[i])
+        end
+    end
+end
+return renewed
+"""
+
+_REDIS_RELEASE = _REDIS_NOW + """
+for i = 2, #ARGV do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if current and parse(current) == ARGV[1] then
+        redis.call('HSET', KEYS[1], ARGV[i], stamp('', now))
+    end
+end
+return 0
+"""
+
+_REDIS_RECLAIM = _REDIS_NOW + """
+local reclaimed = {}
+local entries = redis.call('HGETALL', KEYS[1])
+for i = 1, #entries, 2 do
+    local name = entries[i]
+    if string.sub(name, 1, #ARGV[1]) == ARGV[1] then
+        local holder, expires = parse(entries[i + 1])
+        if holder ~= '' and expires <= now then
+            redis.call('HSET', KEYS[1], name, stamp('', now))
+            table.insert(reclaimed, {name, holder})
+        elseif holder == '' and expires <= now - tonumber(ARGV[2]) then
+            redis.call('HDEL', KEYS[1], name)
+        end
+    end
+end
+return reclaimed
+"""
+
+
+class RedisLeaseBackend:
+    """
+    Leases kept in Redis, shared by every process on every instance.
+    Each operation is one Lua script, so it is atomic across instances.
+    """
+    def __init__(self, url=LEASE_REDIS_URL, key=LEASE_REDIS_KEY, client=None):
+        if client is None:
+            import redis  # only needed when this backend is selected
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.key = key
+        self._client = client
+        self._acquire = client.register_script(_REDIS_ACQUIRE)
+        self._renew = client.register_script(_REDIS_RENEW)
+        self._release = client.register_script(_REDIS_RELEASE)
+        self._reclaim = client.register_script(_REDIS_RECLAIM)
+
+    def acquire(self, names, holder, ttl):
+        names = list(names)
+        return list(self._acquire(keys=[self.key], args=[holder, ttl, *names])) if names else []
+
+    def renew(self, names, holder, ttl):
+        names = list(names)
+        return list(self._renew(keys=[self.key], args=[holder, ttl, *names])) if names else []
+
+    def release(self, names, holder):
+        names = list(names)
+        if names:
+            self._release(keys=[self.key], args=[holder, *names])
+
+    def reclaim_expired(self, prefix):
+        return [(name, holder) for name, holder in self._reclaim(keys=[self.key], args=[prefix, LEASE_TOMBSTONE_TTL])]
+
+    def known(self, names):
+        names = list(names)
+        known = set()
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            known.update(name for name, value in zip(chunk, self._client.hmget(self.key, chunk)) if value is not None)
+        return known
+
+    def list(self, prefix=""):
+        leases = []
+        for name, value in sorted(self._client.hgetall(self.key).items()):
+            holder, _, expires = value.rpartition("|")
+            if name.startswith(prefix) and holder:
+                leases.append({"name": name, "holder": holder, "expires": float(expires)})
+        return leases
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_lease_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if LEASE_BACKEND == "redis":
+                _backend = RedisLeaseBackend()
+            elif LEASE_BACKEND == "sqlite":
+                _backend = SqliteLeaseBackend()
+            else:
+                _backend = MemoryLeaseBackend()
+        return _backend
+
+
+class LeaseKeeper:
+    """
+    Holds a set of leases for one holder and renews them from a heartbeat thread
+    every ttl/3 seconds. Leases that fail to renew (expired and taken over) are
+    dropped from `held`; callers check holds() before doing more work under one.
+    """
+    def __init__(self, ttl, holder=None, backend=None):
+        self.ttl = ttl
+        self.holder = holder or new_holder_id()
+        self.backend = backend or get_lease_backend()
+        self.held = set()
+        self.lost = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self, names):
+        """
+        Acquires whichever of `names` are free and returns them.
+        """
+        acquired = self.backend.acquire(list(names), self.holder, self.ttl)
+        with self._lock:
+            self.held.update(acquired)
+        if acquired and self._thread is None:
+            self._thread = threading.Thread(target=self._heartbeat, name="lease-heartbeat", daemon=True)
+            self._thread.start()
+        return acquired
+
+    def holds(self, name):
+        with self._lock:
+            return name in self.held
+
+    def release(self, names=None):
+        with self._lock:
+            names = list(self.held if names is None else set(names) & self.held)
+            self.held.difference_update(names)
+        if names:
+            self.backend.release(names, self.holder)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.ttl / 3):
+            with self._lock:
+                names = list(self.held)
+            if not names:
+                continue
+            try:
+                renewed = set(self.backend.renew(names, self.holder, self.ttl))
+            except Exception as e:
+                print(f"⚠️ Lease heartbeat failed: {e}")
+                continue
+            lost = set(names) - renewed
+            if lost:
+                print(f"⚠️ Lost {len(lost)} lease(s): {sorted(lost)[:5]}")
+                with self._lock:
+                    self.held.difference_update(lost)
+                    self.lost.update(lost)
+
+    def close(self):
+        self._stop.set()
+        self.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
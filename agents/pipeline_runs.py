@@ -0,0 +1,299 @@
+import collections
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from api.metrics import metrics
+from agents.leases import LEASE_DB
+
+MAX_RUN_HISTORY     = 50
+RUN_STORE_BACKEND   = os.environ.get("RUN_STORE_BACKEND", "sqlite")  # "sqlite" or "memory"
+RUN_STORE_DB        = os.environ.get("RUN_STORE_DB", LEASE_DB)
+RUN_SAVE_INTERVAL   = float(os.environ.get("RUN_SAVE_INTERVAL", 2))
+RUN_STALE_SECONDS   = float(os.environ.get("RUN_STALE_SECONDS", 30))
+ACTIVE_STATUSES     = ("queued", "running")
+
+
+class PipelineRun:
+    """
+    Progress record for one manager pipeline run: status, per-step timings,
+    rows processed and errors. Safe to update from the row executor threads.
+    """
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self.status = "queued"
+        self.created_at = datetime.datetime.utcnow().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.triggers = 1
+        self.rows_total = 0
+        self.rows_processed = 0
+        self.rows_failed = 0
+        self.rows_deferred = 0
+        self.tasks_completed = 0
+        self.steps = {}
+        self.errors = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            metrics.observe("pipeline_phase_duration_seconds", elapsed, phase=name)
+            with self._lock:
+                self.steps[name] = round(self.steps.get(name, 0) + elapsed, 3)
+
+    def add_rows(self, processed=0, failed=0, deferred=0, tasks=0):
+        with self._lock:
+            self.rows_processed += processed
+            self.rows_failed += failed
+            self.rows_deferred += deferred
+            self.tasks_completed += tasks
+
+    def record_error(self, message):
+        with self._lock:
+            self.errors.append({"at": datetime.datetime.utcnow().isoformat(), "error": message})
+
+    def fail(self, message):
+        self.record_error(message)
+        with self._lock:
+            self.status = "failed"
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "run_id":         self.id,
+                "status":         self.status,
+                "created_at":     self.created_at,
+                "started_at":     self.started_at,
+                "finished_at":    self.finished_at,
+                "triggers":       self.triggers,
+                "rows_total":     self.rows_total,
+                "rows_processed": self.rows_processed,
+                "rows_failed":    self.rows_failed,
+                "rows_deferred":  self.rows_deferred,
+                "tasks_completed": self.tasks_completed,
+                "steps":          dict(self.steps),
+                "errors":         list(self.errors),
+            }
+
+
+class MemoryRunStore:
+    """
+    Runs held in this process only. Fine for a single gunicorn worker.
+    """
+    def __init__(self, history=MAX_RUN_HISTORY, stale_seconds=RUN_STALE_SECONDS):
+        self.history = history
+        self.stale_seconds = stale_seconds
+        self._runs = collections.OrderedDict()  # run_id -> [data, status, triggers, updated]
+        self._lock = threading.Lock()
+
+    def trigger(self, data):
+        with self._lock:
+            now = time.time()
+            for entry in reversed(self._runs.values()):
+                if _is_live(entry[1], entry[3], now, self.stale_seconds):
+                    entry[2] += 1
+                    return _run_dict(*entry, now, self.stale_seconds), True
+            self._runs[data["run_id"]] = [dict(data), data["status"], 1, now]
+            while len(self._runs) > self.history:
+                self._runs.popitem(last=False)
+            return _run_dict(*self._runs[data["run_id"]], now, self.stale_seconds), False
+
+    def save(self, data):
+        with self._lock:
+            entry = self._runs.get(data["run_id"])
+            if entry is not None:
+                entry[0], entry[1], entry[3] = dict(data), data["status"], time.time()
+
+    def get(self, run_id):
+        with self._lock:
+            entry = self._runs.get(run_id)
+            return _run_dict(*entry, time.time(), self.stale_seconds) if entry else None
+
+    def list(self):
+        with self._lock:
+            now = time.time()
+            return [_run_dict(*entry, now, self.stale_seconds) for entry in reversed(self._runs.values())]
+
+
+class SqliteRunStore:
+    """
+    Runs kept in a SQLite file (the lease database by default), so every gunicorn
+    worker on the host sees the same runs and a trigger that lands on another
+    worker joins the active run. Each trigger is one IMMEDIATE transaction.
+    """
+    def __init__(self, path=RUN_STORE_DB, history=MAX_RUN_HISTORY, stale_seconds=RUN_STALE_SECONDS):
+        self.path = path
+        self.history = history
+        self.stale_seconds = stale_seconds
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS pipeline_runs (
+                run_id TEXT PRIMARY KEY, data TEXT NOT NULL, status TEXT NOT NULL,
+                triggers INTEGER NOT NULL, updated REAL NOT NULL)""")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def trigger(self, data):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            for row in conn.execute("SELECT data, status, triggers, updated FROM pipeline_runs "
+                                    "WHERE status IN ('queued', 'running') ORDER BY rowid DESC").fetchall():
+                if _is_live(row[1], row[3], now, self.stale_seconds):
+                    run_id = json.loads(row[0])["run_id"]
+                    conn.execute("UPDATE pipeline_runs SET triggers = triggers + 1 WHERE run_id = ?", (run_id,))
+                    conn.execute("COMMIT")
+                    return _run_dict(json.loads(row[0]), row[1], row[2] + 1, row[3], now, self.stale_seconds), True
+
+            conn.execute("INSERT INTO pipeline_runs (run_id, data, status, triggers, updated) VALUES (?, ?, ?, 1, ?)",
+                         (data["run_id"], json.dumps(data), data["status"], now))
+            conn.execute("DELETE FROM pipeline_runs WHERE rowid NOT IN "
+                         "(SELECT rowid FROM pipeline_runs ORDER BY rowid DESC LIMIT ?)", (self.history,))
+            conn.execute("COMMIT")
+            return _run_dict(data, data["status"], 1, now, now, self.stale_seconds), False
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def save(self, data):
+        self._conn().execute("UPDATE pipeline_runs SET data = ?, status = ?, updated = ? WHERE run_id = ?",
+                             (json.dumps(data), data["status"], time.time(), data["run_id"]))
+
+    def get(self, run_id):
+        row = self._conn().execute("SELECT data, status, triggers, updated FROM pipeline_runs WHERE run_id = ?",
+                                   (run_id,)).fetchone()
+        return _run_dict(json.loads(row[0]), *row[1:], time.time(), self.stale_seconds) if row else None
+
+    def list(self):
+        now = time.time()
+        return [_run_dict(json.loads(data), status, triggers, updated, now, self.stale_seconds)
+                for data, status, triggers, updated in self._conn().execute(
+                    "SELECT data, status, triggers, updated FROM pipeline_runs ORDER BY rowid DESC")]
+
+
+def _is_live(status, updated, now, stale_seconds):
+    return status in ACTIVE_STATUSES and now - updated < stale_seconds
+
+
+def _run_dict(data, status, triggers, updated, now, stale_seconds):
+    """
+    A stored run as reported by the endpoints. The triggers count lives outside the
+    snapshot (other workers bump it); a queued or running run whose owner stopped
+    saving it is reported as "abandoned".
+    """
+    if status in ACTIVE_STATUSES and now - updated >= stale_seconds:
+        status = "abandoned"
+    return {**data, "status": status, "triggers": triggers}
+
+
+class PipelineRunner:
+    """
+    Executes pipeline runs on a background thread, keeping their progress in a
+    run store shared by every worker process on the host. Triggering while a
+    run is queued or running (in any worker) returns that run instead of
+    starting another one. The owning worker saves the run every
+    `save_interval` seconds while it executes.
+    """
+    def __init__(self, target, store=None, save_interval=RUN_SAVE_INTERVAL):
+        self.target = target
+        self.store = store or get_run_store()
+        self.save_interval = save_interval
+
+    def trigger(self):
+        """
+        Returns (run, coalesced), with `run` as reported by get().
+        """
+        run = PipelineRun()
+        current, coalesced = self.store.trigger(run.to_dict())
+        if not coalesced:
+            threading.Thread(target=self._execute, args=(run,), name=f"pipeline-{run.id}", daemon=True).start()
+        return current, coalesced
+
+    def _execute(self, run):
+        run.started_at = datetime.datetime.utcnow().isoformat()
+        run.status = "running"
+        self.store.save(run.to_dict())
+        stop = threading.Event()
+        saver = threading.Thread(target=self._save_until, args=(run, stop), name=f"pipeline-save-{run.id}", daemon=True)
+        saver.start()
+        try:
+            self.target(run)
+            if run.status == "running":
+                run.status = "completed"
+        except Exception as e:
+            print(f"🚨 Pipeline run {run.id} crashed: {e}")
+            traceback.print_exc()
+            run.fail(str(e))
+        finally:
+            run.finished_at = datetime.datetime.utcnow().isoformat()
+            metrics.inc("pipeline_runs_total", status=run.status)
+            stop.set()
+            saver.join()
+            self.store.save(run.to_dict())
+
+    def _save_until(self, run, stop):
+        while not stop.wait(self.save_interval):
+            try:
+                self.store.save(run.to_dict())
+            except Exception as e:
+                print(f"⚠️ Failed to save pipeline run {run.id}: {e}")
+
+    def get(self, run_id):
+        return self.store.get(run_id)
+
+    def list(self):
+        return self.store.list()
+
+    @property
+    def active(self):
+        return next((run for run in self.store.list() if run["status"] in ACTIVE_STATUSES), None)
+
+
+_run_store = None
+_run_store_lock = threading.Lock()
+
+
+def get_run_store():
+    global _run_store
+    with _run_store_lock:
+        if _run_store is None:
+            if RUN_STORE_BACKEND == "sqlite":
+                try:
+                    _run_store = SqliteRunStore()
+                    _run_store._conn()
+                except sqlite3.Error as e:
+                    print(f"⚠️ SQLite run store unavailable ({e}), keeping runs in memory.")
+                    _run_store = MemoryRunStore()
+            else:
+                _run_store = MemoryRunStore()
+        return _run_store
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_pipeline_runner():
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            from agents.agent_manager import runManagerPipeline
+            _runner = PipelineRunner(runManagerPipeline)
+        return _runner
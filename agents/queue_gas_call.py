@@ -1,20 +1,206 @@
+import json
+import math
+import os
+import sqlite3
+import tempfile
+import threading
 import time
+from agents.workflow_config import gas_rate_limits
 
-_last_call_time = {}
+RATE_LIMIT_BACKEND  = os.environ.get("RATE_LIMIT_BACKEND", "sqlite")  # "sqlite" or "memory"
+RATE_LIMIT_DB       = os.environ.get("RATE_LIMIT_DB", os.path.join(tempfile.gettempdir(), "lystics-rate-limits.db"))
+RATE_LIMIT_MAX_WAIT = float(os.environ.get("RATE_LIMIT_MAX_WAIT", 120))
 
-def queue_gas_call(function_name, call_fn, cooldown_seconds=20, force=False):
-    now = time.time()
-    last_called = _last_call_time.get(function_name, 0)
 
-    if not force and (now - last_called < cooldown_seconds):
-        print(f"⏳ Skipping {function_name}, cooldown active.")
-        return {"status": "skipped", "reason": "cooldown"}
+def get_rate_limit(function_name):
+    limits = dict(gas_rate_limits)
+    limits.update(json.loads(os.environ.get("GAS_RATE_LIMITS", "{}")))
+    limit = limits.get(function_name, limits["default"])
+    return float(limit["rate"]), float(limit["burst"])
 
-    print(f"🚀 Triggering {function_name} (last called {int(now - last_called)}s ago)")
-    _last_call_time[function_name] = now
+
+class MemoryBucketBackend:
+    """
+    Token buckets held in this process only. Fine for a single gunicorn worker.
+    """
+    def __init__(self):
+        self._buckets = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, key, rate, burst, max_wait):
+        with self._lock:
+            now = time.time()
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate) - 1
+            wait = 0.0 if tokens >= 0 else -tokens / rate
+            if wait > max_wait:
+                _record(self._stats.setdefault(key, _empty_stats()), None)
+                return None
+            self._buckets[key] = (tokens, now)
+            _record(self._stats.setdefault(key, _empty_stats()), wait)
+            return wait
+
+    def stats(self, limits):
+        with self._lock:
+            now = time.time()
+            return {
+                key: _with_queue(dict(stats), self._buckets.get(key), limits(key), now)
+                for key, stats in self._stats.items()
+            }
+
+
+class SqliteBucketBackend:
+    """
+    Token buckets kept in a SQLite file so every gunicorn worker process on the
+    host draws from the same buckets. Each reservation is one IMMEDIATE transaction.
+    """
+    def __init__(self, path=RATE_LIMIT_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS bucket_stats (
+                key TEXT PRIMARY KEY, calls INTEGER NOT NULL, waited INTEGER NOT NULL,
+                deferred INTEGER NOT NULL, total_wait REAL NOT NULL, max_wait REAL NOT NULL)""")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def reserve(self, key, rate, burst, max_wait):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + (now - updated) * rate) - 1
+            wait = 0.0 if tokens >= 0 else -tokens / rate
+
+            stats_row = conn.execute(
+                "SELECT calls, waited, deferred, total_wait, max_wait FROM bucket_stats WHERE key = ?", (key,)
+            ).fetchone()
+            stats = dict(zip(("calls", "waited", "deferred", "total_wait", "max_wait"), stats_row)) if stats_row else _empty_stats()
+
+            if wait > max_wait:
+                wait = None
+            else:
+                conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            _record(stats, wait)
+            conn.execute(
+                "INSERT OR REPLACE INTO bucket_stats VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stats["calls"], stats["waited"], stats["deferred"], stats["total_wait"], stats["max_wait"])
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self, limits):
+        conn = self._conn()
+        now = time.time()
+        buckets = {key: (tokens, updated) for key, tokens, updated in conn.execute("SELECT key, tokens, updated FROM buckets")}
+        result = {}
+        for key, calls, waited, deferred, total_wait, max_wait in conn.execute("SELECT * FROM bucket_stats"):
+            stats = {"calls": calls, "waited": waited, "deferred": deferred, "total_wait": total_wait, "max_wait": max_wait}
+            result[key] = _with_queue(stats, buckets.get(key), limits(key), now)
+        return result
+
+
+def _empty_stats():
+    return {"calls": 0, "waited": 0, "deferred": 0, "total_wait": 0.0, "max_wait": 0.0}
+
+
+def _record(stats, wait):
+    stats["calls"] += 1
+    if wait is None:
+        stats["deferred"] += 1
+    elif wait > 0:
+        stats["waited"] += 1
+        stats["total_wait"] += wait
+        stats["max_wait"] = max(stats["max_wait"], wait)
+
+
+def _with_queue(stats, bucket, limit, now):
+    """
+    Adds the live queue depth: reservations already handed out that are still
+    waiting for their token (the bucket's negative balance after refill).
+    """
+    rate, burst = limit
+    tokens = min(burst, bucket[0] + (now - bucket[1]) * rate) if bucket else burst
+    stats["queue_depth"] = math.ceil(-tokens) if tokens < 0 else 0
+    stats["tokens"] = round(max(tokens, 0), 3)
+    stats["avg_wait"] = round(stats["total_wait"] / stats["waited"], 3) if stats["waited"] else 0.0
+    return stats
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if RATE_LIMIT_BACKEND == "sqlite":
+                try:
+                    _backend = SqliteBucketBackend()
+                    _backend._conn()
+                except sqlite3.Error as e:
+                    print(f"⚠️ SQLite rate limiter unavailable ({e}), using in-memory buckets.")
+                    _backend = MemoryBucketBackend()
+            else:
+                _backend = MemoryBucketBackend()
+        return _backend
+
+
+def get_rate_limit_stats():
+    """
+    Per-function calls, waits, deferrals, average/max wait and live queue depth.
+    """
+    return get_rate_limiter().stats(get_rate_limit)
+
+
+def reserve_gas_slot(function_name, max_wait=None):
+    """
+    Takes a token for function_name and returns how many seconds to wait before
+    using it, or None when the next slot is more than `max_wait` seconds away
+    (RATE_LIMIT_MAX_WAIT by default) and the call should be deferred.
+    """
+    max_wait = RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+    rate, burst = get_rate_limit(function_name)
+    wait = get_rate_limiter().reserve(function_name, rate, burst, max_wait)
+    if wait is None:
+        print(f"⏳ Deferring {function_name}, next slot is more than {max_wait}s away.")
+    return wait
+
+
+def queue_gas_call(function_name, call_fn, force=False, max_wait=RATE_LIMIT_MAX_WAIT):
+    """
+    Runs call_fn once a token is available for function_name.
+    Calls over the limit wait for their scheduled slot instead of being dropped;
+    only a slot further away than `max_wait` seconds comes back as "deferred".
+    `force` skips the limiter, e.g. when the caller already reserved a slot.
+    """
+    if not force:
+        wait = reserve_gas_slot(function_name, max_wait)
+        if wait is None:
+            return {"status": "deferred", "reason": "rate_limited"}
+        if wait > 0:
+            print(f"⏳ {function_name} rate limited, waiting {wait:.2f}s for a slot.")
+            time.sleep(wait)
+
+    print(f"🚀 Triggering {function_name}")
 
     try:
         return call_fn(function_name)
     except Exception as e:
         print(f"❌ Error calling {function_name}: {e}")
-        return {"status": "error", "error": str(e)}
\ No newline at end of file
+        return {"status": "error", "error": str(e)}
@@ -1,5 +1,5 @@
 from flask import Blueprint, jsonify
-from agents.agent_manager import runManagerPipeline
+from agents.pipeline_runs import get_pipeline_runner
 
 etsy_bp = Blueprint('etsy_bp', __name__)
 
@@ -7,12 +7,19 @@ etsy_bp = Blueprint('etsy_bp', __name__)
 def run_manager_pipeline_endpoint():
     """
     This endpoint is the primary trigger for the entire workflow.
-    It calls the main orchestrator function in agent_manager.
+    It queues a pipeline run in the background and returns its run ID straight away;
+    a trigger that arrives while a run is active joins that run instead.
     """
-    print("⚡️ /runManagerPipeline endpoint hit. Starting full workflow.")
+    print("⚡️ /runManagerPipeline endpoint hit. Queuing full workflow.")
     try:
-        runManagerPipeline()
-        return jsonify({"status": "ok", "message": "Full pipeline executed."}), 200
+        run, coalesced = get_pipeline_runner().trigger()
+        return jsonify({
+            "status": "accepted",
+            "run_id": run["run_id"],
+            "coalesced": coalesced,
+            "message": "Joined the active pipeline run." if coalesced else "Pipeline run queued.",
+            "run": run
+        }), 202
     except Exception as e:
         print(f"🚨 HANDLER ERROR: {e}")
         try:
@@ -20,5 +27,56 @@ def run_manager_pipeline_endpoint():
             log_action("Manager Trigger", "Critical Error", str(e))
         except Exception as log_e:
             print(f"🚨 FAILED TO LOG CRITICAL ERROR: {log_e}")
-            
+
         return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@etsy_bp.route("/runs/<run_id>", methods=["GET"])
+def get_run_endpoint(run_id):
+    """
+    Reports progress for a single pipeline run, whichever worker process is running it.
+    """
+    run = get_pipeline_runner().get(run_id)
+    if run is None:
+        return jsonify({"status": "error", "message": f"Unknown run: {run_id}"}), 404
+    return jsonify(run), 200
+
+
+@etsy_bp.route("/runs", methods=["GET"])
+def list_runs_endpoint():
+    """
+    Lists recent pipeline runs, newest first.
+    """
+    runner = get_pipeline_runner()
+    active = runner.active
+    return jsonify({
+        "active_run_id": active["run_id"] if active else None,
+        "runs": runner.list()
+    }), 200
+
+
+@etsy_bp.route("/gasBreakers", methods=["GET"])
+def gas_breakers_endpoint():
+    """
+    Reports per-function circuit breaker state and transition counters for GAS calls.
+    """
+    from api.api_gateway import get_breaker_stats
+    return jsonify(get_breaker_stats()), 200
+
+
+@etsy_bp.route("/rateLimits", methods=["GET"])
+def rate_limits_endpoint():
+    """
+    Reports token-bucket queue depth and wait times per GAS function.
+    """
+    from agents.queue_gas_call import get_rate_limit_stats
+    return jsonify(get_rate_limit_stats()), 200
+
+
+@etsy_bp.route("/leases", methods=["GET"])
+def leases_endpoint():
+    """
+    Lists the pipeline and row leases currently held, with their holders and expiry times.
+    """
+    from agents.leases import get_lease_backend
+    return jsonify({"leases": get_lease_backend().list()}), 200
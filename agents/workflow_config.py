@@ -42,3 +42,34 @@ workflow_steps_with_priority = {
         {"step": "Create JSON", "priority": "low"}
     ]
 }
+
+# Compiled once at import: (workflow type, step) -> next step (None after the last
+# step), plus each workflow's first step for rows whose status is not a known step.
+workflow_transitions = {
+    (workflow_type, step): steps[i + 1] if i + 1 < len(steps) else None
+    for workflow_type, steps in workflow_steps.items()
+    for i, step in enumerate(steps)
+}
+workflow_first_step = {workflow_type: steps[0] for workflow_type, steps in workflow_steps.items() if steps}
+
+# Concurrency limits for the row executor ("default" covers anything not listed).
+# Apps Script allows ~30 simultaneous executions per account, so keep the totals well under that.
+worker_concurrency = {
+    "default": 4
+}
+
+function_concurrency = {
+    "default": 4,
+    "processImagesWithOpenAI": 2,
+    "copyUpscaleImageAndStoreVariants": 2,
+    "generateMockupsFromDrive": 2
+}
+
+# Token-bucket limits per Apps Script function: `rate` calls/second refill, `burst` capacity.
+# Override at deploy time with the GAS_RATE_LIMITS env var (same shape, JSON).
+gas_rate_limits = {
+    "default": {"rate": 1.0, "burst": 5},
+    "processImagesWithOpenAI": {"rate": 0.2, "burst": 2},
+    "copyUpscaleImageAndStoreVariants": {"rate": 0.5, "burst": 2},
+    "generateMockupsFromDrive": {"rate": 0.5, "burst": 2}
+}
@@ -1,13 +1,189 @@
 import requests
+import atexit
 import datetime
+import glob
 import os
 import json
+import queue
+import random
+import tempfile
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from api.metrics import metrics
 
 # ------------------------------- #
 #  Google Apps Script Endpoints   #
 # ------------------------------- #
-GAS_BASE_URL        = "https://script.google.com/macros/s/AKfycbwgH62VhAeShSHhEawCe5tDcQ2ZmrgAyvDk3qylWrPrbU_iRuG-JyS4t3JHTXyQSe7q/exec"
+GAS_BASE_URL        = os.environ.get(
+    "GAS_BASE_URL",
+    "https://script.google.com/macros/s/AKfycbwgH62VhAeShSHhEawCe5tDcQ2ZmrgAyvDk3qylWrPrbU_iRuG-JyS4t3JHTXyQSe7q/exec"
+)
 LOG_FUNCTION        = "logAgentAction"
+LOG_BULK_FUNCTION   = "logAgentActions"
+BATCH_FUNCTION      = "runBatch"
+BATCH_MAX_OPS       = int(os.environ.get("GAS_BATCH_MAX_OPS", 50))
+
+# The bulk functions (runBatch, logAgentActions, getProgressErrorCounts,
+# updateRowAssignmentsBulk) only save round trips; the deployed script does not
+# need them. Calls fall back to the per-operation functions, and a function the
+# script answers with "Unknown function" is not tried again by this process.
+_unsupported_functions = set()
+_unsupported_lock = threading.Lock()
+
+# ------------------------------- #
+#    Connection & Retry Policy    #
+# ------------------------------- #
+GAS_POOL_SIZE       = int(os.environ.get("GAS_POOL_SIZE", 16))
+GAS_MAX_RETRIES     = int(os.environ.get("GAS_MAX_RETRIES", 3))
+GAS_BACKOFF_BASE    = float(os.environ.get("GAS_BACKOFF_BASE", 0.5))
+GAS_BACKOFF_MAX     = float(os.environ.get("GAS_BACKOFF_MAX", 8))
+GAS_CALL_DEADLINE   = float(os.environ.get("GAS_CALL_DEADLINE", 45))
+# 429/503 mean the request was turned away before the script ran, so any call
+# can be retried. A 500/502/504 often arrives after the script has already run,
+# so those are only retried for read-only functions.
+RETRY_STATUS_CODES            = {429, 503}
+IDEMPOTENT_RETRY_STATUS_CODES = {500, 502, 504}
+IDEMPOTENT_FUNCTIONS          = {"getRowsNeedingProcessing", "getProgressErrorCount", "getProgressErrorCounts"}
+
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("GAS_BREAKER_FAILURES", 5))
+BREAKER_RESET_SECONDS     = float(os.environ.get("GAS_BREAKER_RESET_SECONDS", 30))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_gas_session():
+    """
+    Returns the process-wide keep-alive session used for every GAS call.
+    Created lazily so each gunicorn worker builds its own pool after fork.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=GAS_POOL_SIZE, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+class RetryableGasError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GasHttpError(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Per-function breaker: opens after consecutive transport failures, fails fast
+    while open, then lets a single probe through once the reset timeout passes.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.transitions = {self.OPEN: 0, self.HALF_OPEN: 0, self.CLOSED: 0}
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        self.state = state
+        self.transitions[state] += 1
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self._transition(self.HALF_OPEN)
+                self.probe_in_flight = True
+                return True
+            if self.state == self.HALF_OPEN:
+                if self.probe_in_flight:
+                    return False
+                self.probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.probe_in_flight = False
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probe_in_flight = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self._transition(self.OPEN)
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state":       self.state,
+                "failures":    self.failures,
+                "opened":      self.transitions[self.OPEN],
+                "half_opened": self.transitions[self.HALF_OPEN],
+                "closed":      self.transitions[self.CLOSED],
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(function_name):
+    with _breakers_lock:
+        if function_name not in _breakers:
+            _breakers[function_name] = CircuitBreaker(function_name)
+        return _breakers[function_name]
+
+
+def get_breaker_stats():
+    """
+    Returns breaker state and transition counters per GAS function, plus totals.
+    """
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    per_function = {b.name: b.stats() for b in breakers}
+    totals = {"open": 0, "half_open": 0, "closed": 0, "opened": 0, "half_opened": 0, "reclosed": 0}
+    for stats in per_function.values():
+        totals[stats["state"]] += 1
+        totals["opened"] += stats["opened"]
+        totals["half_opened"] += stats["half_opened"]
+        totals["reclosed"] += stats["closed"]
+    return {"functions": per_function, "totals": totals}
+
+
+def _backoff_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        return min(retry_after, GAS_BACKOFF_MAX)
+    # Full jitter: spread retries from concurrent callers across the window.
+    return random.uniform(0, min(GAS_BACKOFF_MAX, GAS_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _parse_retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
 
 # ------------------------------- #
 #        Helper Functions         #
@@ -15,7 +191,34 @@ LOG_FUNCTION        = "logAgentAction"
 def call_gas_function(function_name, params=None, timeout=30):
     """
     Calls a Google Apps Script web app function with proper POST body and debug logging.
+    Latency and failures are recorded per function for /metrics.
     """
+    started = time.perf_counter()
+    try:
+        result = _call_gas_function(function_name, params, timeout)
+    except Exception as e:
+        metrics.observe("gas_call_duration_seconds", time.perf_counter() - started, function=function_name, outcome="error")
+        metrics.inc("gas_call_errors_total", function=function_name, reason=_error_reason(e))
+        raise
+    metrics.observe("gas_call_duration_seconds", time.perf_counter() - started, function=function_name, outcome="success")
+    return result
+
+
+def _error_reason(e):
+    if isinstance(e, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(e, (RetryableGasError, GasHttpError)):
+        return "http_status"
+    if isinstance(e, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(e, requests.exceptions.RequestException):
+        return "connection"
+    if isinstance(e, ValueError):
+        return "bad_response"
+    return "gas_error"
+
+
+def _call_gas_function(function_name, params, timeout):
     url = GAS_BASE_URL  # ❗ No longer appending ?function=... to the URL
 
     if params is None:
@@ -27,31 +230,66 @@ def call_gas_function(function_name, params=None, timeout=30):
     print(f"→ URL: {url}")
     print(f"→ Payload: {json.dumps(params)}")
 
-    try:
-        response = requests.post(url, json=params, timeout=timeout)
+    breaker = get_breaker(function_name)
+    if not breaker.allow():
+        print(f"⛔ Circuit open for {function_name}, failing fast.")
+        raise CircuitOpenError(f"{function_name} circuit is open; Apps Script is degraded")
 
-        print(f"→ Status Code: {response.status_code}")
-        print(f"→ Raw Response: {response.text}")
+    session = get_gas_session()
+    deadline = time.monotonic() + GAS_CALL_DEADLINE
+    attempt = 0
 
-        data = response.json()
-        print("→ Parsed JSON Response:", json.dumps(data, indent=2))
+    while True:
+        try:
+            remaining = deadline - time.monotonic()
+            response = session.post(url, json=params, timeout=max(min(timeout, remaining), 1))
 
-        if not data.get("success", False):
-            raise Exception(f"{function_name} error: {data.get('error', 'Unknown error')}")
+            print(f"→ Status Code: {response.status_code}")
+            print(f"→ Raw Response: {response.text}")
 
-        return data.get("result", data)
+            if response.status_code in RETRY_STATUS_CODES or (
+                    response.status_code in IDEMPOTENT_RETRY_STATUS_CODES and function_name in IDEMPOTENT_FUNCTIONS):
+                raise RetryableGasError(
+                    f"{function_name} returned HTTP {response.status_code}",
+                    retry_after=_parse_retry_after(response)
+                )
 
-    except requests.exceptions.RequestException as e:
-        print(f"❌ HTTP request to GAS failed: {e}")
-        raise
-    except Exception as e:
-        print(f"❌ GAS function error: {e}")
-        raise
+            if response.status_code >= 500:
+                raise GasHttpError(f"{function_name} returned HTTP {response.status_code}")
+            data = response.json()
+            break
+
+        # Read timeouts and 5xx answers to non-idempotent calls are not retried: the
+        # script may already have run and calls like incrementProgressErrorCount would repeat.
+        except (RetryableGasError, requests.exceptions.ConnectionError) as e:
+            attempt += 1
+            delay = _backoff_delay(attempt, getattr(e, "retry_after", None))
+            if attempt > GAS_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                breaker.record_failure()
+                print(f"❌ HTTP request to GAS failed after {attempt} attempt(s): {e}")
+                raise
+            print(f"🔁 Retrying {function_name} in {delay:.2f}s (attempt {attempt}/{GAS_MAX_RETRIES}): {e}")
+            time.sleep(delay)
+
+        except (GasHttpError, requests.exceptions.RequestException, ValueError) as e:
+            breaker.record_failure()
+            print(f"❌ HTTP request to GAS failed: {e}")
+            raise
+
+    breaker.record_success()
+    print("→ Parsed JSON Response:", json.dumps(data, indent=2))
+
+    if not data.get("success", False):
+        print(f"❌ GAS function error: {data.get('error', 'Unknown error')}")
+        raise Exception(f"{function_name} error: {data.get('error', 'Unknown error')}")
+
+    return data.get("result", data)
 
 
 def log_action(action, outcome, notes, agent="Worker"):
     """
     Logs an action to the Google Sheet.
+    The entry is handed to the background log shipper, so this never blocks on GAS.
     """
     params = {
         "timestamp": datetime.datetime.now().isoformat(),
@@ -60,10 +298,377 @@ def log_action(action, outcome, notes, agent="Worker"):
         "notes":     notes,
         "agent":     agent
     }
+    get_log_shipper().submit(params)
+
+# ------------------------------- #
+#        Optional Functions       #
+# ------------------------------- #
+def is_unknown_function(error):
+    """
+    True when a GAS error (exception or error text) says the function is not deployed.
+    """
+    return "unknown function" in str(error).lower()
+
+
+def function_supported(function_name):
+    with _unsupported_lock:
+        return function_name not in _unsupported_functions
+
+
+def mark_unsupported(function_name):
+    with _unsupported_lock:
+        if function_name in _unsupported_functions:
+            return
+        _unsupported_functions.add(function_name)
+    print(f"⚠️ {function_name} is not deployed in Apps Script; using per-operation calls from now on.")
+
+# ------------------------------- #
+#          Batched Calls          #
+# ------------------------------- #
+def call_gas_batch(operations, timeout=60):
+    """
+    Sends a list of {"function", "params"} operations to GAS in a single POST.
+    Returns one {"function", "success", "result", "error"} entry per operation, in order.
+    A failing operation does not affect the others; if the request itself fails,
+    every operation is reported as failed with that error. When the script has no
+    runBatch, the operations are sent one call each instead.
+    """
+    ops = [{"function": op["function"], "params": op.get("params") or {}} for op in operations]
+    if not ops:
+        return []
+
+    if not function_supported(BATCH_FUNCTION):
+        return _call_each(ops, timeout)
     try:
-        call_gas_function(LOG_FUNCTION, params)
+        result = call_gas_function(BATCH_FUNCTION, {"operations": ops}, timeout=timeout)
+        op_results = result.get("results", []) if isinstance(result, dict) else result
     except Exception as e:
-        print(f"⚠️ Failed to log action: {e}")
+        if is_unknown_function(e):
+            mark_unsupported(BATCH_FUNCTION)
+            return _call_each(ops, timeout)
+        return [
+            {"function": op["function"], "success": False, "result": None, "error": str(e)}
+            for op in ops
+        ]
+
+    results = []
+    for i, op in enumerate(ops):
+        entry = op_results[i] if i < len(op_results) and isinstance(op_results[i], dict) else {}
+        success = bool(entry.get("success", False))
+        results.append({
+            "function": op["function"],
+            "success":  success,
+            "result":   entry.get("result"),
+            "error":    None if success else entry.get("error", "No result returned for operation")
+        })
+    return results
+
+
+def _call_each(ops, timeout):
+    results = []
+    for op in ops:
+        try:
+            result = call_gas_function(op["function"], dict(op["params"]), timeout=timeout)
+            results.append({"function": op["function"], "success": True, "result": result, "error": None})
+        except Exception as e:
+            results.append({"function": op["function"], "success": False, "result": None, "error": str(e)})
+    return results
+
+
+class GasBatch:
+    """
+    Collects GAS operations and sends them through call_gas_batch.
+    Flushes every `max_ops` operations and when the `with` block exits.
+    """
+    def __init__(self, max_ops=BATCH_MAX_OPS, timeout=60):
+        self.max_ops = max_ops
+        self.timeout = timeout
+        self.pending = []
+        self.results = []
+        self._lock = threading.Lock()
+
+    def add(self, function_name, params=None):
+        with self._lock:
+            self.pending.append({"function": function_name, "params": params or {}})
+            should_flush = len(self.pending) >= self.max_ops
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            ops, self.pending = self.pending, []
+        if not ops:
+            return []
+
+        results = call_gas_batch(ops, timeout=self.timeout)
+        for r in results:
+            if not r["success"]:
+                print(f"⚠️ Batched {r['function']} failed: {r['error']}")
+        with self._lock:
+            self.results.extend(results)
+        return results
+
+    @property
+    def errors(self):
+        return [r for r in self.results if not r["success"]]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+# ------------------------------- #
+#      Write-behind Logging       #
+# ------------------------------- #
+LOG_QUEUE_SIZE      = int(os.environ.get("LOG_QUEUE_SIZE", 1000))
+LOG_FLUSH_SIZE      = int(os.environ.get("LOG_FLUSH_SIZE", 50))
+LOG_FLUSH_INTERVAL  = float(os.environ.get("LOG_FLUSH_INTERVAL", 2))
+LOG_OVERFLOW_POLICY = os.environ.get("LOG_OVERFLOW_POLICY", "spill")  # "spill" or "drop"
+LOG_SPILL_DIR       = os.environ.get("LOG_SPILL_DIR", os.path.join(tempfile.gettempdir(), "lystics-log-spill"))
+
+
+class LogShipper:
+    """
+    Buffers log entries in a bounded queue and ships them to GAS in bulk from a
+    background thread, flushing whenever `flush_size` entries are waiting or
+    `flush_interval` seconds have passed.
+
+    When the queue is full, or a bulk call fails, entries are either dropped or
+    spilled to a JSONL file (per `overflow_policy`) and replayed on a later flush.
+    If the script has no bulk function, entries go out one `single_function` call each.
+    """
+    def __init__(self, bulk_function=LOG_BULK_FUNCTION, single_function=LOG_FUNCTION, queue_size=LOG_QUEUE_SIZE,
+                 flush_size=LOG_FLUSH_SIZE, flush_interval=LOG_FLUSH_INTERVAL,
+                 overflow_policy=LOG_OVERFLOW_POLICY, spill_dir=LOG_SPILL_DIR):
+        self.bulk_function = bulk_function
+        self.single_function = single_function
+        self.queue_size = queue_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.spill_dir = spill_dir
+        self.counters = {"submitted": 0, "shipped": 0, "dropped": 0, "spilled": 0, "replayed": 0, "failed_flushes": 0}
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()  # this process's spill file: writers vs. replay
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stop = None
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own.
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.queue_size)
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+            self._thread.start()
+
+    def submit(self, entry):
+        self._ensure_started()
+        self._count("submitted")
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._overflow([entry])
+
+    def flush(self, timeout=10):
+        """
+        Blocks until everything queued before this call has been shipped (or spilled).
+        """
+        self._ensure_started()
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def shutdown(self, timeout=10):
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._stop.set()
+        try:
+            # Wake the shipper now rather than at the end of its flush interval.
+            self._queue.put_nowait(threading.Event())
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats["queued"] = self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+        return stats
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.counters[key] += n
+
+    def _run(self):
+        entries = []
+        waiters = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            stopping = self._stop.is_set()
+            try:
+                item = self._queue.get(timeout=0 if stopping else max(deadline - time.monotonic(), 0.01))
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    entries.append(item)
+                ready = len(entries) >= self.flush_size or waiters
+            except queue.Empty:
+                ready = True
+
+            if ready or time.monotonic() >= deadline:
+                self._ship(entries)
+                for waiter in waiters:
+                    waiter.set()
+                entries, waiters = [], []
+                deadline = time.monotonic() + self.flush_interval
+                if stopping and self._queue.empty():
+                    return
+
+    def _ship(self, entries):
+        entries = self._claim_spilled() + entries
+        if not entries:
+            return
+        for start in range(0, len(entries), max(self.flush_size, 1) * 4):
+            chunk = entries[start:start + max(self.flush_size, 1) * 4]
+            if function_supported(self.bulk_function):
+                try:
+                    call_gas_function(self.bulk_function, {"entries": chunk})
+                    self._count("shipped", len(chunk))
+                    continue
+                except Exception as e:
+                    if not is_unknown_function(e):
+                        print(f"⚠️ Failed to ship {len(chunk)} log entries: {e}")
+                        self._count("failed_flushes")
+                        self._overflow(chunk)
+                        continue
+                    mark_unsupported(self.bulk_function)
+            self._ship_each(chunk)
+
+    def _ship_each(self, entries):
+        for i, entry in enumerate(entries):
+            try:
+                call_gas_function(self.single_function, dict(entry))
+                self._count("shipped")
+            except Exception as e:
+                # GAS is failing; keep the rest for a later flush instead of hammering it.
+                print(f"⚠️ Failed to ship {len(entries) - i} log entries: {e}")
+                self._count("failed_flushes")
+                self._overflow(entries[i:])
+                return
+
+    def _overflow(self, entries):
+        if self.overflow_policy != "spill":
+            self._count("dropped", len(entries))
+            return
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with self._spill_lock, \
+                    open(os.path.join(self.spill_dir, f"spill-{os.getpid()}.jsonl"), "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+            self._count("spilled", len(entries))
+        except OSError as e:
+            print(f"⚠️ Failed to spill log entries: {e}")
+            self._count("dropped", len(entries))
+
+    def _claim_spilled(self):
+        """
+        Takes ownership of spill files by renaming them, so two processes never
+        replay the same entries. Only this process's own file is claimed, or a file
+        (spilled or already claimed) whose process has died; a live worker's file
+        is left to that worker, which may still be appending to it. Lines that do
+        not parse (e.g. cut short when a worker was killed) are skipped.
+        """
+        if self.overflow_policy != "spill" or not os.path.isdir(self.spill_dir):
+            return []
+        pid = os.getpid()
+        entries = []
+        for path in glob.glob(os.path.join(self.spill_dir, "spill-*.jsonl*")):
+            owner = _spill_owner(path)
+            if owner is None or (owner != pid and _pid_alive(owner)):
+                continue
+            claimed = f"{path.split('.claimed-')[0]}.claimed-{pid}"
+            try:
+                with self._spill_lock:
+                    if path != claimed:
+                        os.rename(path, claimed)
+                with open(claimed, encoding="utf-8") as f:
+                    lines = f.readlines()
+            except OSError as e:
+                # Left as .claimed-<pid>: retried by this process, or by anyone once it dies.
+                print(f"⚠️ Failed to replay spilled logs from {path}: {e}")
+                continue
+            skipped = 0
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    skipped += 1
+            if skipped:
+                print(f"⚠️ Skipped {skipped} unreadable spilled log line(s) in {path}")
+            try:
+                os.remove(claimed)
+            except OSError as e:
+                print(f"⚠️ Failed to remove replayed spill file {claimed}: {e}")
+        self._count("replayed", len(entries))
+        return entries
+
+
+def _spill_owner(path):
+    """
+    The pid that owns a spill file: its claimer for "spill-<a>.jsonl.claimed-<b>",
+    otherwise its writer. None for names that do not parse.
+    """
+    name = os.path.basename(path)
+    try:
+        if ".claimed-" in name:
+            return int(name.rsplit(".claimed-", 1)[1])
+        return int(name[len("spill-"):-len(".jsonl")])
+    except ValueError:
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_log_shipper = LogShipper()
+
+
+def get_log_shipper():
+    return _log_shipper
+
+
+def shutdown_log_shipper(timeout=10):
+    """
+    Flushes pending log entries and stops the shipper thread. Called on interpreter
+    exit and from the gunicorn worker_exit hook.
+    """
+    _log_shipper.shutdown(timeout)
+
+
+atexit.register(shutdown_log_shipper)
 
 # ------------------------------- #
 #         Error Escalation        #
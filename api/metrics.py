@@ -0,0 +1,363 @@
+import atexit
+import glob
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from flask import Blueprint, Response, g, request
+
+# ------------------------------- #
+#         Metrics Settings        #
+# ------------------------------- #
+METRICS_DIR           = os.environ.get("METRICS_DIR", os.path.join(tempfile.gettempdir(), "lystics-metrics"))
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", 5))
+METRICS_PREFIX        = "lystics_"
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+BYTES_BUCKETS   = [2**i for i in range(10, 31, 2)]          # 1 KB .. 1 GB
+PIXEL_BUCKETS   = [10**4, 10**5, 5 * 10**5, 10**6, 4 * 10**6, 10**7, 5 * 10**7, 10**8, 5 * 10**8]
+
+# name -> (type, help, buckets)
+METRICS = {
+    "http_request_duration_seconds":   ("histogram", "Flask request latency by route, method and status (time to first byte for streamed bodies).", LATENCY_BUCKETS),
+    "http_request_errors_total":       ("counter",   "Flask responses with a 5xx status, by route.", None),
+    "gas_call_duration_seconds":       ("histogram", "Apps Script call latency (including retries) by function and outcome.", LATENCY_BUCKETS),
+    "gas_call_errors_total":           ("counter",   "Failed Apps Script calls by function and reason.", None),
+    "pipeline_phase_duration_seconds": ("histogram", "runManagerPipeline phase duration.", LATENCY_BUCKETS),
+    "pipeline_runs_total":             ("counter",   "Finished pipeline runs by status.", None),
+    "image_bytes":                     ("histogram", "Encoded image size through the image services, by service and direction.", BYTES_BUCKETS),
+    "image_pixels":                    ("histogram", "Image pixel count through the image services, by service and direction.", PIXEL_BUCKETS),
+}
+
+GAUGE_HELP = "Point-in-time service state, reported per worker process."
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Per-process counters and histograms. Each process periodically writes a
+    snapshot to METRICS_DIR/<pid>.json, and /metrics sums the snapshots of every
+    process (live or exited) so counters stay monotonic across gunicorn workers.
+    """
+    def __init__(self, directory=METRICS_DIR, flush_seconds=METRICS_FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_flusher(self):
+        # After a fork the child starts with the parent's samples; drop them and
+        # start a flusher for this process.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self._counters.clear()
+                self._histograms.clear()
+            self._pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def inc(self, name, amount=1, **labels):
+        self._ensure_flusher()
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        self._ensure_flusher()
+        buckets = METRICS[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            else:
+                entry[0][-1] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def register_collector(self, fn):
+        """
+        fn() returns [(name, labels, value)] gauges sampled at snapshot time.
+        """
+        self._collectors.append(fn)
+
+    def _gauges(self):
+        gauges = []
+        for fn in self._collectors:
+            try:
+                gauges.extend(fn())
+            except Exception as e:
+                print(f"⚠️ Metrics collector {getattr(fn, '__name__', fn)} failed: {e}")
+        return gauges
+
+    def snapshot(self):
+        with self._lock:
+            counters = [[name, dict(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [[name, dict(labels), list(entry[0]), entry[1], entry[2]]
+                          for (name, labels), entry in self._histograms.items()]
+        return {
+            "pid":        os.getpid(),
+            "written_at": time.time(),
+            "counters":   counters,
+            "histograms": histograms,
+            "gauges":     [[name, labels, value] for name, labels, value in self._gauges()],
+        }
+
+    def flush(self):
+        if self._pid != os.getpid():
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{os.getpid()}.json")
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Failed to write metrics snapshot: {e}")
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def render(self):
+        """
+        Prometheus text exposition of every process's latest snapshot.
+        """
+        self._ensure_flusher()
+        self.flush()
+
+        counters, histograms, gauges = {}, {}, []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    snap = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in snap["counters"]:
+                key = (name, _label_key(labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, counts, total, count in snap["histograms"]:
+                key = (name, _label_key(labels))
+                entry = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += count
+            # Gauges only make sense for processes that are still running.
+            if _pid_alive(snap["pid"]):
+                gauges.extend((name, dict(labels, pid=snap["pid"]), value) for name, labels, value in snap["gauges"])
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            full = METRICS_PREFIX + name
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            if kind == "counter":
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{full}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, n in zip(buckets + ["+Inf"], counts):
+                    cumulative += n
+                    lines.append(f"{full}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{full}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{full}_count{_format_labels(labels)} {count}")
+
+        seen = set()
+        for name, labels, value in sorted(gauges, key=lambda item: item[0]):
+            full = METRICS_PREFIX + name
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {full} {GAUGE_HELP}")
+                lines.append(f"# TYPE {full} gauge")
+            lines.append(f"{full}{_format_labels(_label_key(labels))} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        f'{k}="' + v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"'
+        for k, v in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+metrics = MetricsRegistry()
+atexit.register(metrics.flush)
+
+
+def reset_metrics_dir():
+    """
+    Clears snapshots from previous deployments; call once in the gunicorn master.
+    """
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# ------------------------------- #
+#      Image Size Recording       #
+# ------------------------------- #
+def record_image(service, direction, nbytes=None, size=None):
+    if nbytes is not None:
+        metrics.observe("image_bytes", nbytes, service=service, direction=direction)
+    if size is not None:
+        metrics.observe("image_pixels", size[0] * size[1], service=service, direction=direction)
+
+
+def count_stream(chunks, service):
+    """
+    Passes a streamed image body through, recording its size once it completes.
+    """
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+        yield chunk
+    record_image(service, "out", nbytes=total)
+
+
+# ------------------------------- #
+#        Service Collectors       #
+# ------------------------------- #
+def _service_gauges():
+    """
+    Samples only the services this process has already imported: the flusher
+    runs from the first request (often /healthz), and importing them here would
+    load Pillow and requests into every worker, undoing the lazy startup.
+    """
+    gauges = []
+    gateway = sys.modules.get("api.api_gateway")
+    if gateway is not None:
+        for function, stats in gateway.get_breaker_stats()["functions"].items():
+            gauges.append(("gas_breaker_open", {"function": function}, int(stats["state"] != "closed")))
+            gauges.append(("gas_breaker_opened", {"function": function}, stats["opened"]))
+        for key, value in gateway.get_log_shipper().stats().items():
+            gauges.append(("log_shipper", {"stat": key}, value))
+
+    upscaler = sys.modules.get("services.upscaler")
+    if upscaler is not None:
+        for key, value in upscaler.admission.stats().items():
+            gauges.append(("upscale_admission", {"stat": key}, value))
+
+    caches = (("result", "services.result_cache", "result_cache"),
+              ("template", "services.template_cache", "template_cache"),
+              ("download", "services.image_fetcher", "image_fetcher"))
+    for cache_name, module_name, attribute in caches:
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        for key, value in getattr(module, attribute).stats().items():
+            if isinstance(value, (int, float)):
+                gauges.append(("cache", {"cache": cache_name, "stat": key}, value))
+    return gauges
+
+
+def _rate_limit_lines():
+    # The SQLite buckets are shared by every process on the host, so these are
+    # read once at scrape time rather than per process snapshot.
+    from agents.queue_gas_call import get_rate_limit_stats
+
+    lines = [f"# HELP {METRICS_PREFIX}gas_rate_limit Token bucket counters per GAS function (host-wide).",
+             f"# TYPE {METRICS_PREFIX}gas_rate_limit gauge"]
+    for function, stats in sorted(get_rate_limit_stats().items()):
+        for key, value in stats.items():
+            if isinstance(value, (int, float)):
+                labels = _label_key({"function": function, "stat": key})
+                lines.append(f"{METRICS_PREFIX}gas_rate_limit{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+metrics.register_collector(_service_gauges)
+
+
+# ------------------------------- #
+#        Flask Integration        #
+# ------------------------------- #
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def handle_metrics():
+    body = metrics.render()
+    try:
+        body += _rate_limit_lines()
+    except Exception as e:
+        print(f"⚠️ Rate limit metrics unavailable: {e}")
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    """
+    Times every request and mounts /metrics.
+    """
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            metrics.observe("http_request_duration_seconds", time.perf_counter() - started,
+                            route=route, method=request.method, status=response.status_code)
+            if response.status_code >= 500:
+                metrics.inc("http_request_errors_total", route=route)
+        return response
+
+    app.register_blueprint(metrics_bp)
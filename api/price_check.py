@@ -1,4 +1,50 @@
-from flask import Blueprint, request, jsonify
+import json
+import time
+from flask import Blueprint, Response, request, jsonify
 
 price_check_bp = Blueprint('price_check_bp', __name__)
 
+
+@price_check_bp.route('/priceCheck', methods=['POST'])
+def price_check():
+    """
+    Bulk price check: {"skus": [...]} and/or {"urls": [...]}, or {"items": [{"sku"|"url", ...}]}.
+    Streams NDJSON, one {"index", "sku"?, "url", "status", "price", "currency", ...} line
+    per item as it completes, then a {"done": true, ...} summary line.
+    """
+    from services.price_checker import price_checker, normalize_items, PRICE_CHECK_MAX_ITEMS, PRICE_CHECK_DEADLINE
+
+    data = request.get_json(silent=True)
+    try:
+        items = normalize_items({} if data is None else data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not items:
+        return jsonify({'error': 'Missing required field: skus, urls or items'}), 400
+    if len(items) > PRICE_CHECK_MAX_ITEMS:
+        return jsonify({'error': f'At most {PRICE_CHECK_MAX_ITEMS} items per call, got {len(items)}'}), 400
+    try:
+        deadline = float(data.get('deadline') or PRICE_CHECK_DEADLINE)
+    except (TypeError, ValueError):
+        deadline = float('nan')
+    if not 0 < deadline < float('inf'):
+        return jsonify({'error': "'deadline' must be a positive number of seconds"}), 400
+    deadline = min(deadline, PRICE_CHECK_DEADLINE)
+
+    def generate():
+        started = time.perf_counter()
+        summary = {"done": True, "count": len(items), "ok": 0, "not_found": 0, "error": 0, "timeout": 0, "cached": 0}
+        for index, result in price_checker.check_many(items, deadline=deadline):
+            summary[result["status"]] = summary.get(result["status"], 0) + 1
+            summary["cached"] += 1 if result.get("cached") else 0
+            yield json.dumps({"index": index, **result}) + "\n"
+        summary["elapsed"] = round(time.perf_counter() - started, 3)
+        yield json.dumps(summary) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+
+@price_check_bp.route('/priceCheck/stats', methods=['GET'])
+def price_check_stats():
+    from services.price_checker import price_checker
+    return jsonify(price_checker.stats()), 200
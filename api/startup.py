@@ -0,0 +1,166 @@
+"""
+Cold-start helpers for the app factory: lazily imported views, an import timer
+for the startup report, and the warmup run after gunicorn forks a worker.
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+
+STARTUP_REPORT      = os.environ.get("STARTUP_REPORT", "false").lower() in ("1", "true", "yes")
+STARTUP_REPORT_TOP  = int(os.environ.get("STARTUP_REPORT_TOP", 15))
+
+
+class LazyView:
+    """
+    A view function given as "module:attribute", imported on its first request
+    (or by resolve(), e.g. during warmup) instead of when the app is built.
+    """
+    def __init__(self, import_name):
+        self.import_name = import_name
+        self.__name__ = import_name.rsplit(":", 1)[-1]
+        self._view = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        if self._view is None:
+            with self._lock:
+                if self._view is None:
+                    module_name, attribute = self.import_name.split(":")
+                    self._view = getattr(importlib.import_module(module_name), attribute)
+        return self._view
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+
+# ------------------------------- #
+#          Import Timing          #
+# ------------------------------- #
+class ImportTimer:
+    """
+    Meta-path hook that times each module's execution. `self_times` excludes the
+    time spent importing its own dependencies, so the numbers add up to the total.
+    """
+    def __init__(self):
+        self.self_times = {}
+        self.total_times = {}
+        self._local = threading.local()
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path=None, target=None):
+        if getattr(self._local, "finding", False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.finding = False
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, name, self)
+        return spec
+
+    def _record(self, name, fn):
+        stack = self._local.__dict__.setdefault("stack", [])
+        started = time.perf_counter()
+        stack.append(0.0)
+        try:
+            return fn()
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.total_times[name] = elapsed
+            self.self_times[name] = elapsed - children
+
+    def report(self, top=STARTUP_REPORT_TOP):
+        """
+        {"total_seconds", "modules", "by_package", "slowest"}: import cost overall,
+        summed per top-level package, and the slowest individual modules (self time).
+        """
+        by_package = {}
+        for name, seconds in self.self_times.items():
+            package = name.split(".", 1)[0]
+            by_package[package] = by_package.get(package, 0.0) + seconds
+        slowest = sorted(self.self_times.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            "total_seconds": round(sum(self.self_times.values()), 4),
+            "modules":       len(self.self_times),
+            "by_package":    {name: round(s, 4) for name, s in sorted(by_package.items(), key=lambda i: i[1], reverse=True)[:top]},
+            "slowest":       {name: round(s, 4) for name, s in slowest},
+        }
+
+
+class _TimedLoader:
+    def __init__(self, loader, name, timer):
+        self._loader = loader
+        self._name = name
+        self._timer = timer
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Keep the real loader on the module so reloads and resource access behave as usual.
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+        return self._timer._record(self._name, lambda: self._loader.exec_module(module))
+
+    def __getattr__(self, attribute):
+        return getattr(self._loader, attribute)
+
+
+def print_report(title, report):
+    print(f"⏱️ {title}: {report['total_seconds'] * 1000:.1f} ms importing {report['modules']} modules")
+    for package, seconds in report["by_package"].items():
+        print(f"   {package:<32} {seconds * 1000:>8.1f} ms")
+    print("   slowest modules:")
+    for module, seconds in report["slowest"].items():
+        print(f"   {module:<32} {seconds * 1000:>8.1f} ms")
+
+
+# ------------------------------- #
+#             Warmup              #
+# ------------------------------- #
+def preload(views):
+    """
+    Imports every lazy view and loads Pillow's codec plugins. Fork-safe, so it can
+    run in the gunicorn master with preload_app and be shared copy-on-write.
+    """
+    for view in views:
+        view.resolve()
+    from PIL import Image
+    Image.init()
+
+
+def warmup(views):
+    """
+    Per-process warmup after fork: the imports above, then the image thread and
+    process pools (threads and child processes do not survive a fork).
+    """
+    started = time.perf_counter()
+    preload(views)
+    from services.process_pool import get_process_pool, get_thread_pool, IMAGE_POOL_WORKERS, _warm_worker
+    get_thread_pool()
+    pool = get_process_pool()
+    for future in [pool.submit(_warm_worker) for _ in range(IMAGE_POOL_WORKERS)]:
+        future.result()
+    print(f"🔥 Worker {os.getpid()} warmed up in {time.perf_counter() - started:.2f}s")
@@ -1,41 +1,106 @@
-from flask import Flask, jsonify
-import logging
 import os
+import time
 
-# === Service Routes ===
-from services.resize_json_service import resizeJSON
-from services.upscaler import upscaleImage
-from api.price_check import price_check_bp
-from routes.mockups import mockup_bp
-from agents.worker_controller import etsy_bp
+_started = time.perf_counter()
+
+from api.startup import STARTUP_REPORT, ImportTimer, LazyView, print_report
+_import_timer = ImportTimer().install() if STARTUP_REPORT else None
+
+from flask import Flask, jsonify
+import logging
 
 # ✅ Setup logging
 logging.basicConfig(level=logging.INFO)
 
-app = Flask(__name__)
+# === Service Routes ===
+# Imported on first request (or during warmup), so a cold start only pays for Flask.
+SERVICE_VIEWS = {
+    '/resizeJson':  LazyView('services.resize_json_service:resizeJSON'),
+    '/resizeBatch': LazyView('services.resize_json_service:resizeBatch'),
+    '/upscaleOne':  LazyView('services.upscaler:upscaleImage'),
+    '/render':      LazyView('services.render_pipeline:renderImage'),
+}
+MOCKUP_VIEWS = [
+    LazyView('services.mockup_generator:generate_mockups'),
+    LazyView('services.template_cache:register_template'),
+]
+
+
+def create_app():
+    """
+    Builds the Flask app. Blueprints only import their heavy services inside the
+    views, and the service routes are LazyViews, so nothing imports Pillow or
+    requests until the first request that needs it.
+    """
+    from api.price_check import price_check_bp
+    from routes.mockups import mockup_bp
+    from agents.worker_controller import etsy_bp
+    from api.metrics import init_app as init_metrics
+
+    app = Flask(__name__)
+
+    # === Global Health and Error Routes ===
+    @app.route("/healthz", methods=["GET"])
+    def health():
+        return "ok", 200
+
+    @app.route("/resultCache/stats", methods=["GET"])
+    def result_cache_stats():
+        from services.result_cache import result_cache
+        return jsonify(result_cache.stats()), 200
+
+    @app.route("/imageFetcher/stats", methods=["GET"])
+    def image_fetcher_stats():
+        from services.image_fetcher import image_fetcher
+        return jsonify(image_fetcher.stats()), 200
+
+    @app.route("/jobStore/stats", methods=["GET"])
+    def job_store_stats():
+        from models.job_store import JOB_STORE_ENABLED, get_job_store
+        if not JOB_STORE_ENABLED:
+            return jsonify({"enabled": False}), 200
+        return jsonify({"enabled": True, **get_job_store(start_syncer=False).stats()}), 200
+
+    @app.route("/startupReport", methods=["GET"])
+    def startup_report():
+        if _import_timer is None:
+            return jsonify({"enabled": False}), 200
+        return jsonify({"enabled": True, "app_ready_seconds": app.config["APP_READY_SECONDS"],
+                        **_import_timer.report()}), 200
+
+    @app.errorhandler(Exception)
+    def handle_error(e):
+        logging.error(f"Unhandled exception: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    @app.route("/")
+    def home():
+        return "Welcome to Lystics Agent System!"
+
+    # === Register External Blueprints ===
+    init_metrics(app)
+    app.register_blueprint(price_check_bp)
+    app.register_blueprint(mockup_bp)
+    app.register_blueprint(etsy_bp, url_prefix='/agent')
+
+    # === Register Service Routes via Function Mapping ===
+    for rule, view in SERVICE_VIEWS.items():
+        app.add_url_rule(rule, view_func=view, methods=['POST'])
 
-# === Global Health and Error Routes ===
-@app.route("/healthz", methods=["GET"])
-def health():
-    return "ok", 200
+    app.config["APP_READY_SECONDS"] = round(time.perf_counter() - _started, 4)
+    if _import_timer is not None:
+        print_report(f"App ready in {app.config['APP_READY_SECONDS'] * 1000:.1f} ms", _import_timer.report())
+    return app
 
-@app.errorhandler(Exception)
-def handle_error(e):
-    logging.error(f"Unhandled exception: {e}")
-    return jsonify({"error": str(e)}), 500
 
-@app.route("/")
-def home():
-    return "Welcome to Lystics Agent System!"
+def warmup_views():
+    """
+    Every lazily imported view, for preload/warmup.
+    """
+    return list(SERVICE_VIEWS.values()) + MOCKUP_VIEWS
 
-# === Register External Blueprints ===
-app.register_blueprint(price_check_bp)
-app.register_blueprint(mockup_bp)
-app.register_blueprint(etsy_bp, url_prefix='/agent')
 
-# === Register Service Routes via Function Mapping ===
-app.add_url_rule('/resizeJson', view_func=resizeJSON, methods=['POST'])
-app.add_url_rule('/upscaleOne', view_func=upscaleImage, methods=['POST'])
+app = create_app()
 
 # === Launch ===
 if __name__ == '__main__':
@@ -0,0 +1,351 @@
+"""
+Micro-benchmarks for the image services: resize, upscale and mockup compositing,
+both as service functions and through the Flask endpoints.
+
+Each case runs in its own subprocess so peak RSS is measured per case. Results
+report throughput, p50/p99 latency and peak memory; they can be saved as a JSON
+baseline and later compared against it:
+
+    python -m benchmarks.image_bench --list
+    python -m benchmarks.image_bench --filter resize --save baseline.json
+    python -m benchmarks.image_bench --compare baseline.json --threshold 0.15
+
+The result cache is disabled in the benchmark processes so every iteration does
+the full work.
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ------------------------------- #
+#        Synthetic Inputs         #
+# ------------------------------- #
+def synthetic_image(size, mode="RGB"):
+    """
+    Photo-like content (smooth gradients plus sensor-style noise), so encoders
+    and resamplers do realistic work; flat fills compress and resize unrealistically fast.
+    """
+    from PIL import Image
+
+    gradient = Image.linear_gradient("L").resize(size)
+    radial = Image.radial_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 24)
+    img = Image.merge("RGB", (gradient, radial, Image.blend(gradient, noise, 0.5)))
+    if mode == "RGBA":
+        img = img.convert("RGBA")
+        img.putalpha(radial)
+    return img
+
+
+def encode(img, format, **kwargs):
+    buffer = io.BytesIO()
+    img.save(buffer, format=format, **kwargs)
+    return buffer.getvalue()
+
+
+def mockup_payload(layer_count, base_size=(2000, 2000)):
+    """
+    One mockup with a BASE template, `layer_count` IMAGE placements and a TOP overlay.
+    """
+    base = base64.b64encode(encode(synthetic_image(base_size, "RGBA"), "PNG")).decode("ascii")
+    top = base64.b64encode(encode(synthetic_image(base_size, "RGBA"), "PNG")).decode("ascii")
+    step = base_size[0] // (layer_count + 1)
+    layers = [{"name": "BASE"}]
+    layers += [{"name": "IMAGE", "x": i * step, "y": i * step, "width": step, "height": step} for i in range(layer_count)]
+    layers.append({"name": "TOP"})
+    return layers, {"base.png": base, "top.png": top}
+
+
+# ------------------------------- #
+#              Cases              #
+# ------------------------------- #
+def _resize_case(size, width, format):
+    from PIL import Image
+    from services.resize_json_service import resize_image
+
+    data = encode(synthetic_image(size, "RGBA" if format == "PNG" else "RGB"), format)
+
+    def op():
+        img = Image.open(io.BytesIO(data))
+        resized, fmt = resize_image(img, width)
+        encode(resized, fmt)
+    return op, size[0] * size[1]
+
+
+def _filter_case(size, width, resample):
+    from PIL import Image
+
+    img = synthetic_image(size)
+    img.load()
+    height = int(width * size[1] / size[0])
+    return (lambda: img.resize((width, height), getattr(Image.Resampling, resample))), size[0] * size[1]
+
+
+def _variants_case(size, widths):
+    from services.resize_json_service import resize_variants
+
+    data = encode(synthetic_image(size), "JPEG", quality=90)
+    return (lambda: resize_variants(data, widths)), size[0] * size[1]
+
+
+def _upscale_case(size, format, width_in, dpi, tiled):
+    from PIL import Image
+    from services.upscaler import upscale_image, upscale_save_kwargs, save_png_tiled, target_size
+
+    data = encode(synthetic_image(size), "JPEG", quality=90)
+    out_size = target_size(size, dpi, width_in)
+
+    def op():
+        img = Image.open(io.BytesIO(data))
+        sink = io.BytesIO()
+        if not tiled:
+            upscale_image(img, format, dpi, width_in).save(sink, **upscale_save_kwargs(format, dpi))
+        else:
+            save_png_tiled(img.convert("RGBA"), out_size, dpi, sink)
+    return op, out_size[0] * out_size[1]
+
+
+def _composite_case(layer_count):
+    from services.mockup_generator import composite_mockup
+
+    layers, folder = mockup_payload(layer_count)
+    user_img = synthetic_image((1500, 1500), "RGBA")
+    return (lambda: composite_mockup("bench", layers, folder, user_img)), 2000 * 2000
+
+
+def _generate_case(mockups, mode):
+    from services.mockup_generator import generate_mockups
+
+    layers, folder = mockup_payload(2)
+    names = [f"m{i}" for i in range(mockups)]
+    mockup_json = json.dumps({"mockups": {name: {"layers": layers} for name in names}})
+    mockup_images = {name: folder for name in names}
+    image_bytes = encode(synthetic_image((1500, 1500)), "JPEG", quality=90)
+
+    def op():
+        errors = {}
+        generate_mockups("BENCH", None, mockup_json, mockup_images, names, errors=errors, mode=mode,
+                         image_bytes=image_bytes, raw=True)
+        if errors:
+            raise RuntimeError(errors)
+    return op, 2000 * 2000 * mockups
+
+
+def _endpoint_case(path, body_fn, pixels, binary=False):
+    from app import app
+
+    client = app.test_client()
+    kwargs = body_fn()
+
+    def op():
+        headers = {"Accept": "image/*"} if binary else {}
+        request_kwargs = dict(kwargs)
+        if isinstance(kwargs.get("data"), dict):
+            # The test client closes uploaded files, so each request gets fresh ones.
+            request_kwargs["data"] = {k: (io.BytesIO(v[0]), v[1]) if isinstance(v, tuple) else v
+                                      for k, v in kwargs["data"].items()}
+        response = client.post(path, headers=headers, **request_kwargs)
+        response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+    return op, pixels
+
+
+def _resize_body(size, width):
+    def body():
+        data = encode(synthetic_image(size), "JPEG", quality=90)
+        return {"json": {"image": base64.b64encode(data).decode("ascii"), "width": width}}
+    return body
+
+
+def _upscale_body(size, width_in, format):
+    def body():
+        data = encode(synthetic_image(size), "JPEG", quality=90)
+        return {"data": data, "content_type": "image/jpeg",
+                "query_string": {"widthInches": width_in, "dpi": 300, "format": format}}
+    return body
+
+
+def _mockup_body(mockups):
+    def body():
+        layers, folder = mockup_payload(2)
+        names = [f"m{i}" for i in range(mockups)]
+        image = encode(synthetic_image((1500, 1500)), "JPEG", quality=90)
+        payload = {"sku": "BENCH", "imageDriveUrl": "unused", "mockups": names,
+                   "mockupJson": json.dumps({"mockups": {name: {"layers": layers} for name in names}}),
+                   "mockupImages": {name: folder for name in names}}
+        return {"data": {"payload": json.dumps(payload), "image": (image, "image.jpg")},
+                "content_type": "multipart/form-data"}
+    return body
+
+
+# name -> (setup, default iterations). setup() returns (op, pixels per op).
+CASES = {
+    "resize.jpeg.1000x750->300":     (lambda: _resize_case((1000, 750), 300, "JPEG"), 30),
+    "resize.jpeg.4000x3000->1200":   (lambda: _resize_case((4000, 3000), 1200, "JPEG"), 10),
+    "resize.png.2000x2000->600":     (lambda: _resize_case((2000, 2000), 600, "PNG"), 10),
+    "filter.nearest.4000x3000->1200":  (lambda: _filter_case((4000, 3000), 1200, "NEAREST"), 20),
+    "filter.bilinear.4000x3000->1200": (lambda: _filter_case((4000, 3000), 1200, "BILINEAR"), 20),
+    "filter.bicubic.4000x3000->1200":  (lambda: _filter_case((4000, 3000), 1200, "BICUBIC"), 20),
+    "filter.lanczos.4000x3000->1200":  (lambda: _filter_case((4000, 3000), 1200, "LANCZOS"), 20),
+    "variants.jpeg.4000x3000x3":     (lambda: _variants_case((4000, 3000), [1200, 600, 300]), 10),
+    "upscale.jpeg.1000->8in@300":    (lambda: _upscale_case((1000, 1000), "JPEG", 8, 300, False), 5),
+    "upscale.png.1000->8in@300":     (lambda: _upscale_case((1000, 1000), "PNG", 8, 300, False), 3),
+    "upscale.png.tiled.1000->8in@300": (lambda: _upscale_case((1000, 1000), "PNG", 8, 300, True), 3),
+    "composite.1-layer":             (lambda: _composite_case(1), 10),
+    "composite.4-layers":            (lambda: _composite_case(4), 10),
+    "composite.8-layers":            (lambda: _composite_case(8), 10),
+    "generate.4-mockups.serial":     (lambda: _generate_case(4, "serial"), 5),
+    "generate.4-mockups.thread":     (lambda: _generate_case(4, "thread"), 5),
+    "endpoint.resizeJson":           (lambda: _endpoint_case("/resizeJson", _resize_body((2000, 1500), 600), 2000 * 1500), 20),
+    "endpoint.upscaleOne.binary":    (lambda: _endpoint_case("/upscaleOne", _upscale_body((1000, 1000), 8, "JPEG"), 2400 * 2400, binary=True), 5),
+    "endpoint.generateMockups":      (lambda: _endpoint_case("/generateMockups", _mockup_body(3), 3 * 2000 * 2000), 5),
+}
+
+
+# ------------------------------- #
+#            Execution            #
+# ------------------------------- #
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def run_case(name, iterations):
+    """
+    Runs one case in this process and returns its measurements.
+    """
+    setup, _ = CASES[name]
+    op, pixels = setup()
+    op()  # warm-up: lazy imports, pools, template decode
+    rss_before = _peak_rss_mb()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        op()
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+
+    return {
+        "iterations":     iterations,
+        "ops_per_sec":    round(iterations / total, 3),
+        "mpix_per_sec":   round(iterations * pixels / total / 1e6, 2),
+        "mean_ms":        round(statistics.mean(latencies) * 1000, 2),
+        "p50_ms":         round(_percentile(latencies, 50) * 1000, 2),
+        "p99_ms":         round(_percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb":    _peak_rss_mb(),
+        "setup_rss_mb":   rss_before,
+    }
+
+
+def run_case_subprocess(name, iterations):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env["RESULT_CACHE_ENABLED"] = "false"
+    env.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "lystics-bench-metrics"))
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.image_bench", "--run-case", name, "--iterations", str(iterations)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns regression messages for cases slower (p50, throughput) or larger
+    (peak RSS) than the baseline by more than `threshold`.
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get("cases", {}).get(name)
+        if not before:
+            continue
+        if current["p50_ms"] > before["p50_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p50 {before['p50_ms']}ms -> {current['p50_ms']}ms")
+        if current["ops_per_sec"] < before["ops_per_sec"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {before['ops_per_sec']} -> {current['ops_per_sec']} ops/s")
+        if current["peak_rss_mb"] > before["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{name}: peak RSS {before['peak_rss_mb']}MB -> {current['peak_rss_mb']}MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Image service micro-benchmarks.")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--iterations", type=int, default=None, help="Override iterations per case")
+    parser.add_argument("--list", action="store_true", help="List cases and exit")
+    parser.add_argument("--save", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", help="Compare against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed relative regression")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args.iterations or CASES[args.run_case][1])))
+        return 0
+
+    names = [name for name in CASES if args.filter in name]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    results, failed = {}, {}
+    print(f"{'case':<34} {'ops/s':>8} {'MP/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'peak MB':>8}")
+    for name in names:
+        try:
+            r = results[name] = run_case_subprocess(name, args.iterations or CASES[name][1])
+        except Exception as e:
+            failed[name] = str(e)
+            print(f"{name:<34} ❌ {e}")
+            continue
+        print(f"{name:<34} {r['ops_per_sec']:>8.2f} {r['mpix_per_sec']:>8.1f} {r['p50_ms']:>9.1f} "
+              f"{r['p99_ms']:>9.1f} {r['peak_rss_mb']:>8.1f}")
+
+    if args.save:
+        from PIL import __version__ as pillow_version
+        with open(args.save, "w") as f:
+            json.dump({
+                "environment": {"python": platform.python_version(), "pillow": pillow_version,
+                                "machine": platform.machine(), "cpus": os.cpu_count()},
+                "cases": results,
+            }, f, indent=2)
+
+    status = 1 if failed else 0
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n❌ Regressions beyond {args.threshold:.0%}:")
+            for message in regressions:
+                print(f"   {message}")
+            status = 1
+        else:
+            print(f"\n✅ No regressions beyond {args.threshold:.0%}.")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+End-to-end benchmark of runManagerPipeline against the local GAS stand-in.
+
+Runs one pipeline pass per synthetic sheet size and reports wall time, GAS
+requests, per-function call counts and rows advanced per second:
+
+    python -m benchmarks.pipeline_bench
+    python -m benchmarks.pipeline_bench --sizes 10,100 --latency 0.05 --json out.json
+    python -m benchmarks.pipeline_bench --baseline out.json --threshold 0.2
+
+Rate limiting is switched off (memory backend, very high limits) unless
+--rate-limits is given, so the numbers measure the pipeline rather than the
+token buckets. With --baseline, a drop in rows/sec or a rise in GAS requests
+beyond the threshold is reported and the exit status is 1. --job-store runs
+the pipeline against a fresh local job store (JOB_STORE_ENABLED) per size.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+
+def run_once(size, standin_options, quiet=True):
+    import api.api_gateway as gateway
+    import agents.queue_gas_call as rate_limits
+    from agents.agent_manager import runManagerPipeline
+    from agents.pipeline_runs import PipelineRun
+    import models.job_store as job_store
+    from tools.gas_standin import GasStandIn, synthetic_rows
+
+    standin = GasStandIn(synthetic_rows(size), **standin_options)
+    gateway.GAS_BASE_URL = standin.start()
+    # Fresh breakers and buckets per size, so one run cannot throttle the next.
+    gateway._breakers.clear()
+    rate_limits._backend = None
+    store_dir = tempfile.TemporaryDirectory()
+    job_store._job_store = job_store.JobStore(os.path.join(store_dir.name, "jobs.db"))
+    job_store._job_syncer = job_store.JobSyncer(job_store._job_store, interval=3600)
+    initial = {row_id: row["Status"] for row_id, row in standin.rows.items()}
+
+    run = PipelineRun()
+    run.status = "running"
+    sink = open(os.devnull, "w") if quiet else sys.stdout
+    try:
+        with contextlib.redirect_stdout(sink):
+            started = time.perf_counter()
+            runManagerPipeline(run)
+            wall = time.perf_counter() - started
+            if run.status == "running":
+                run.status = "completed"
+            gateway.get_log_shipper().flush()
+    finally:
+        if quiet:
+            sink.close()
+        standin.stop()
+        store_dir.cleanup()
+
+    advanced = sum(1 for row_id, row in standin.rows.items() if row["Status"] != initial[row_id])
+    return {
+        "rows":          size,
+        "wall_seconds":  round(wall, 4),
+        "rows_advanced": advanced,
+        "rows_per_sec":  round(advanced / wall, 2) if wall else 0.0,
+        "tasks":         run.tasks_completed,
+        "deferred":      run.rows_deferred,
+        "completed":     sum(1 for row in standin.rows.values() if row["Status"] == "Completed"),
+        "gas_requests":  standin.request_count,
+        "http_errors":   standin.http_errors,
+        "calls":         dict(sorted(standin.call_counts.items())),
+        "failures":      dict(sorted(standin.failure_counts.items())),
+        "steps":         run.steps,
+        "status":        run.status,
+    }
+
+
+def print_report(results):
+    print(f"{'rows':>7} {'wall s':>9} {'advanced':>9} {'rows/s':>9} {'tasks':>7} {'done':>7} {'requests':>9}  status")
+    for r in results:
+        print(f"{r['rows']:>7} {r['wall_seconds']:>9.3f} {r['rows_advanced']:>9} {r['rows_per_sec']:>9.1f} "
+              f"{r['tasks']:>7} {r['completed']:>7} {r['gas_requests']:>9}  {r['status']}")
+    for r in results:
+        print(f"\n📊 {r['rows']} rows: steps {r['steps']}")
+        for function_name, count in r["calls"].items():
+            failed = r["failures"].get(function_name, 0)
+            print(f"   {function_name:<36} {count:>7}" + (f"  ({failed} failed)" if failed else ""))
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns a list of regression messages against a previous --json output.
+    """
+    previous = {r["rows"]: r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        before = previous.get(r["rows"])
+        if not before:
+            continue
+        if before["rows_per_sec"] and r["rows_per_sec"] < before["rows_per_sec"] * (1 - threshold):
+            regressions.append(f"{r['rows']} rows: rows/sec {before['rows_per_sec']} -> {r['rows_per_sec']}")
+        if before["gas_requests"] and r["gas_requests"] > before["gas_requests"] * (1 + threshold):
+            regressions.append(f"{r['rows']} rows: GAS requests {before['gas_requests']} -> {r['gas_requests']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark runManagerPipeline against the local GAS stand-in.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma-separated sheet sizes")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every GAS request")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--http-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rate-limits", action="store_true", help="Keep the configured GAS rate limits")
+    parser.add_argument("--job-store", action="store_true", help="Read and write jobs through the local job store")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline output")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Compare against a previous --json file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    if not args.rate_limits:
+        from agents.workflow_config import gas_rate_limits
+        os.environ["RATE_LIMIT_BACKEND"] = "memory"
+        os.environ["GAS_RATE_LIMITS"] = json.dumps({name: {"rate": 1e9, "burst": 1e9} for name in gas_rate_limits})
+
+    if args.job_store:
+        os.environ["JOB_STORE_ENABLED"] = "true"
+
+    options = {"latency": args.latency, "jitter": args.jitter, "failure_rate": args.failure_rate,
+               "http_error_rate": args.http_error_rate, "seed": args.seed}
+    results = []
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        results.append(run_once(size, options, quiet=not args.verbose))
+        print(f"✅ {size} rows in {results[-1]['wall_seconds']:.3f}s", file=sys.stderr)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"options": options, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for message in regressions:
+                print(f"   {message}")
+            return 1
+        print("\n✅ No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
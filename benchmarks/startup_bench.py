@@ -0,0 +1,87 @@
+"""
+Cold-start benchmark: time from a fresh interpreter to the first /healthz response.
+
+Each sample starts a new Python process that builds the app and serves one
+/healthz request through the test client, so it measures import and app
+construction cost the way a scale-to-zero instance pays it:
+
+    python -m benchmarks.startup_bench
+    python -m benchmarks.startup_bench --runs 10 --eager --report
+
+--eager also resolves every lazy view before the request (what the app cost
+before lazy loading), and --report prints the per-package import breakdown
+from one extra run with STARTUP_REPORT enabled.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sys, time
+from app import app, warmup_views
+if sys.argv[1] == "eager":
+    for view in warmup_views():
+        view.resolve()
+response = app.test_client().get("/healthz")
+assert response.status_code == 200, response.status_code
+print(json.dumps({"modules": len(sys.modules), "ready": app.config["APP_READY_SECONDS"]}))
+"""
+
+
+def sample(mode, env=None):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD, mode], cwd=REPO_ROOT, check=True,
+                            capture_output=True, text=True, env=env).stdout
+    wall = time.perf_counter() - started
+    result = json.loads(output.strip().splitlines()[-1])
+    return {"wall": wall, **result}
+
+
+def summarize(mode, runs):
+    samples = [sample(mode) for _ in range(runs)]
+    walls = [s["wall"] for s in samples]
+    return {
+        "mode":         mode,
+        "runs":         runs,
+        "median_ms":    round(statistics.median(walls) * 1000, 1),
+        "min_ms":       round(min(walls) * 1000, 1),
+        "app_ready_ms": round(statistics.median(s["ready"] for s in samples) * 1000, 1),
+        "modules":      samples[-1]["modules"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure time to the first /healthz response.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--eager", action="store_true", help="Also measure with every view imported up front")
+    parser.add_argument("--report", action="store_true", help="Print the startup import report")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    modes = ["lazy", "eager"] if args.eager else ["lazy"]
+    results = [summarize(mode, args.runs) for mode in modes]
+
+    print(f"{'mode':<7} {'median ms':>10} {'min ms':>8} {'app ready ms':>13} {'modules':>8}")
+    for r in results:
+        print(f"{r['mode']:<7} {r['median_ms']:>10} {r['min_ms']:>8} {r['app_ready_ms']:>13} {r['modules']:>8}")
+
+    if args.report:
+        env = dict(os.environ, STARTUP_REPORT="true")
+        output = subprocess.run([sys.executable, "-c", "import app"], cwd=REPO_ROOT, check=True,
+                                capture_output=True, text=True, env=env).stdout
+        print("\n" + output.strip())
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# gunicorn.conf.py
+# Picked up automatically by gunicorn from the working directory.
+import os
+import threading
+
+# "lazy": each worker imports services on first use (fastest first response when
+#         scaled to zero). "preload": the master imports everything once before
+#         forking and each worker warms its image pools in the background.
+WARMUP_MODE = os.environ.get("WARMUP_MODE", "lazy")
+
+preload_app = WARMUP_MODE == "preload"
+
+# Threaded workers: /priceCheck streams for up to PRICE_CHECK_DEADLINE seconds and
+# render requests wait on the admission gate, so one sync worker per process would
+# let a single slow request block every other caller.
+worker_class = "gthread"
+workers      = int(os.environ.get("WEB_CONCURRENCY", 1))
+threads      = int(os.environ.get("GUNICORN_THREADS", 8))
+
+
+def on_starting(server):
+    """
+    Drop metrics snapshots left by a previous deployment's workers.
+    """
+    from api.metrics import reset_metrics_dir
+    reset_metrics_dir()
+
+
+def when_ready(server):
+    """
+    With preload_app, the app is already imported here: load the lazy views and
+    Pillow plugins once so every forked worker shares them.
+    """
+    if preload_app:
+        from app import warmup_views
+        from api.startup import preload
+        preload(warmup_views())
+
+
+def post_fork(server, worker):
+    """
+    Start each worker's thread and process pools without delaying its first request.
+    """
+    if preload_app:
+        from app import warmup_views
+        from api.startup import warmup
+        threading.Thread(target=warmup, args=(warmup_views(),), name="warmup", daemon=True).start()
+
+
+def worker_exit(server, worker):
+    """
+    Ship any buffered log entries and write a final metrics snapshot before the
+    worker process goes away.
+    """
+    from api.api_gateway import shutdown_log_shipper
+    from api.metrics import metrics
+    shutdown_log_shipper()
+    metrics.flush()
@@ -1,3 +1,83 @@
+import datetime
+
+PROCESSING_PREFIX = "Processing:"
+
+
+def parse_timestamp(value):
+    """
+    Sheet timestamps arrive as ISO strings (Apps Script dates end in "Z"), blanks
+    or datetimes. Returns a naive UTC datetime, or None when missing or unparseable.
+    """
+    if isinstance(value, datetime.datetime):
+        parsed = value
+    elif isinstance(value, str) and value.strip():
+        try:
+            parsed = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    else:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _text(value):
+    return str(value).strip() if value is not None else ""
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 class LysticsJob:
-    def __init__(self, row_id, sku, job_id, status, workflow_type, assigned_worker):
-        ...
+    """
+    One sheet row, parsed once from the GAS payload. `status` is the workflow step
+    with any "Processing: " claim prefix removed (the claim is kept in `processing`),
+    and `last_attempted` is a naive UTC datetime.
+    """
+    __slots__ = ("row_id", "sku", "job_id", "status", "workflow_type", "assigned_worker",
+                 "last_attempted", "error_count", "processing")
+
+    def __init__(self, row_id, sku, job_id, status, workflow_type, assigned_worker,
+                 last_attempted=None, error_count=None, processing=False):
+        self.row_id = row_id
+        self.sku = sku
+        self.job_id = job_id
+        self.status = status
+        self.workflow_type = workflow_type
+        self.assigned_worker = assigned_worker
+        self.last_attempted = last_attempted
+        self.error_count = error_count
+        self.processing = processing
+
+    @classmethod
+    def from_row(cls, row, error_count_field="Error Count"):
+        status = _text(row.get("Status"))
+        processing = status.startswith(PROCESSING_PREFIX)
+        if processing:
+            status = status[len(PROCESSING_PREFIX):].strip()
+        return cls(
+            row_id=row.get("Row"),
+            sku=_text(row.get("SKU") or row.get("Title")),
+            job_id=_text(row.get("Job ID")),
+            status=status,
+            workflow_type=_text(row.get("Workflow Type")),
+            assigned_worker=_text(row.get("Assigned Worker")),
+            last_attempted=parse_timestamp(row.get("Last Attempted")),
+            error_count=_int_or_none(row.get(error_count_field)),
+            processing=processing,
+        )
+
+    @property
+    def sheet_status(self):
+        """
+        The status as written in the sheet, including any processing claim.
+        """
+        return f"{PROCESSING_PREFIX} {self.status}" if self.processing else self.status
+
+    def __repr__(self):
+        return f"LysticsJob(row={self.row_id}, status={self.sheet_status!r}, worker={self.assigned_worker!r})"
@@ -0,0 +1,463 @@
+"""
+Local SQLite mirror of the job sheet with write-behind sync.
+
+The pipeline reads jobs and writes status, assignment and error-count changes
+locally; every change is also queued in an outbox. A background syncer pushes
+the outbox to the sheet in batched runBatch calls; the sheet is pulled back in
+on demand, once per pipeline run, rather than on a timer in every process.
+
+Conflicts are resolved per field against the last value known to be in the sheet
+(the "base"): if the sheet still holds the base value, local changes stand and are
+pushed; if the sheet differs from the base, someone edited it by hand (or another
+instance wrote it), the sheet value wins and pending local changes to that field
+are dropped.
+"""
+import datetime
+import fcntl
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from api.api_gateway import call_gas_function, call_gas_batch, log_action, BATCH_MAX_OPS, \
+    function_supported, mark_unsupported, is_unknown_function
+from models.job_model import LysticsJob
+
+JOB_STORE_ENABLED   = os.environ.get("JOB_STORE_ENABLED", "false").lower() in ("1", "true", "yes")
+JOB_STORE_PATH      = os.environ.get("JOB_STORE_PATH", os.path.join(tempfile.gettempdir(), "lystics-jobs.db"))
+JOB_SYNC_INTERVAL   = float(os.environ.get("JOB_SYNC_INTERVAL", 30))
+JOB_SYNC_LOCK_WAIT  = float(os.environ.get("JOB_SYNC_LOCK_WAIT", 60))
+ERROR_COUNT_FIELD   = "Error Count"
+FINAL_STATUSES      = ("Completed", "Supervisor")
+
+# Sheet field -> (local column, base column)
+SYNCED_FIELDS = {
+    "Status":          ("status", "base_status"),
+    "Assigned Worker": ("assigned_worker", "base_assigned_worker"),
+    "Job ID":          ("job_id", "base_job_id"),
+    ERROR_COUNT_FIELD: ("error_count", "base_error_count"),
+}
+# Outbox op kinds that carry each sheet field.
+FIELD_OPS = {"Status": ("status",), "Assigned Worker": ("assign",), "Job ID": ("assign",), ERROR_COUNT_FIELD: ("error_increment",)}
+
+
+def _now_iso():
+    return datetime.datetime.utcnow().isoformat()
+
+
+class StoreBatch:
+    """
+    GasBatch-compatible collector for row state writes: add() the same
+    updateRowStatus / updateRowAssignments(Bulk) / incrementProgressErrorCount
+    operations, and flush() applies them locally in one transaction.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.pending = []
+        self.results = []
+        self._lock = threading.Lock()
+
+    def add(self, function_name, params=None):
+        with self._lock:
+            self.pending.append({"function": function_name, "params": params or {}})
+
+    def flush(self):
+        with self._lock:
+            ops, self.pending = self.pending, []
+        if not ops:
+            return []
+        results = self.store.apply(ops)
+        with self._lock:
+            self.results.extend(results)
+        return results
+
+    @property
+    def errors(self):
+        return [r for r in self.results if not r["success"]]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+
+class JobStore:
+    def __init__(self, path=JOB_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self.counters = {"pushes": 0, "pushed_ops": 0, "push_failures": 0, "pulls": 0,
+                         "pulled_rows": 0, "sheet_edits": 0, "conflicts": 0}
+        self._counter_lock = threading.Lock()
+
+    # ---------- connection ---------- #
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                row_id INTEGER PRIMARY KEY, data TEXT NOT NULL,
+                status TEXT, assigned_worker TEXT, job_id TEXT, error_count INTEGER, last_attempted TEXT,
+                base_status TEXT, base_assigned_worker TEXT, base_job_id TEXT, base_error_count INTEGER,
+                active INTEGER NOT NULL DEFAULT 1, updated_at REAL NOT NULL)""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, row_id INTEGER NOT NULL, op TEXT NOT NULL,
+                payload TEXT NOT NULL, created_at REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_row ON outbox (row_id, op)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, key, n=1):
+        with self._counter_lock:
+            self.counters[key] += n
+
+    # ---------- local reads ---------- #
+    def load_jobs(self):
+        """
+        Active, unfinished jobs as LysticsJob objects, in sheet row order.
+        """
+        jobs = []
+        for row_id, data, status, worker, job_id, error_count, last_attempted in self._conn().execute(
+                "SELECT row_id, data, status, assigned_worker, job_id, error_count, last_attempted FROM jobs "
+                "WHERE active = 1 ORDER BY row_id"):
+            if status in FINAL_STATUSES:
+                continue
+            row = json.loads(data)
+            row.update({"Row": row_id, "Status": status, "Assigned Worker": worker or "", "Job ID": job_id or "",
+                        ERROR_COUNT_FIELD: error_count, "Last Attempted": last_attempted or ""})
+            jobs.append(LysticsJob.from_row(row, ERROR_COUNT_FIELD))
+        return jobs
+
+    def pending_count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    # ---------- local writes ---------- #
+    def batch(self):
+        return StoreBatch(self)
+
+    def apply(self, ops):
+        """
+        Applies state-writing operations in one transaction, queueing each for push.
+        Returns GasBatch-style per-operation results.
+        """
+        conn = self._conn()
+        now = time.time()
+        results = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for op in ops:
+                function_name, params = op["function"], op["params"]
+                try:
+                    result = self._apply_one(conn, function_name, params, now)
+                    results.append({"function": function_name, "success": True, "result": result, "error": None})
+                except (KeyError, ValueError) as e:
+                    results.append({"function": function_name, "success": False, "result": None, "error": str(e)})
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return results
+
+    def _apply_one(self, conn, function_name, params, now):
+        if function_name == "updateRowStatus":
+            self._require(conn, params["row"])
+            conn.execute("UPDATE jobs SET status = ?, last_attempted = ?, updated_at = ? WHERE row_id = ?",
+                         (params["new_status"], _now_iso(), now, params["row"]))
+            self._enqueue(conn, params["row"], "status", {"new_status": params["new_status"]}, now)
+            return {"row": params["row"], "status": params["new_status"]}
+
+        if function_name in ("updateRowAssignments", "updateRowAssignmentsBulk"):
+            assignments = params.get("assignments") if function_name == "updateRowAssignmentsBulk" else [params]
+            for a in assignments:
+                self._require(conn, a["row"])
+                conn.execute("UPDATE jobs SET assigned_worker = ?, job_id = ?, updated_at = ? WHERE row_id = ?",
+                             (a["assigned_worker"], a["job_id"], now, a["row"]))
+                self._enqueue(conn, a["row"], "assign", {"assigned_worker": a["assigned_worker"], "job_id": a["job_id"]}, now)
+            return {"updated": len(assignments)}
+
+        if function_name == "incrementProgressErrorCount":
+            self._require(conn, params["row"])
+            conn.execute("UPDATE jobs SET error_count = COALESCE(error_count, 0) + 1, updated_at = ? WHERE row_id = ?",
+                         (now, params["row"]))
+            self._enqueue(conn, params["row"], "error_increment", {}, now)
+            count = conn.execute("SELECT error_count FROM jobs WHERE row_id = ?", (params["row"],)).fetchone()[0]
+            return {"count": count}
+
+        raise ValueError(f"{function_name} is not a job store operation")
+
+    @staticmethod
+    def _require(conn, row_id):
+        if conn.execute("SELECT 1 FROM jobs WHERE row_id = ?", (row_id,)).fetchone() is None:
+            raise KeyError(f"Row {row_id} not found")
+
+    @staticmethod
+    def _enqueue(conn, row_id, op, payload, now):
+        conn.execute("INSERT INTO outbox (row_id, op, payload, created_at) VALUES (?, ?, ?, ?)",
+                     (row_id, op, json.dumps(payload), now))
+
+    # ---------- sync ---------- #
+    def sync(self, wait=JOB_SYNC_LOCK_WAIT):
+        """
+        Pushes pending changes, then pulls the sheet. Only one thread or process on
+        the host syncs at a time; waits up to `wait` seconds for a running sync to
+        finish and returns False if it still holds the lock.
+        """
+        return self._locked(wait, lambda: (self._push(), self._pull()))
+
+    def push(self, wait=JOB_SYNC_LOCK_WAIT):
+        """
+        Pushes pending changes only (e.g. at the end of a pipeline run). Returns
+        False when the sync lock could not be had within `wait` seconds.
+        """
+        return self._locked(wait, self._push)
+
+    def _locked(self, wait, fn):
+        deadline = time.monotonic() + wait
+        if not self._sync_lock.acquire(timeout=max(wait, 0)):
+            return False
+        try:
+            with open(f"{self.path}.sync.lock", "w") as lock_file:
+                while True:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() >= deadline:
+                            return False
+                        time.sleep(0.1)
+                fn()
+                return True
+        finally:
+            self._sync_lock.release()
+
+    def _push(self):
+        conn = self._conn()
+        entries = conn.execute("SELECT id, row_id, op, payload FROM outbox ORDER BY id").fetchall()
+        if not entries:
+            return
+
+        # Coalesce: the last status and assignment per row win; error increments add up.
+        latest = {}
+        increments = {}
+        for entry_id, row_id, op, payload in entries:
+            if op == "error_increment":
+                ids, n = increments.get(row_id, ([], 0))
+                increments[row_id] = (ids + [entry_id], n + 1)
+            else:
+                ids, _ = latest.get((row_id, op), ([], None))
+                latest[(row_id, op)] = (ids + [entry_id], json.loads(payload))
+
+        ops, owners = [], []
+        assignments = [(ids, row_id, payload) for (row_id, op), (ids, payload) in latest.items() if op == "assign"]
+        if assignments and function_supported("updateRowAssignmentsBulk"):
+            ops.append({"function": "updateRowAssignmentsBulk", "params": {"assignments": [
+                {"row": row_id, "assigned_worker": p["assigned_worker"], "job_id": p["job_id"]}
+                for _, row_id, p in assignments]}})
+            owners.append(("assign", assignments))
+        else:
+            for item in assignments:
+                _, row_id, p = item
+                ops.append({"function": "updateRowAssignments", "params": {
+                    "row": row_id, "assigned_worker": p["assigned_worker"], "job_id": p["job_id"]}})
+                owners.append(("assign", [item]))
+        for (row_id, op), (ids, payload) in latest.items():
+            if op == "status":
+                ops.append({"function": "updateRowStatus", "params": {"row": row_id, "new_status": payload["new_status"]}})
+                owners.append(("status", [(ids, row_id, payload)]))
+        for row_id, (ids, n) in increments.items():
+            for i in range(n):
+                ops.append({"function": "incrementProgressErrorCount", "params": {"row": row_id}})
+                owners.append(("error_increment", [([ids[i]], row_id, None)]))
+
+        results = []
+        for start in range(0, len(ops), BATCH_MAX_OPS):
+            results.extend(call_gas_batch(ops[start:start + BATCH_MAX_OPS]))
+
+        done = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for (kind, items), result in zip(owners, results):
+                if not result["success"]:
+                    print(f"⚠️ Job store push of {result['function']} failed: {result['error']}")
+                    if result["function"] == "updateRowAssignmentsBulk" and is_unknown_function(result["error"]):
+                        # Left in the outbox; the next push sends them one row at a time.
+                        mark_unsupported("updateRowAssignmentsBulk")
+                    continue
+                for ids, row_id, payload in items:
+                    deleted = conn.execute(
+                        f"DELETE FROM outbox WHERE id IN ({','.join('?' * len(ids))})", ids
+                    ).rowcount
+                    if not deleted:
+                        # A pull dropped these in favour of a sheet edit meanwhile.
+                        continue
+                    if kind == "status":
+                        conn.execute("UPDATE jobs SET base_status = ? WHERE row_id = ?", (payload["new_status"], row_id))
+                    elif kind == "assign":
+                        conn.execute("UPDATE jobs SET base_assigned_worker = ?, base_job_id = ? WHERE row_id = ?",
+                                     (payload["assigned_worker"], payload["job_id"], row_id))
+                    else:
+                        conn.execute("UPDATE jobs SET base_error_count = COALESCE(base_error_count, 0) + 1 WHERE row_id = ?",
+                                     (row_id,))
+                    done += len(ids)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._count("pushes")
+        self._count("pushed_ops", done)
+        if done < len(entries):
+            self._count("push_failures")
+
+    def _pull(self):
+        result = call_gas_function("getRowsNeedingProcessing", {})
+        rows = result.get("rows", []) if isinstance(result, dict) else []
+        self._count("pulls")
+        self._count("pulled_rows", len(rows))
+
+        conn = self._conn()
+        known = {r[0] for r in conn.execute("SELECT row_id FROM jobs")}
+        new_ids = [row.get("Row") for row in rows if row.get("Row") not in known and ERROR_COUNT_FIELD not in row]
+        error_counts = {}
+        if new_ids:
+            try:
+                fetched = call_gas_function("getProgressErrorCounts", {"rows": new_ids}).get("counts", {})
+                error_counts = {row_id: int(fetched.get(str(row_id), fetched.get(row_id, 0)) or 0) for row_id in new_ids}
+            except Exception as e:
+                print(f"⚠️ Error-count fetch for new rows failed: {e}")
+
+        now = time.time()
+        edits = conflicts = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seen = set()
+            for row in rows:
+                row_id = row.get("Row")
+                seen.add(row_id)
+                sheet = {
+                    "Status":          row.get("Status", ""),
+                    "Assigned Worker": row.get("Assigned Worker", "") or "",
+                    "Job ID":          row.get("Job ID", "") or "",
+                    ERROR_COUNT_FIELD: _int_or_none(row.get(ERROR_COUNT_FIELD, error_counts.get(row_id))),
+                }
+                data = json.dumps({k: v for k, v in row.items() if k not in SYNCED_FIELDS and k != "Row"})
+
+                current = conn.execute(
+                    "SELECT status, assigned_worker, job_id, error_count, base_status, base_assigned_worker, "
+                    "base_job_id, base_error_count, last_attempted FROM jobs WHERE row_id = ?", (row_id,)
+                ).fetchone()
+                if current is None:
+                    conn.execute(
+                        "INSERT INTO jobs (row_id, data, status, assigned_worker, job_id, error_count, last_attempted, "
+                        "base_status, base_assigned_worker, base_job_id, base_error_count, active, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)",
+                        (row_id, data, sheet["Status"], sheet["Assigned Worker"], sheet["Job ID"], sheet[ERROR_COUNT_FIELD],
+                         row.get("Last Attempted") or "", sheet["Status"], sheet["Assigned Worker"], sheet["Job ID"],
+                         sheet[ERROR_COUNT_FIELD], now))
+                    continue
+
+                local = dict(zip(("Status", "Assigned Worker", "Job ID", ERROR_COUNT_FIELD), current[:4]))
+                base = dict(zip(("Status", "Assigned Worker", "Job ID", ERROR_COUNT_FIELD), current[4:8]))
+                updates = {"data": data, "active": 1, "updated_at": now}
+                for field, (column, base_column) in SYNCED_FIELDS.items():
+                    if sheet[field] is None or sheet[field] == base[field]:
+                        continue
+                    # The sheet moved away from what we last wrote or read: a manual edit wins.
+                    edits += 1
+                    pending = conn.execute(
+                        f"DELETE FROM outbox WHERE row_id = ? AND op IN ({','.join('?' * len(FIELD_OPS[field]))})",
+                        (row_id, *FIELD_OPS[field])
+                    ).rowcount
+                    if pending or local[field] != base[field]:
+                        conflicts += 1
+                        print(f"⚠️ Row {row_id} {field}: sheet edit {sheet[field]!r} overrides local {local[field]!r}")
+                    updates[column] = sheet[field]
+                    updates[base_column] = sheet[field]
+                if row.get("Last Attempted") and (row["Last Attempted"] > (current[8] or "")):
+                    updates["last_attempted"] = row["Last Attempted"]
+                assignments = ", ".join(f"{column} = ?" for column in updates)
+                conn.execute(f"UPDATE jobs SET {assignments} WHERE row_id = ?", (*updates.values(), row_id))
+
+            # Rows the sheet no longer lists were finished or removed there; keep the
+            # ones with unpushed local changes until those go out.
+            pending_rows = {r[0] for r in conn.execute("SELECT DISTINCT row_id FROM outbox")}
+            for row_id in known - seen - pending_rows:
+                conn.execute("UPDATE jobs SET active = 0, updated_at = ? WHERE row_id = ?", (now, row_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._count("sheet_edits", edits)
+        self._count("conflicts", conflicts)
+        if conflicts:
+            log_action("JobStore", "Sync Conflict", f"{conflicts} local change(s) overridden by sheet edits.", agent="Manager")
+
+    def stats(self):
+        with self._counter_lock:
+            stats = dict(self.counters)
+        conn = self._conn()
+        stats["pending"] = self.pending_count()
+        stats["active_jobs"] = conn.execute("SELECT COUNT(*) FROM jobs WHERE active = 1").fetchone()[0]
+        return stats
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class JobSyncer:
+    """
+    Background thread that pushes the job store's outbox every `interval`
+    seconds. Started lazily, and again after a fork, so each process runs its
+    own; an empty outbox costs no GAS call. Pulls happen once per pipeline run.
+    """
+    def __init__(self, store, interval=JOB_SYNC_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            threading.Thread(target=self._run, name="job-store-sync", daemon=True).start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.store.push(wait=0)
+            except Exception as e:
+                print(f"⚠️ Job store push failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+
+_job_store = None
+_job_syncer = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store(start_syncer=True):
+    global _job_store, _job_syncer
+    with _job_store_lock:
+        if _job_store is None:
+            _job_store = JobStore()
+            _job_syncer = JobSyncer(_job_store)
+    if start_syncer:
+        _job_syncer.ensure_started()
+    return _job_store
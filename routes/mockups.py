@@ -1,26 +1,123 @@
 # routes/mockups.py
 
-from flask import Blueprint, request, jsonify
-from services.mockup_generator import generate_mockups  # You may need to create this
+import hashlib
+import json
+from flask import Blueprint, Response, request, jsonify
+from services.image_io import wants_binary, multipart_response
+from services.result_cache import not_modified
 
 mockup_bp = Blueprint('mockup', __name__)
 
+def read_mockup_request():
+    """
+    Returns (data, image_bytes). Accepts the original JSON body, or multipart/form-data
+    with the same keys in a `payload` JSON field, an optional `image` file used instead
+    of imageDriveUrl, and layer files named "<mockupName>/<fileName>" for mockupImages.
+    """
+    if request.mimetype != 'multipart/form-data':
+        return request.get_json(), None
+
+    data = json.loads(request.form.get('payload') or '{}')
+    image_bytes = None
+    for field, upload in request.files.items(multi=True):
+        if field == 'image':
+            image_bytes = upload.read()
+        elif '/' in field:
+            mockup_name, file_name = field.split('/', 1)
+            data.setdefault('mockupImages', {}).setdefault(mockup_name, {})[file_name] = upload.read()
+    return data, image_bytes
+
 @mockup_bp.route('/generateMockups', methods=['POST'])
 def handle_generate_mockups():
+    # Pillow and the generator load on first use, not at app startup.
+    from services.mockup_generator import generate_mockups
+    from services.render_pipeline import parse_output_specs, RENDER_FORMATS, RenderBudgetError
     try:
-        data = request.get_json()
+        data, image_bytes = read_mockup_request()
         sku = data.get('sku')
         image_url = data.get('imageDriveUrl')
         mockup_json = data.get('mockupJson')
         mockup_images = data.get('mockupImages')
         mockup_names = data.get('mockups')
 
-        if not all([sku, image_url, mockup_json, mockup_images]):
+        if not all([sku, image_url or image_bytes, mockup_json, mockup_images]):
             return jsonify({'error': 'Missing required fields'}), 400
 
-        results = generate_mockups(sku, image_url, mockup_json, mockup_images, mockup_names)
+        # Optional render outputs: every listed variant (thumbnail, print size, WebP...)
+        # is produced from each composite in memory, with no follow-up resize/upscale call.
+        outputs = None
+        if data.get('outputs'):
+            try:
+                outputs = parse_output_specs(data['outputs'])
+            except (ValueError, TypeError, KeyError) as e:
+                return jsonify({'error': f'Invalid outputs: {e}'}), 400
+
+        binary = wants_binary(request)
+        errors = {}
+        cache_keys = {}
+        results = generate_mockups(sku, image_url, mockup_json, mockup_images, mockup_names,
+                                   errors=errors, mode=data.get('parallel'),
+                                   image_bytes=image_bytes, raw=binary, cache_keys=cache_keys, outputs=outputs)
 
-        return jsonify({ 'results': results }), 200
+        single = binary and not outputs and len(results) == 1 and not errors and \
+            request.accept_mimetypes.best_match(['image/jpeg', 'multipart/mixed']) == 'image/jpeg'
 
+        # Only complete, error-free responses get an ETag; the representation is part of it.
+        headers = {}
+        if results and not errors and all(name in cache_keys for name in results):
+            representation = 'jpeg' if single else ('multipart' if binary else 'json')
+            combined = '|'.join([representation] + [cache_keys[name] for name in results])
+            etag = hashlib.sha256(combined.encode('utf-8')).hexdigest()
+            unchanged = not_modified(request, etag)
+            if unchanged:
+                return unchanged
+            headers = {'ETag': f'"{etag}"', 'Vary': 'Accept'}
+
+        if binary:
+            if single:
+                name, jpeg = next(iter(results.items()))
+                return Response(jpeg, mimetype='image/jpeg', headers={**headers, 'X-Mockup-Name': name})
+            if outputs:
+                formats = {spec['name']: RENDER_FORMATS[spec['format']] for spec in outputs}
+                parts = [(f'{name}/{output}', image, formats[output])
+                         for name, variants in results.items() for output, image in variants.items()]
+            else:
+                parts = [(name, jpeg, 'image/jpeg') for name, jpeg in results.items()]
+            if errors:
+                parts.append(('errors', errors, 'application/json'))
+            return multipart_response(parts, headers=headers)
+
+        return jsonify({ 'results': results, 'errors': errors }), 200, headers
+
+    except RenderBudgetError as e:
+        return e.response()
     except Exception as e:
         return jsonify({ 'error': str(e) }), 500
+
+
+@mockup_bp.route('/mockupTemplates', methods=['POST'])
+def handle_register_templates():
+    """
+    Registers mockup layer images once by ID: {"templates": {"<id>": "<base64>", ...}}.
+    /generateMockups can then reference them in mockupImages as "template:<id>".
+    """
+    from services.template_cache import register_template
+    try:
+        data = request.get_json()
+        templates = (data or {}).get('templates')
+        if not templates or not isinstance(templates, dict):
+            return jsonify({'error': 'Missing required field: templates'}), 400
+
+        registered = {template_id: register_template(template_id, b64) for template_id, b64 in templates.items()}
+        return jsonify({'registered': registered}), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@mockup_bp.route('/mockupTemplates/stats', methods=['GET'])
+def handle_template_stats():
+    from services.template_cache import template_cache
+    return jsonify(template_cache.stats()), 200
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+import requests
+from requests.adapters import HTTPAdapter
+
+IMAGE_FETCH_CONNECT_TIMEOUT = float(os.environ.get("IMAGE_FETCH_CONNECT_TIMEOUT", 5))
+IMAGE_FETCH_READ_TIMEOUT    = float(os.environ.get("IMAGE_FETCH_READ_TIMEOUT", 30))
+IMAGE_FETCH_MAX_MB          = int(os.environ.get("IMAGE_FETCH_MAX_MB", 50))
+IMAGE_FETCH_POOL_SIZE       = int(os.environ.get("IMAGE_FETCH_POOL_SIZE", 16))
+IMAGE_FETCH_FRESH_SECONDS   = float(os.environ.get("IMAGE_FETCH_FRESH_SECONDS", 300))
+IMAGE_FETCH_CACHE_MB        = int(os.environ.get("IMAGE_FETCH_CACHE_MB", 1024))
+IMAGE_FETCH_CACHE_DIR       = os.environ.get("IMAGE_FETCH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lystics-downloads"))
+FETCH_CHUNK_SIZE            = 64 * 1024
+
+
+class ImageFetchError(Exception):
+    pass
+
+
+class ImageFetcher:
+    """
+    Downloads user images over a pooled keep-alive session into a disk cache
+    keyed by URL. A cached copy is served without a request while fresh, then
+    revalidated with If-None-Match / If-Modified-Since; concurrent fetches of the
+    same URL share one in-flight download.
+    """
+    def __init__(self, cache_dir=IMAGE_FETCH_CACHE_DIR, max_bytes=IMAGE_FETCH_MAX_MB * 2**20,
+                 cache_bytes=IMAGE_FETCH_CACHE_MB * 2**20, fresh_seconds=IMAGE_FETCH_FRESH_SECONDS,
+                 timeout=(IMAGE_FETCH_CONNECT_TIMEOUT, IMAGE_FETCH_READ_TIMEOUT)):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache_bytes = cache_bytes
+        self.fresh_seconds = fresh_seconds
+        self.timeout = timeout
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.counters = {"fresh_hits": 0, "revalidated": 0, "downloads": 0, "deduplicated": 0,
+                         "errors": 0, "bytes_downloaded": 0}
+
+    def _get_session(self):
+        # Built lazily, and again after a fork, so each worker has its own pool.
+        with self._lock:
+            if self._session is None or self._session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=IMAGE_FETCH_POOL_SIZE, max_retries=1)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session, self._session_pid = session, os.getpid()
+            return self._session
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json"), os.path.join(self.cache_dir, f"{key}.bin")
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def fetch(self, url):
+        """
+        Returns the image bytes for url, from cache when possible.
+        """
+        with self._lock:
+            future = self._inflight.get(url)
+            leader = future is None
+            if leader:
+                future = self._inflight[url] = Future()
+            else:
+                self.counters["deduplicated"] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            data = self._fetch(url)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            self._count("errors")
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+
+    def _fetch(self, url):
+        meta_path, data_path = self._paths(url)
+        meta = None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if not os.path.exists(data_path):
+                meta = None
+        except (OSError, ValueError):
+            pass
+
+        if meta and time.time() - meta.get("checked_at", 0) < self.fresh_seconds:
+            data = self._read_cached(data_path)
+            if data is not None:
+                self._count("fresh_hits")
+                return data
+
+        headers = {}
+        if meta and meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta and meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        with self._get(url, headers) as resp:
+            if resp.status_code == 304 and meta:
+                data = self._read_cached(data_path)
+                if data is not None:
+                    meta["checked_at"] = time.time()
+                    self._write_meta(meta_path, meta)
+                    self._count("revalidated")
+                    return data
+            elif resp.status_code != 304:
+                return self._download(url, meta_path, data_path, resp)
+
+        # The cached body vanished under us; download unconditionally.
+        with self._get(url, {}) as resp:
+            return self._download(url, meta_path, data_path, resp)
+
+    def _get(self, url, headers):
+        try:
+            return self._get_session().get(url, headers=headers, timeout=self.timeout, stream=True)
+        except requests.exceptions.RequestException as e:
+            raise ImageFetchError(f"Failed to fetch {url}: {e}")
+
+    def _download(self, url, meta_path, data_path, resp):
+        if resp.status_code != 200:
+            raise ImageFetchError(f"Failed to fetch {url}: HTTP {resp.status_code}")
+
+        length = resp.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            raise ImageFetchError(f"Image at {url} is {int(length)} bytes, over the {self.max_bytes} byte limit")
+
+        body = bytearray()
+        try:
+            for chunk in resp.iter_content(FETCH_CHUNK_SIZE):
+                body += chunk
+                if len(body) > self.max_bytes:
+                    raise ImageFetchError(f"Image at {url} exceeds the {self.max_bytes} byte limit")
+        except requests.exceptions.RequestException as e:
+            raise ImageFetchError(f"Failed to fetch {url}: {e}")
+
+        data = bytes(body)
+        self._count("downloads")
+        self._count("bytes_downloaded", len(data))
+        self._store(meta_path, data_path, {
+            "url":           url,
+            "etag":          resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "size":          len(data),
+            "checked_at":    time.time(),
+        }, data)
+        return data
+
+    def _read_cached(self, data_path):
+        try:
+            with open(data_path, "rb") as f:
+                data = f.read()
+            os.utime(data_path)
+            return data
+        except OSError:
+            return None
+
+    def _write_meta(self, meta_path, meta):
+        tmp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _store(self, meta_path, data_path, meta, data):
+        if len(data) > self.cache_bytes:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, data_path)
+            self._write_meta(meta_path, meta)
+        except OSError as e:
+            print(f"⚠️ Failed to cache download: {e}")
+            return
+        self._evict()
+
+    def _evict(self):
+        """
+        Drops least recently used downloads once the cache passes its size cap.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".bin"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        used = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if used <= self.cache_bytes:
+                break
+            for stale in (path, path[:-len(".bin")] + ".json"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            used -= size
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["inflight"] = len(self._inflight)
+            return stats
+
+
+image_fetcher = ImageFetcher()
+
+
+def fetch_image(url):
+    return image_fetcher.fetch(url)
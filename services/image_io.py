@@ -0,0 +1,157 @@
+import base64
+import io
+import json
+import queue
+import threading
+import uuid
+from flask import Response
+
+STREAM_CHUNK_SIZE = 64 * 1024
+BINARY_MIMETYPES = ["image/jpeg", "image/png", "image/webp", "image/*", "application/octet-stream", "multipart/mixed"]
+
+
+def read_image_request(req, field="image"):
+    """
+    Returns (source, params) for an image endpoint, where `source` is a seekable
+    file-like object (or None) and `params` holds the remaining request fields.
+
+    Accepts multipart/form-data (file in `field`, other form fields as params),
+    a raw image/* or application/octet-stream body (params from the query string),
+    or the original JSON body with base64 image data in `field`.
+    """
+    content_type = (req.mimetype or "").lower()
+
+    if content_type == "multipart/form-data":
+        params = req.form.to_dict()
+        upload = req.files.get(field)
+        return (upload.stream if upload else None), params
+
+    if content_type.startswith("image/") or content_type == "application/octet-stream":
+        body = req.get_data(cache=False)
+        return (io.BytesIO(body) if body else None), req.args.to_dict()
+
+    data = req.get_json(force=True) or {}
+    params = {k: v for k, v in data.items() if k != field}
+    b64_image = data.get(field)
+    return (io.BytesIO(base64.b64decode(b64_image)) if b64_image else None), params
+
+
+def source_size(source):
+    """
+    Byte length of a seekable source; leaves it rewound.
+    """
+    size = source.seek(0, io.SEEK_END)
+    source.seek(0)
+    return size
+
+
+def wants_binary(req):
+    """
+    True when the client prefers a binary image (or multipart) response to JSON.
+    Clients that send no Accept header, or */*, keep getting JSON.
+    """
+    if req.args.get("response") == "binary":
+        return True
+    best = req.accept_mimetypes.best_match(["application/json"] + BINARY_MIMETYPES)
+    return best is not None and best != "application/json"
+
+
+class _ChunkWriter(io.RawIOBase):
+    """
+    File-like sink that hands written bytes to a bounded queue, so an encoder
+    running on another thread streams straight into the HTTP response.
+    """
+    def __init__(self, chunks, cancelled):
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._buffer = bytearray()
+
+    def _put(self, item):
+        while True:
+            try:
+                self._chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                if self._cancelled.is_set():
+                    raise IOError("Client went away before the image finished streaming")
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= STREAM_CHUNK_SIZE:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def flush(self):
+        if self._buffer:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+
+
+_DONE = object()
+
+
+def stream_encoded(save_fn):
+    """
+    Runs save_fn(fileobj) on a helper thread and yields the encoded bytes as the
+    encoder produces them. At most a few chunks are buffered at any time.
+    """
+    chunks = queue.Queue(maxsize=4)
+    cancelled = threading.Event()
+
+    def run():
+        writer = _ChunkWriter(chunks, cancelled)
+        try:
+            save_fn(writer)
+            writer.flush()
+            writer._put(_DONE)
+        except Exception as e:
+            print(f"❌ Streaming encode failed: {e}")
+            if not cancelled.is_set():
+                chunks.put(e)
+
+    threading.Thread(target=run, name="image-encode", daemon=True).start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is _DONE:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        cancelled.set()
+
+
+def image_response(save_fn, mimetype, headers=None):
+    """
+    Binary response whose body is streamed from the encoder.
+    """
+    return Response(stream_encoded(save_fn), mimetype=mimetype, headers=headers)
+
+
+def multipart_response(parts, headers=None):
+    """
+    multipart/mixed response from (name, payload, mimetype) parts; a dict or list
+    payload is sent as a JSON part.
+    """
+    boundary = uuid.uuid4().hex
+
+    def generate():
+        for name, payload, mimetype in parts:
+            if isinstance(payload, (dict, list)):
+                payload = json.dumps(payload).encode("utf-8")
+            yield (
+                f"--{boundary}\r\n"
+                f"Content-Type: {mimetype}\r\n"
+                f"Content-Disposition: attachment; name=\"{name}\"\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n"
+            ).encode("utf-8")
+            yield payload
+            yield b"\r\n"
+        yield f"--{boundary}--\r\n".encode("utf-8")
+
+    return Response(generate(), mimetype=f"multipart/mixed; boundary={boundary}", headers=headers)
@@ -1,11 +1,201 @@
+import contextlib
 import io
 import json
+import os
 import base64
-import requests
+import hashlib
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
 from PIL import Image
+from services.template_cache import load_template, template_hash
+from services.result_cache import result_cache, make_key
+from services.image_fetcher import fetch_image
+from api.metrics import record_image
+from services.process_pool import get_process_pool, discard_process_pool, get_thread_pool
+from services.render_pipeline import render_outputs, pack_outputs, unpack_outputs, output_json, \
+    output_size, estimate_render_bytes, reserve_render_memory
 
-def generate_mockups(sku, image_url, mockup_json, mockup_images, mockup_names):
+# "serial", "thread" (Pillow releases the GIL while resampling and encoding) or "process"
+MOCKUP_PARALLEL_MODE = os.environ.get("MOCKUP_PARALLEL_MODE", "thread")
+
+
+def _base_file(mockup_folder):
+    return next((v for k, v in mockup_folder.items() if "base" in k.lower()), None)
+
+
+def composite_mockup(mockup_name, layers, mockup_folder, user_img, outputs=None):
+    """
+    Builds one mockup from its layer list and returns the JPEG bytes,
+    or None when there is no BASE layer to draw on. With `outputs` (parsed render
+    specs), every variant is rendered from the composite in memory instead, and
+    the packed variants are returned (see render_pipeline.pack_outputs).
+    """
+    base_img = None
+    overlay_img = None
+
+    for layer in layers:
+        lname = layer.get("name")
+
+        # Load BASE
+        if lname == "BASE":
+            base_file = _base_file(mockup_folder)
+            if not base_file:
+                print(f"❌ No BASE layer for {mockup_name}")
+                continue
+            # Cached templates are shared; paste() below mutates, so work on a copy.
+            base_img = load_template(base_file).copy()
+
+        # Paste user image
+        elif lname == "IMAGE" and base_img:
+            x = int(layer.get("x", 0))
+            y = int(layer.get("y", 0))
+            w = int(layer.get("width", 300))
+            h = int(layer.get("height", 300))
+
+            resized_user_img = user_img.resize((w, h), Image.Resampling.LANCZOS)
+            base_img.paste(resized_user_img, (x, y), resized_user_img)
+
+        # Optional TOP layer
+        elif lname == "TOP" and base_img:
+            top_file = next((v for k, v in mockup_folder.items() if "top" in k.lower()), None)
+            if top_file:
+                overlay_img = load_template(top_file)
+                base_img = Image.alpha_composite(base_img, overlay_img)
+
+    if not base_img:
+        return None
+
+    if outputs:
+        # Already on an image-pool thread (or a worker process): encode serially.
+        return pack_outputs(render_outputs(base_img, outputs, parallel=False))
+
+    final_buffer = io.BytesIO()
+    base_img = base_img.convert("RGB")  # convert to JPEG
+    base_img.save(final_buffer, format="JPEG", quality=95)
+    return final_buffer.getvalue()
+
+
+def _composite_from_shared(shm_name, size, mockup_name, layers, mockup_folder, outputs=None):
+    """
+    Process-pool entry point: maps the user image from shared memory instead of
+    receiving a pickled copy with every task.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    user_img = None
+    error = None
+    try:
+        user_img = Image.frombuffer("RGBA", size, shm.buf, "raw", "RGBA", 0, 1)
+        result = composite_mockup(mockup_name, layers, mockup_folder, user_img, outputs)
+    except Exception as e:
+        # The traceback pins frames that reference the shared buffer; keep only the message.
+        result, error = None, str(e)
+
+    user_img = None
+    shm.close()
+    if error:
+        raise RuntimeError(error)
+    return result
+
+
+def _run_serial(jobs, user_img, outputs=None):
+    results = {}
+    for mockup_name, layers, mockup_folder in jobs:
+        try:
+            results[mockup_name] = composite_mockup(mockup_name, layers, mockup_folder, user_img, outputs)
+        except Exception as e:
+            results[mockup_name] = e
+    return results
+
+
+def _collect(futures):
+    results = {}
+    for mockup_name, future in futures.items():
+        try:
+            results[mockup_name] = future.result()
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            results[mockup_name] = e
+    return results
+
+
+def _run_threads(jobs, user_img, outputs=None):
+    user_img.load()
+    pool = get_thread_pool()
+    return _collect({
+        mockup_name: pool.submit(composite_mockup, mockup_name, layers, mockup_folder, user_img, outputs)
+        for mockup_name, layers, mockup_folder in jobs
+    })
+
+
+def _run_processes(jobs, user_img, outputs=None):
+    raw = user_img.tobytes()
+    shm = shared_memory.SharedMemory(create=True, size=max(len(raw), 1))
+    pool = get_process_pool()
+    try:
+        shm.buf[:len(raw)] = raw
+        del raw
+        return _collect({
+            mockup_name: pool.submit(_composite_from_shared, shm.name, user_img.size, mockup_name, layers, mockup_folder, outputs)
+            for mockup_name, layers, mockup_folder in jobs
+        })
+    except BrokenProcessPool:
+        print("⚠️ Mockup process pool broke, compositing serially.")
+        discard_process_pool(pool)
+        return _run_serial(jobs, user_img, outputs)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def estimate_mockup_bytes(jobs, user_size, outputs):
+    """
+    Rough peak memory for compositing `jobs` at once and rendering `outputs` from
+    each: the decoded user image plus, per mockup, estimate_render_bytes over its
+    base template's size. Mockups whose base cannot be loaded count as nothing
+    here; they fail (and are reported) when compositing.
+    """
+    total = user_size[0] * user_size[1] * 4 * 2
+    for mockup_name, _, mockup_folder in jobs:
+        base_file = _base_file(mockup_folder)
+        try:
+            base_size = load_template(base_file).size if base_file else None
+        except Exception:
+            base_size = None
+        if base_size:
+            total += estimate_render_bytes(base_size, [output_size(base_size, spec) for spec in outputs])
+    return total
+
+
+def mockup_cache_key(user_hash, layers, mockup_folder, outputs=None):
+    """
+    Result-cache key for one mockup: the user image, its layer list, the
+    content of every template file it can draw from and any render outputs.
+    """
+    templates = {file_name: template_hash(value) for file_name, value in mockup_folder.items()}
+    params = {"layers": layers, "templates": templates}
+    if outputs:
+        params["outputs"] = outputs
+    return make_key("mockup", user_hash, params)
+
+
+def generate_mockups(sku, image_url, mockup_json, mockup_images, mockup_names, errors=None, mode=None,
+                     image_bytes=None, raw=False, cache_keys=None, outputs=None):
+    """
+    Composites every mockup in mockup_names and returns {name: base64 JPEG} in
+    mockup_names order ({name: JPEG bytes} when `raw`). With `outputs` (parsed
+    render specs), each mockup instead maps to {output name: {"image", "format",
+    "dimensions"}} ({output name: bytes} when `raw`), all rendered from the
+    in-memory composite. Per-mockup failures are
+    recorded in `errors` when given. `mode` overrides MOCKUP_PARALLEL_MODE for
+    this call; `image_bytes` supplies the user image instead of downloading image_url.
+    Composites are served from the result cache when unchanged; `cache_keys`, when
+    given, is filled with {name: key}. Rendering `outputs` reserves memory like
+    /render does and raises RenderBudgetError when it does not fit.
+    """
     output = {}
+    errors = {} if errors is None else errors
+    mode = mode or MOCKUP_PARALLEL_MODE
 
     try:
         json_data = json.loads(mockup_json)
@@ -16,60 +206,76 @@ def generate_mockups(sku, image_url, mockup_json, mockup_images, mockup_names):
 
     # Download user image
     try:
-        response = requests.get(image_url)
-        user_img = Image.open(io.BytesIO(response.content)).convert("RGBA")
+        if image_bytes is None:
+            image_bytes = fetch_image(image_url)
+        user_hash = hashlib.sha256(image_bytes).hexdigest()
+        record_image("mockup", "in", nbytes=len(image_bytes))
     except Exception as e:
         print(f"❌ Failed to fetch user image: {e}")
         return {}
 
+    jobs = []
+    keys = {}
     for mockup_name in mockup_names:
+        layers = structure.get(mockup_name, {}).get("layers", [])
+        if not layers:
+            print(f"⚠️ No layers for {mockup_name}")
+            continue
+        mockup_folder = mockup_images.get(mockup_name, {})
+        jobs.append((mockup_name, layers, mockup_folder))
         try:
-            layers = structure.get(mockup_name, {}).get("layers", [])
-            if not layers:
-                print(f"⚠️ No layers for {mockup_name}")
-                continue
+            keys[mockup_name] = mockup_cache_key(user_hash, layers, mockup_folder, outputs)
+        except Exception as e:
+            # Unresolvable template refs fail again (and are reported) when compositing.
+            print(f"⚠️ No cache key for {mockup_name}: {e}")
 
-            mockup_folder = mockup_images.get(mockup_name, {})
-            base_img = None
-            overlay_img = None
-
-            for layer in layers:
-                lname = layer.get("name")
-
-                # Load BASE
-                if lname == "BASE":
-                    base_file = next((v for k, v in mockup_folder.items() if "base" in k.lower()), None)
-                    if not base_file:
-                        print(f"❌ No BASE layer for {mockup_name}")
-                        continue
-                    base_img = Image.open(io.BytesIO(base64.b64decode(base_file))).convert("RGBA")
-
-                # Paste user image
-                elif lname == "IMAGE" and base_img:
-                    x = int(layer.get("x", 0))
-                    y = int(layer.get("y", 0))
-                    w = int(layer.get("width", 300))
-                    h = int(layer.get("height", 300))
-
-                    resized_user_img = user_img.resize((w, h), Image.Resampling.LANCZOS)
-                    base_img.paste(resized_user_img, (x, y), resized_user_img)
-
-                # Optional TOP layer
-                elif lname == "TOP" and base_img:
-                    top_file = next((v for k, v in mockup_folder.items() if "top" in k.lower()), None)
-                    if top_file:
-                        overlay_img = Image.open(io.BytesIO(base64.b64decode(top_file))).convert("RGBA")
-                        base_img = Image.alpha_composite(base_img, overlay_img)
-
-            if base_img:
-                final_buffer = io.BytesIO()
-                base_img = base_img.convert("RGB")  # convert to JPEG
-                base_img.save(final_buffer, format="JPEG", quality=95)
-                base64_output = base64.b64encode(final_buffer.getvalue()).decode("utf-8")
-                output[mockup_name] = base64_output
+    results = {}
+    for mockup_name, key in keys.items():
+        cached = result_cache.get(key)
+        if cached:
+            results[mockup_name] = cached[1]
+    misses = [job for job in jobs if job[0] not in results]
 
+    if misses:
+        try:
+            user_img = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
+            image_bytes = None
+            record_image("mockup", "in", size=user_img.size)
         except Exception as e:
-            print(f"❌ Error processing {mockup_name}: {e}")
-            continue
+            print(f"❌ Failed to fetch user image: {e}")
+            return {}
+
+        # Only rendered variants are budgeted; plain composites keep their old path.
+        budget = reserve_render_memory(estimate_mockup_bytes(misses, user_img.size, outputs)) \
+            if outputs else contextlib.nullcontext()
+        with budget:
+            if mode == "process" and len(misses) > 1:
+                computed = _run_processes(misses, user_img, outputs)
+            elif mode == "thread" and len(misses) > 1:
+                computed = _run_threads(misses, user_img, outputs)
+            else:
+                computed = _run_serial(misses, user_img, outputs)
+
+        for mockup_name, result in computed.items():
+            if result and not isinstance(result, Exception) and mockup_name in keys:
+                result_cache.put(keys[mockup_name], {"mockup": mockup_name}, result)
+        results.update(computed)
+
+    if cache_keys is not None:
+        cache_keys.update(keys)
+
+    for mockup_name, _, _ in jobs:
+        result = results.get(mockup_name)
+        if isinstance(result, Exception):
+            print(f"❌ Error processing {mockup_name}: {result}")
+            errors[mockup_name] = str(result)
+        elif result and outputs:
+            variants = unpack_outputs(result)
+            for variant in variants:
+                record_image("mockup", "out", nbytes=len(variant["data"]), size=(variant["width"], variant["height"]))
+            output[mockup_name] = {v["name"]: v["data"] if raw else output_json(v) for v in variants}
+        elif result:
+            record_image("mockup", "out", nbytes=len(result))
+            output[mockup_name] = result if raw else base64.b64encode(result).decode("utf-8")
 
     return output
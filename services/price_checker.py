@@ -0,0 +1,478 @@
+import collections
+import ipaddress
+import json
+import os
+import re
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import quote, urljoin, urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+PRICE_CHECK_CONNECT_TIMEOUT = float(os.environ.get("PRICE_CHECK_CONNECT_TIMEOUT", 5))
+PRICE_CHECK_READ_TIMEOUT    = float(os.environ.get("PRICE_CHECK_READ_TIMEOUT", 15))
+PRICE_CHECK_DEADLINE        = float(os.environ.get("PRICE_CHECK_DEADLINE", 75))  # under gunicorn's 90s timeout
+PRICE_CHECK_THREADS         = int(os.environ.get("PRICE_CHECK_THREADS", 32))
+PRICE_CHECK_PER_HOST        = int(os.environ.get("PRICE_CHECK_PER_HOST", 6))
+PRICE_CHECK_MAX_ITEMS       = int(os.environ.get("PRICE_CHECK_MAX_ITEMS", 1000))
+PRICE_CHECK_MAX_KB          = int(os.environ.get("PRICE_CHECK_MAX_KB", 2048))
+PRICE_CHECK_TTL             = float(os.environ.get("PRICE_CHECK_TTL", 900))
+PRICE_CHECK_STALE_SECONDS   = float(os.environ.get("PRICE_CHECK_STALE_SECONDS", 3600))
+PRICE_CHECK_CACHE_ENTRIES   = int(os.environ.get("PRICE_CHECK_CACHE_ENTRIES", 10000))
+PRICE_CHECK_SKU_URL         = os.environ.get("PRICE_CHECK_SKU_URL", "")  # e.g. "https://shop.example/p/{sku}"
+PRICE_CHECK_USER_AGENT      = os.environ.get("PRICE_CHECK_USER_AGENT", "Mozilla/5.0 (compatible; LysticsPriceCheck/1.0)")
+PRICE_CHECK_ALLOWED_HOSTS   = os.environ.get("PRICE_CHECK_ALLOWED_HOSTS", "")  # e.g. "shop.example,etsy.com"; empty allows any public host
+PRICE_CHECK_ALLOW_PRIVATE   = os.environ.get("PRICE_CHECK_ALLOW_PRIVATE", "false").lower() in ("1", "true", "yes")
+PRICE_CHECK_MAX_REDIRECTS   = int(os.environ.get("PRICE_CHECK_MAX_REDIRECTS", 5))
+FETCH_CHUNK_SIZE            = 64 * 1024
+
+
+class PriceCheckError(Exception):
+    pass
+
+
+# ------------------------------- #
+#           Price Parsing         #
+# ------------------------------- #
+_NUMBER = re.compile(r"\d[\d.,\s ']*")
+_CURRENCY_SYMBOLS = {"$": "USD", "£": "GBP", "€": "EUR", "¥": "JPY", "₹": "INR", "A$": "AUD", "C$": "CAD"}
+
+# Tried in order; the first that yields a price wins. Structured data first, since
+# it is both the most reliable and the cheapest to read.
+PRICE_XPATHS = [
+    ("meta", "//meta[@property='product:price:amount' or @property='og:price:amount' or @itemprop='price']/@content"),
+    ("itemprop", "//*[@itemprop='price'][not(self::meta)]"),
+    ("class", "//*[@data-price or contains(concat(' ', normalize-space(@class), ' '), ' price ')]"),
+]
+CURRENCY_XPATH = ("//meta[@property='product:price:currency' or @property='og:price:currency' "
+                  "or @itemprop='priceCurrency']/@content")
+
+
+def parse_price_text(text):
+    """
+    Extracts (price, currency) from text such as "$1,299.00", "1.299,00 €" or
+    "USD 12". Returns (None, None) when no number is found.
+    """
+    if text is None:
+        return None, None
+    text = str(text).strip()
+    match = _NUMBER.search(text)
+    if not match:
+        return None, None
+    number = re.sub(r"[\s ']", "", match.group(0)).rstrip(".,")
+
+    # The last separator followed by exactly two digits (or any non-thousands group) is the decimal point.
+    last_dot, last_comma = number.rfind("."), number.rfind(",")
+    decimal = max(last_dot, last_comma)
+    if decimal != -1 and ((last_dot != -1 and last_comma != -1) or len(number) - decimal - 1 != 3):
+        whole, fraction = number[:decimal], number[decimal + 1:]
+        number = re.sub(r"[.,]", "", whole) + "." + fraction
+    else:
+        number = re.sub(r"[.,]", "", number)
+    try:
+        price = float(number)
+    except ValueError:
+        return None, None
+
+    currency = None
+    for symbol, code in sorted(_CURRENCY_SYMBOLS.items(), key=lambda item: -len(item[0])):
+        if symbol in text:
+            currency = code
+            break
+    if currency is None:
+        code = re.search(r"\b([A-Z]{3})\b", text)
+        currency = code.group(1) if code else None
+    return price, currency
+
+
+def _json_ld_offers(node):
+    if isinstance(node, list):
+        for item in node:
+            yield from _json_ld_offers(item)
+    elif isinstance(node, dict):
+        if "offers" in node:
+            offers = node["offers"]
+            for offer in offers if isinstance(offers, list) else [offers]:
+                if isinstance(offer, dict):
+                    yield offer
+        for key in ("@graph", "mainEntity", "itemListElement"):
+            if key in node:
+                yield from _json_ld_offers(node[key])
+
+
+def parse_price(html):
+    """
+    Finds the listing price in a product page with lxml: JSON-LD offers, then
+    price meta tags, then itemprop/price-class elements.
+    Returns {"price", "currency", "source", "title"}; price is None when not found.
+    """
+    from lxml import etree, html as lxml_html
+
+    try:
+        doc = lxml_html.document_fromstring(html, parser=lxml_html.HTMLParser(recover=True, remove_comments=True))
+    except (etree.ParserError, ValueError):
+        return {"price": None, "currency": None, "source": None, "title": None}
+
+    title = doc.findtext(".//title")
+    result = {"price": None, "currency": None, "source": None, "title": title.strip() if title else None}
+
+    for script in doc.xpath("//script[@type='application/ld+json']/text()"):
+        try:
+            data = json.loads(script)
+        except ValueError:
+            continue
+        for offer in _json_ld_offers(data):
+            raw = offer.get("price", offer.get("lowPrice"))
+            price, currency = parse_price_text(raw)
+            if price is not None:
+                result.update(price=price, currency=offer.get("priceCurrency") or currency, source="json-ld")
+                return result
+
+    page_currency = next(iter(doc.xpath(CURRENCY_XPATH)), None)
+    for source, xpath in PRICE_XPATHS:
+        for node in doc.xpath(xpath)[:20]:
+            if isinstance(node, str):
+                raw = node
+            else:
+                raw = node.get("content") or node.get("data-price") or node.text_content()
+            price, currency = parse_price_text(raw)
+            if price is not None:
+                result.update(price=price, currency=page_currency or currency, source=source)
+                return result
+    return result
+
+
+# ------------------------------- #
+#           URL Safety            #
+# ------------------------------- #
+def _allowed_hosts():
+    return [h.strip().lower().lstrip(".") for h in PRICE_CHECK_ALLOWED_HOSTS.split(",") if h.strip()]
+
+
+def _public_address(address):
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    # is_global is False for private, loopback, link-local (cloud metadata),
+    # reserved, shared and unspecified ranges.
+    return ip.is_global and not ip.is_multicast
+
+
+def check_url_allowed(url):
+    """
+    Raises PriceCheckError unless url is http(s), its host is on
+    PRICE_CHECK_ALLOWED_HOSTS (when set; subdomains included) and every address
+    it resolves to is public, so callers cannot make us fetch internal services.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise PriceCheckError(f"Only http(s) URLs can be checked, got {parts.scheme or 'no'} scheme")
+    host = (parts.hostname or "").lower()
+    if not host:
+        raise PriceCheckError("URL has no host")
+    allowed = _allowed_hosts()
+    if allowed and not any(host == h or host.endswith("." + h) for h in allowed):
+        raise PriceCheckError(f"Host {host} is not in PRICE_CHECK_ALLOWED_HOSTS")
+    if PRICE_CHECK_ALLOW_PRIVATE:
+        return
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, ValueError) as e:
+        raise PriceCheckError(f"Could not resolve {host}: {e}")
+    blocked = sorted(a for a in addresses if not _public_address(a))
+    if blocked:
+        raise PriceCheckError(f"Host {host} resolves to a non-public address ({blocked[0]})")
+
+
+class _PublicPeerMixin:
+    """
+    Checks the address a new connection actually reached, after the TCP connect
+    and before the TLS handshake or any request bytes. check_url_allowed resolves
+    the host separately, so a DNS answer that changes in between (rebinding) is
+    caught here.
+    """
+    def _new_conn(self):
+        sock = super()._new_conn()
+        if PRICE_CHECK_ALLOW_PRIVATE:
+            return sock
+        try:
+            address = sock.getpeername()[0]
+        except OSError:
+            sock.close()
+            raise
+        if not _public_address(address):
+            sock.close()
+            raise PriceCheckError(f"Host {self.host} connected to a non-public address ({address})")
+        return sock
+
+
+class _PublicHTTPConnection(_PublicPeerMixin, HTTPConnection):
+    pass
+
+
+class _PublicHTTPSConnection(_PublicPeerMixin, HTTPSConnection):
+    pass
+
+
+class _PublicHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _PublicHTTPConnection
+
+
+class _PublicHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _PublicHTTPSConnection
+
+
+class PublicOnlyAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose direct connections refuse non-public peers.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _PublicHTTPConnectionPool,
+                                                   "https": _PublicHTTPSConnectionPool}
+
+
+# ------------------------------- #
+#          Price Checker          #
+# ------------------------------- #
+class PriceChecker:
+    """
+    Fetches product pages over a pooled keep-alive session, at most `per_host`
+    at a time per host (the rest queue per host, so a slow host never ties up
+    the shared threads), and parses their prices. Results are cached per URL:
+    fresh for `ttl` seconds, then served stale for up to `stale_seconds` while a
+    background refresh runs. Concurrent checks of one URL share a single fetch.
+    """
+    def __init__(self, threads=PRICE_CHECK_THREADS, per_host=PRICE_CHECK_PER_HOST, ttl=PRICE_CHECK_TTL,
+                 stale_seconds=PRICE_CHECK_STALE_SECONDS, max_entries=PRICE_CHECK_CACHE_ENTRIES,
+                 max_bytes=PRICE_CHECK_MAX_KB * 1024,
+                 timeout=(PRICE_CHECK_CONNECT_TIMEOUT, PRICE_CHECK_READ_TIMEOUT)):
+        self.threads = threads
+        self.per_host = per_host
+        self.ttl = ttl
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._cache = collections.OrderedDict()  # url -> (result, fetched_at)
+        self._inflight = {}
+        self._hosts = {}  # host -> [active fetches, deque of queued (url, future)]
+        self._session = None
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.counters = {"fresh_hits": 0, "stale_hits": 0, "fetches": 0, "refreshes": 0,
+                         "deduplicated": 0, "errors": 0, "bytes_downloaded": 0}
+
+    def _resources(self):
+        # Session and pool are built lazily, and again after a fork.
+        with self._lock:
+            if self._pid != os.getpid():
+                session = requests.Session()
+                adapter = PublicOnlyAdapter(pool_connections=16, pool_maxsize=max(self.per_host, 1), max_retries=1)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["User-Agent"] = PRICE_CHECK_USER_AGENT
+                self._session = session
+                self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="price-check")
+                self._inflight = {}
+                self._hosts = {}
+                self._pid = os.getpid()
+            return self._session, self._pool
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _schedule(self, url, future):
+        # Called with self._lock held.
+        host = self._hosts.setdefault(urlsplit(url).netloc.lower(), [0, collections.deque()])
+        if host[0] < self.per_host:
+            host[0] += 1
+            self._pool.submit(self._run, url, future)
+        else:
+            host[1].append((url, future))
+
+    def _run(self, url, future):
+        try:
+            future.set_result(self._fetch(url))
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+                host = self._hosts[urlsplit(url).netloc.lower()]
+                if host[1]:
+                    self._pool.submit(self._run, *host[1].popleft())
+                else:
+                    host[0] -= 1
+
+    def check(self, url):
+        """
+        Returns a Future resolving to the price result for url. Cached results
+        resolve immediately; stale ones also trigger a background refresh.
+        """
+        self._resources()
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(url)
+            if cached:
+                self._cache.move_to_end(url)
+            age = now - cached[1] if cached else None
+
+            if cached and age < self.ttl:
+                self.counters["fresh_hits"] += 1
+                return _done({**cached[0], "cached": True, "stale": False, "age": round(age, 1)})
+
+            future = self._inflight.get(url)
+            if future is None:
+                future = self._inflight[url] = Future()
+                self._schedule(url, future)
+                self.counters["refreshes" if cached else "fetches"] += 1
+            elif not cached:
+                self.counters["deduplicated"] += 1
+
+            if cached and age < self.ttl + self.stale_seconds:
+                self.counters["stale_hits"] += 1
+                return _done({**cached[0], "cached": True, "stale": True, "age": round(age, 1)})
+            return future
+
+    def _fetch(self, url):
+        try:
+            started = time.perf_counter()
+            html = self._download(url)
+            result = parse_price(html)
+            result.update(url=url, status="ok" if result["price"] is not None else "not_found",
+                          elapsed=round(time.perf_counter() - started, 3))
+            with self._lock:
+                self._cache[url] = (result, time.time())
+                self._cache.move_to_end(url)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            return {**result, "cached": False, "stale": False, "age": 0.0}
+        except Exception as e:
+            self._count("errors")
+            return {"url": url, "status": "error", "error": str(e), "price": None, "currency": None,
+                    "cached": False, "stale": False}
+
+    def _download(self, url):
+        session, _ = self._resources()
+        target = url
+        try:
+            # Redirects are followed by hand so every hop passes check_url_allowed;
+            # the adapter then re-checks the address each connection reaches.
+            for _ in range(PRICE_CHECK_MAX_REDIRECTS + 1):
+                check_url_allowed(target)
+                with session.get(target, timeout=self.timeout, stream=True, allow_redirects=False) as resp:
+                    if resp.is_redirect:
+                        target = urljoin(target, resp.headers["Location"])
+                        continue
+                    if resp.status_code != 200:
+                        raise PriceCheckError(f"HTTP {resp.status_code}")
+                    # Prices sit in the head or near the top of the page; stop reading after max_bytes.
+                    body = bytearray()
+                    for chunk in resp.iter_content(FETCH_CHUNK_SIZE):
+                        body += chunk
+                        if len(body) >= self.max_bytes:
+                            break
+                    break
+            else:
+                raise PriceCheckError(f"More than {PRICE_CHECK_MAX_REDIRECTS} redirects")
+        except requests.exceptions.RequestException as e:
+            raise PriceCheckError(f"Failed to fetch {url}: {e}")
+        self._count("bytes_downloaded", len(body))
+        return bytes(body)
+
+    def check_many(self, items, deadline=PRICE_CHECK_DEADLINE):
+        """
+        Checks every item and yields (index, result) as each finishes, in
+        completion order. Items still pending at the deadline are yielded as timeouts.
+        """
+        end = time.monotonic() + deadline
+        done = threading.Condition()
+        finished = collections.deque()
+
+        def on_done(index, item, future):
+            with done:
+                finished.append((index, item, future))
+                done.notify()
+
+        pending = 0
+        for index, item in enumerate(items):
+            url = item.get("url")
+            if not url:
+                yield index, {**item, "status": "error", "error": item.get("error", "No URL to check")}
+                continue
+            pending += 1
+            self.check(url).add_done_callback(lambda f, index=index, item=item: on_done(index, item, f))
+
+        reported = set()
+        while pending:
+            with done:
+                while not finished:
+                    timeout = end - time.monotonic()
+                    if timeout <= 0 or not done.wait(timeout):
+                        break
+                batch = list(finished)
+                finished.clear()
+            if not batch:
+                break
+            for index, item, future in batch:
+                pending -= 1
+                reported.add(index)
+                yield index, {**item, **future.result()}
+
+        if pending:
+            # Whatever has not called back yet missed the deadline; the fetches
+            # keep going and will land in the cache for the next call.
+            for index, item in enumerate(items):
+                if item.get("url") and index not in reported:
+                    yield index, {**item, "status": "timeout", "error": f"No result within {deadline:.0f}s"}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["cached"] = len(self._cache)
+            stats["inflight"] = len(self._inflight)
+            stats["queued"] = sum(len(queue) for _, queue in self._hosts.values())
+            return stats
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def normalize_items(payload):
+    """
+    Turns a request body into a list of {"sku"?, "url"?} items. Accepts
+    {"items": [{"sku"|"url"}, ...]}, {"skus": [...]} and/or {"urls": [...]};
+    SKUs become URLs through PRICE_CHECK_SKU_URL. Raises ValueError for a body
+    that is not a JSON object or fields that are not lists.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Body must be a JSON object")
+    for field in ("items", "skus", "urls"):
+        if payload.get(field) is not None and not isinstance(payload[field], list):
+            raise ValueError(f"'{field}' must be a list")
+    items = []
+    for entry in payload.get("items") or []:
+        items.append(dict(entry) if isinstance(entry, dict) else {"url": str(entry)})
+    items += [{"sku": str(sku)} for sku in payload.get("skus") or []]
+    items += [{"url": str(url)} for url in payload.get("urls") or []]
+
+    for item in items:
+        if item.get("url") or not item.get("sku"):
+            continue
+        if PRICE_CHECK_SKU_URL:
+            item["url"] = PRICE_CHECK_SKU_URL.format(sku=quote(item["sku"], safe=""))
+        else:
+            item["error"] = "PRICE_CHECK_SKU_URL is not configured; send listing URLs instead"
+    return items
+
+
+price_checker = PriceChecker()
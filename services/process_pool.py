@@ -0,0 +1,62 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from PIL import Image
+
+IMAGE_POOL_WORKERS  = int(os.environ.get("IMAGE_POOL_WORKERS", os.cpu_count() or 2))
+IMAGE_POOL_THREADS  = int(os.environ.get("IMAGE_POOL_THREADS", (os.cpu_count() or 2) * 2))
+
+_lock = threading.Lock()
+_process_pool = None
+_thread_pool = None
+_pool_pid = None
+
+
+def _warm_worker():
+    # Load every Pillow codec plugin up front instead of on a worker's first job.
+    Image.init()
+
+
+def _reset_after_fork():
+    global _process_pool, _thread_pool, _pool_pid
+    if _pool_pid != os.getpid():
+        _process_pool = None
+        _thread_pool = None
+        _pool_pid = os.getpid()
+
+
+def get_process_pool():
+    """
+    Returns the warm, process-wide pool used for CPU-bound image work.
+    """
+    global _process_pool
+    with _lock:
+        _reset_after_fork()
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=IMAGE_POOL_WORKERS, initializer=_warm_worker)
+        return _process_pool
+
+
+def discard_process_pool(pool):
+    """
+    Drops a pool that raised BrokenProcessPool so the next call builds a fresh one.
+    """
+    global _process_pool
+    with _lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False)
+
+
+def get_thread_pool():
+    """
+    Returns the shared thread pool for image work where Pillow releases the GIL
+    (resampling, pasting, encoding).
+    """
+    global _thread_pool
+    with _lock:
+        _reset_after_fork()
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=IMAGE_POOL_THREADS, thread_name_prefix="image")
+        return _thread_pool
+
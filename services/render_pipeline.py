@@ -0,0 +1,309 @@
+from flask import request, jsonify
+from PIL import Image
+import base64
+import io
+import json
+import logging
+import os
+from contextlib import contextmanager
+from services.image_io import read_image_request, wants_binary, multipart_response, source_size
+from services.result_cache import result_cache, hash_source, make_key, etag_for, not_modified, cache_headers
+from services.process_pool import get_thread_pool
+from services.upscaler import admission, UPSCALE_ADMISSION_TIMEOUT
+from api.metrics import record_image
+
+RENDER_MAX_OUTPUTS        = int(os.environ.get("RENDER_MAX_OUTPUTS", 16))
+RENDER_REUSE_FACTOR       = float(os.environ.get("RENDER_REUSE_FACTOR", 2.0))
+RENDER_REQUEST_BUDGET_MB  = int(os.environ.get("RENDER_REQUEST_BUDGET_MB", 512))
+
+RENDER_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+DEFAULT_QUALITY = {"JPEG": 95, "WEBP": 90}
+
+
+# ------------------------------- #
+#          Output Specs           #
+# ------------------------------- #
+def _flag(value):
+    return str(value).lower() in ("1", "true", "yes") if not isinstance(value, bool) else value
+
+def parse_output_specs(outputs):
+    """
+    Validates a list of output specs (a JSON string is accepted too) and returns
+    them normalized. Each spec may set:
+      name                      key for the output (default "output<i>")
+      format                    JPEG, PNG or WEBP (default JPEG)
+      width / height            target size; with both, the image is fitted inside the box
+      widthInches (+ dpi)       target width in inches, as in /upscaleOne
+      dpi                       written to JPEG and PNG headers (WebP has no DPI field)
+      quality                   JPEG/WebP quality (default 95 / 90)
+      progressive, optimize     JPEG/PNG encoder flags
+      lossless                  WebP lossless mode
+    Raises ValueError on an invalid spec.
+    """
+    if isinstance(outputs, str):
+        outputs = json.loads(outputs)
+    if not isinstance(outputs, list) or not outputs:
+        raise ValueError("outputs must be a non-empty list of output specs")
+    if len(outputs) > RENDER_MAX_OUTPUTS:
+        raise ValueError(f"At most {RENDER_MAX_OUTPUTS} outputs per render, got {len(outputs)}")
+
+    specs = []
+    for i, raw in enumerate(outputs):
+        if not isinstance(raw, dict):
+            raise ValueError(f"Output {i} must be an object")
+        format = str(raw.get("format", "JPEG")).upper().replace("JPG", "JPEG")
+        if format not in RENDER_FORMATS:
+            raise ValueError(f"Output {i}: unsupported format {format}")
+        spec = {
+            "name":        str(raw.get("name") or f"output{i}"),
+            "format":      format,
+            "width":       int(raw["width"]) if raw.get("width") else None,
+            "height":      int(raw["height"]) if raw.get("height") else None,
+            "widthInches": float(raw["widthInches"]) if raw.get("widthInches") else None,
+            "dpi":         int(raw["dpi"]) if raw.get("dpi") else None,
+            "quality":     int(raw.get("quality") or DEFAULT_QUALITY.get(format, 0)) or None,
+            "progressive": _flag(raw.get("progressive", False)),
+            "optimize":    _flag(raw.get("optimize", False)),
+            "lossless":    _flag(raw.get("lossless", False)),
+        }
+        if spec["widthInches"] and not spec["dpi"]:
+            spec["dpi"] = 300
+        if any(v is not None and v <= 0 for v in (spec["width"], spec["height"], spec["widthInches"], spec["dpi"])):
+            raise ValueError(f"Output {spec['name']}: sizes and dpi must be positive")
+        specs.append(spec)
+
+    names = [spec["name"] for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError("Output names must be unique")
+    return specs
+
+def output_size(src_size, spec):
+    """
+    Target (width, height) for a spec, keeping the source aspect ratio unless
+    neither dimension is given (then the source size is kept).
+    """
+    src_width, src_height = src_size
+    width, height = spec["width"], spec["height"]
+    if spec["widthInches"]:
+        width, height = int(spec["widthInches"] * spec["dpi"]), None
+    if width and height:
+        scale = min(width / src_width, height / src_height)
+        return max(1, round(src_width * scale)), max(1, round(src_height * scale))
+    if width:
+        return width, max(1, int(width * src_height / src_width))
+    if height:
+        return max(1, int(height * src_width / src_height)), height
+    return src_size
+
+
+# ------------------------------- #
+#         Resample Planning       #
+# ------------------------------- #
+def plan_resamples(src_size, sizes, reuse_factor=RENDER_REUSE_FACTOR):
+    """
+    Orders the distinct target sizes largest first and picks, for each, the image
+    to resample from: the smallest earlier target at least `reuse_factor` times
+    larger in both dimensions, or the source. A 2x margin keeps LANCZOS output
+    visually identical to resampling from the source while doing far less work.
+    Returns [(size, parent_size or None)].
+    """
+    plan = []
+    done = []
+    for size in sorted(set(sizes), key=lambda s: s[0] * s[1], reverse=True):
+        parent = None
+        if size != src_size:
+            candidates = [d for d in done if d[0] >= size[0] * reuse_factor and d[1] >= size[1] * reuse_factor]
+            if candidates:
+                parent = min(candidates, key=lambda d: d[0] * d[1])
+        plan.append((size, parent))
+        if size != src_size:
+            done.append(size)
+    return plan
+
+def estimate_render_bytes(src_size, sizes):
+    """
+    Rough peak memory: the decoded source (and its mode conversion) plus every
+    distinct resample and an encoded copy of each.
+    """
+    src = src_size[0] * src_size[1] * 4 * 2
+    return src + sum(w * h * 4 * 2 for w, h in set(sizes))
+
+
+class RenderBudgetError(Exception):
+    """
+    A render that cannot run now: `status` is 413 (over the per-request budget)
+    or 503 (the image workers' memory budget is in use; retry later).
+    """
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+    def response(self):
+        headers = {"Retry-After": "5"} if self.status == 503 else {}
+        return jsonify({"error": str(self)}), self.status, headers
+
+
+@contextmanager
+def reserve_render_memory(estimate):
+    """
+    Holds `estimate` bytes of the shared image memory budget for the block.
+    Raises RenderBudgetError when the estimate is over RENDER_REQUEST_BUDGET_MB
+    or no room frees up within UPSCALE_ADMISSION_TIMEOUT.
+    """
+    if estimate > RENDER_REQUEST_BUDGET_MB * 1024 * 1024:
+        raise RenderBudgetError(f"Render needs ~{estimate // 2**20} MB, over the "
+                                f"{RENDER_REQUEST_BUDGET_MB} MB per-request budget", 413)
+    reserved = admission.acquire(estimate, UPSCALE_ADMISSION_TIMEOUT)
+    if reserved is None:
+        raise RenderBudgetError("Image workers are at their memory budget, retry shortly", 503)
+    try:
+        yield
+    finally:
+        admission.release(reserved)
+
+
+# ------------------------------- #
+#            Rendering            #
+# ------------------------------- #
+def _has_alpha(img):
+    return img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+
+def save_kwargs(spec):
+    format = spec["format"]
+    kwargs = {"format": format}
+    if format == "JPEG":
+        kwargs.update(quality=spec["quality"], progressive=spec["progressive"], optimize=spec["optimize"])
+    elif format == "PNG":
+        kwargs.update(optimize=spec["optimize"])
+    elif format == "WEBP":
+        kwargs.update(quality=spec["quality"], lossless=spec["lossless"], method=4)
+    if spec["dpi"] and format != "WEBP":
+        kwargs["dpi"] = (spec["dpi"], spec["dpi"])
+    return kwargs
+
+def encode_output(img, spec):
+    if spec["format"] == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")
+    out_buffer = io.BytesIO()
+    img.save(out_buffer, **save_kwargs(spec))
+    return out_buffer.getvalue()
+
+def render_outputs(img, specs, parallel=True):
+    """
+    Produces every output spec from one decoded image. JPEG sources are decoded
+    at reduced resolution (draft mode) when every target is at most half the
+    source size; each distinct target size is resampled once, from the smallest
+    suitable larger resample (see plan_resamples); encodes run on the shared image
+    thread pool when `parallel`. Returns one {"name", "format", "width", "height",
+    "data"} dict per spec, in spec order.
+    """
+    src_size = img.size
+    sizes = {spec["name"]: output_size(src_size, spec) for spec in specs}
+
+    largest = max(sizes.values(), key=lambda s: s[0] * s[1])
+    if img.format == "JPEG" and largest[0] * 2 <= src_size[0] and largest[1] * 2 <= src_size[1]:
+        img.draft(img.mode, largest)
+
+    keep_alpha = _has_alpha(img) and any(spec["format"] != "JPEG" for spec in specs)
+    mode = "RGBA" if keep_alpha else "RGB"
+    source = img if img.mode == mode else img.convert(mode)
+
+    resampled = {src_size: source}
+    for size, parent in plan_resamples(src_size, sizes.values()):
+        if size in resampled:
+            continue
+        base = resampled[parent] if parent else source
+        resampled[size] = base.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    jobs = [(spec, resampled[sizes[spec["name"]]]) for spec in specs]
+    if parallel and len(jobs) > 1:
+        pool = get_thread_pool()
+        encoded = [f.result() for f in [pool.submit(encode_output, out_img, spec) for spec, out_img in jobs]]
+    else:
+        encoded = [encode_output(out_img, spec) for spec, out_img in jobs]
+
+    return [
+        {"name": spec["name"], "format": spec["format"], "width": out_img.width, "height": out_img.height, "data": data}
+        for (spec, out_img), data in zip(jobs, encoded)
+    ]
+
+
+# ------------------------------- #
+#        Packed Cache Entries     #
+# ------------------------------- #
+def pack_outputs(outputs):
+    """
+    Serializes rendered outputs into one blob (a JSON header line, then the
+    concatenated encodings) so a whole render is a single result-cache entry.
+    """
+    header = [{**{k: v for k, v in out.items() if k != "data"}, "size": len(out["data"])} for out in outputs]
+    return json.dumps(header).encode("utf-8") + b"\n" + b"".join(out["data"] for out in outputs)
+
+def unpack_outputs(blob):
+    header_line, _, body = blob.partition(b"\n")
+    outputs, offset = [], 0
+    for entry in json.loads(header_line):
+        size = entry.pop("size")
+        outputs.append({**entry, "data": body[offset:offset + size]})
+        offset += size
+    return outputs
+
+def output_json(out):
+    return {"image": base64.b64encode(out["data"]).decode("utf-8"), "format": out["format"],
+            "dimensions": f"{out['width']}x{out['height']}"}
+
+
+# ------------------------------- #
+#            Endpoint             #
+# ------------------------------- #
+def renderImage():
+    """
+    POST /render: one source image plus `outputs` (a list of output specs, see
+    parse_output_specs), rendered from a single decode. Returns
+    {"outputs": {name: {"image", "format", "dimensions"}}}, or multipart/mixed with
+    one part per output when the client asks for binary.
+    """
+    try:
+        source, params = read_image_request(request)
+        if not source:
+            raise ValueError("Missing image data")
+        try:
+            specs = parse_output_specs(params.get("outputs"))
+        except (ValueError, TypeError, KeyError) as e:
+            return jsonify({"error": f"Invalid outputs: {e}"}), 400
+
+        record_image("render", "in", nbytes=source_size(source))
+        binary = wants_binary(request)
+        key = make_key("render", hash_source(source), {"outputs": specs})
+        etag = etag_for(key, binary)
+        unchanged = not_modified(request, etag)
+        if unchanged:
+            return unchanged
+
+        cached = result_cache.get(key)
+        hit = cached is not None
+        if hit:
+            outputs = unpack_outputs(cached[1])
+        else:
+            img = Image.open(source)
+            record_image("render", "in", size=img.size)
+            sizes = [output_size(img.size, spec) for spec in specs]
+            with reserve_render_memory(estimate_render_bytes(img.size, sizes)):
+                outputs = render_outputs(img, specs)
+            img.close()
+            result_cache.put(key, {"outputs": [spec["name"] for spec in specs]}, pack_outputs(outputs))
+
+        for out in outputs:
+            record_image("render", "out", nbytes=len(out["data"]), size=(out["width"], out["height"]))
+
+        headers = cache_headers(etag, hit)
+        if binary:
+            parts = [(out["name"], out["data"], RENDER_FORMATS[out["format"]]) for out in outputs]
+            return multipart_response(parts, headers=headers)
+        return jsonify({"outputs": {out["name"]: output_json(out) for out in outputs}}), 200, headers
+
+    except RenderBudgetError as e:
+        return e.response()
+    except Exception as e:
+        logging.error(f"Render failed: {e}")
+        return jsonify({"error": f"Render failed: {e}"}), 500
@@ -1,39 +1,207 @@
-from flask import request, jsonify
+from flask import Response, request, jsonify
 from PIL import Image
 import io
 import base64
 import logging
+from concurrent.futures.process import BrokenProcessPool
+from services.image_io import read_image_request, wants_binary, stream_encoded, multipart_response, source_size
+from services.result_cache import result_cache, hash_source, make_key, etag_for, not_modified, cache_headers
+from services.process_pool import get_process_pool, discard_process_pool, IMAGE_POOL_WORKERS
+from api.metrics import record_image, count_stream
+
+MAX_BATCH_VARIANTS = 200
+
+def resize_image(img, new_width):
+    """
+    Resizes to new_width keeping the aspect ratio. Returns (resized_img, format).
+    """
+    input_format = img.format or "JPEG"
+
+    original_width, original_height = img.size
+    aspect_ratio = original_width / original_height
+    new_height = int(new_width / aspect_ratio)
+    resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+    if input_format.upper() == "PNG":
+        resized_img = resized_img.convert("RGBA")
+    else:
+        resized_img = resized_img.convert("RGB")
+    return resized_img, input_format
 
 def resizeJSON():
     try:
-        data = request.get_json(force=True)
-        base64_image = data.get('image')
-        new_width = int(data.get('width', 300))
+        source, params = read_image_request(request)
+        new_width = int(params.get('width', 300))
 
-        if not base64_image:
+        if not source:
             raise ValueError("Missing image data")
 
-        image_bytes = base64.b64decode(base64_image)
-        img = Image.open(io.BytesIO(image_bytes))
-        input_format = img.format or "JPEG"
+        record_image("resize", "in", nbytes=source_size(source))
+        binary = wants_binary(request)
+        key = make_key("resize", hash_source(source), {"width": new_width})
+        etag = etag_for(key, binary)
+        unchanged = not_modified(request, etag)
+        if unchanged:
+            return unchanged
 
-        original_width, original_height = img.size
-        aspect_ratio = original_width / original_height
-        new_height = int(new_width / aspect_ratio)
-        resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        cached = result_cache.get(key)
+        if cached:
+            meta, data = cached
+            input_format = meta["format"]
+            record_image("resize", "out", nbytes=len(data))
+            if binary:
+                return Response(data, mimetype=Image.MIME.get(input_format.upper(), "application/octet-stream"),
+                                headers=cache_headers(etag, True, {"X-Image-Format": input_format}))
+            resized_base64 = base64.b64encode(data).decode("utf-8")
+            return jsonify({"image": resized_base64, "format": input_format}), 200, cache_headers(etag, True)
+
+        img = Image.open(source)
+        record_image("resize", "in", size=img.size)
+        resized_img, input_format = resize_image(img, new_width)
+        img.close()
+        record_image("resize", "out", size=resized_img.size)
+        meta = {"format": input_format}
 
-        if input_format.upper() == "PNG":
-            resized_img = resized_img.convert("RGBA")
-        else:
-            resized_img = resized_img.convert("RGB")
+        if binary:
+            chunks = stream_encoded(lambda fp: resized_img.save(fp, format=input_format))
+            return Response(
+                count_stream(result_cache.tee(key, meta, chunks), "resize"),
+                mimetype=Image.MIME.get(input_format.upper(), "application/octet-stream"),
+                headers=cache_headers(etag, False, {"X-Image-Format": input_format})
+            )
 
         out_buffer = io.BytesIO()
         resized_img.save(out_buffer, format=input_format)
+        record_image("resize", "out", nbytes=out_buffer.tell())
+        result_cache.put(key, meta, out_buffer.getvalue())
         out_buffer.seek(0)
         resized_base64 = base64.b64encode(out_buffer.read()).decode("utf-8")
 
-        return jsonify({"image": resized_base64, "format": input_format}), 200
+        return jsonify({"image": resized_base64, "format": input_format}), 200, cache_headers(etag, False)
 
     except Exception as e:
         logging.error(f"Resize failed: {e}")
-        return jsonify({"error": f"Resize failed: {e}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Resize failed: {e}"}), 500
+
+
+def resize_variants(image_bytes, widths):
+    """
+    Decodes the source once and returns one {"width", "height", "format", "data"}
+    variant per requested width. JPEG sources are decoded at reduced resolution
+    (draft mode) when the largest target is at most half the source size, and
+    large reductions go through Pillow's reduce() before the LANCZOS pass.
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    input_format = img.format or "JPEG"
+    original_width, original_height = img.size
+    aspect_ratio = original_width / original_height
+
+    largest = max(widths)
+    if input_format == "JPEG":
+        img.draft(img.mode, (largest, int(largest / aspect_ratio)))
+
+    out_mode = "RGBA" if input_format.upper() == "PNG" else "RGB"
+    variants = []
+    for new_width in widths:
+        new_height = int(new_width / aspect_ratio)
+        resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        out_buffer = io.BytesIO()
+        resized_img.convert(out_mode).save(out_buffer, format=input_format)
+        variants.append({"width": new_width, "height": new_height, "format": input_format, "data": out_buffer.getvalue()})
+    return variants
+
+def _parse_widths(value):
+    if isinstance(value, str):
+        value = [v for v in value.split(",") if v.strip()]
+    widths = sorted({int(w) for w in (value or [])}, reverse=True)
+    if not widths or widths[-1] <= 0:
+        raise ValueError("widths must be a non-empty list of positive integers")
+    return widths
+
+def _read_batch_request():
+    """
+    Returns [(id, image_bytes, widths)] from a JSON body
+    ({"widths": [...], "images": [{"id", "image", "widths"?}]}) or multipart/form-data
+    (one file per image, field name = id; `widths` or `widths.<id>` form fields).
+    """
+    if request.mimetype == "multipart/form-data":
+        default_widths = request.form.get("widths")
+        return [
+            (image_id, upload.read(), _parse_widths(request.form.get(f"widths.{image_id}") or default_widths))
+            for image_id, upload in request.files.items(multi=True)
+        ]
+
+    data = request.get_json(force=True) or {}
+    images = []
+    for i, entry in enumerate(data.get("images", [])):
+        image_id = str(entry.get("id", i))
+        if not entry.get("image"):
+            raise ValueError(f"Missing image data for {image_id}")
+        images.append((image_id, base64.b64decode(entry["image"]), _parse_widths(entry.get("widths") or data.get("widths"))))
+    return images
+
+def resizeBatch():
+    """
+    Resizes many images to several widths each in one request. Sources are spread
+    across the image process pool; each source is decoded once for all its variants.
+    """
+    try:
+        images = _read_batch_request()
+        if not images:
+            raise ValueError("Missing images")
+        if sum(len(widths) for _, _, widths in images) > MAX_BATCH_VARIANTS:
+            raise ValueError(f"Too many variants requested (max {MAX_BATCH_VARIANTS})")
+
+        for _, data, _ in images:
+            record_image("resize_batch", "in", nbytes=len(data))
+
+        results, errors = {}, {}
+        if len(images) > 1 and IMAGE_POOL_WORKERS > 1:
+            pool = get_process_pool()
+            try:
+                futures = [(image_id, pool.submit(resize_variants, data, widths)) for image_id, data, widths in images]
+                for image_id, future in futures:
+                    try:
+                        results[image_id] = future.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        errors[image_id] = str(e)
+            except BrokenProcessPool:
+                discard_process_pool(pool)
+                results, errors = {}, {}
+        if not results and not errors:
+            for image_id, data, widths in images:
+                try:
+                    results[image_id] = resize_variants(data, widths)
+                except Exception as e:
+                    errors[image_id] = str(e)
+        images = None
+        for variants in results.values():
+            for v in variants:
+                record_image("resize_batch", "out", nbytes=len(v["data"]), size=(v["width"], v["height"]))
+
+        if wants_binary(request):
+            parts = [
+                (f"{image_id}@{v['width']}", v["data"], Image.MIME.get(v["format"].upper(), "application/octet-stream"))
+                for image_id, variants in results.items() for v in variants
+            ]
+            if errors:
+                parts.append(("errors", errors, "application/json"))
+            return multipart_response(parts)
+
+        return jsonify({
+            "results": {
+                image_id: [
+                    {"width": v["width"], "height": v["height"], "format": v["format"],
+                     "image": base64.b64encode(v["data"]).decode("utf-8")}
+                    for v in variants
+                ]
+                for image_id, variants in results.items()
+            },
+            "errors": errors
+        }), 200
+
+    except Exception as e:
+        logging.error(f"Batch resize failed: {e}")
+        return jsonify({"error": f"Batch resize failed: {e}"}), 500
@@ -0,0 +1,214 @@
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from flask import Response
+
+RESULT_CACHE_ENABLED   = os.environ.get("RESULT_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+RESULT_CACHE_MEMORY_MB = int(os.environ.get("RESULT_CACHE_MEMORY_MB", 128))
+RESULT_CACHE_DISK_MB   = int(os.environ.get("RESULT_CACHE_DISK_MB", 2048))
+RESULT_CACHE_DIR       = os.environ.get("RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lystics-results"))
+
+
+def hash_source(source, chunk_size=1024 * 1024):
+    """
+    SHA-256 of a seekable file-like image source; rewinds it afterwards.
+    """
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: source.read(chunk_size), b""):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def make_key(operation, input_hash, params):
+    """
+    Content address for an operation's output: the input bytes' hash plus the
+    operation name and the parameters that affect the output.
+    """
+    payload = json.dumps({"op": operation, "input": input_hash, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache of encoded outputs. A memory LRU holds small entries; every
+    entry is also written to disk (one file per key: a JSON metadata line, then
+    the bytes), and the disk tier evicts least-recently-used files past its cap.
+    """
+    def __init__(self, directory=RESULT_CACHE_DIR, memory_bytes=RESULT_CACHE_MEMORY_MB * 2**20,
+                 disk_bytes=RESULT_CACHE_DISK_MB * 2**20, enabled=RESULT_CACHE_ENABLED):
+        self.enabled = enabled
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = collections.OrderedDict()
+        self._memory_used = 0
+        self._disk_used = None
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """
+        Returns (meta, data) or None.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry
+
+        try:
+            with open(self._path(key), "rb") as f:
+                meta = json.loads(f.readline())
+                data = f.read()
+            os.utime(self._path(key))
+        except (OSError, ValueError):
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+
+        with self._lock:
+            self.counters["disk_hits"] += 1
+        self._remember(key, meta, data)
+        return meta, data
+
+    def put(self, key, meta, data):
+        if not self.enabled:
+            return
+        self._remember(key, meta, data)
+        try:
+            for _ in self.tee(key, meta, [data]):
+                pass
+        except OSError as e:
+            print(f"⚠️ Failed to write result cache entry: {e}")
+
+    def tee(self, key, meta, chunks):
+        """
+        Passes streamed chunks through while writing them to the disk tier; the
+        entry is only committed if the stream completes.
+        """
+        if not self.enabled:
+            yield from chunks
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(tmp_path, "wb")
+        except OSError:
+            yield from chunks
+            return
+
+        size = 0
+        try:
+            f.write(json.dumps(meta).encode("utf-8") + b"\n")
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+                yield chunk
+            f.close()
+            os.replace(tmp_path, path)
+            self._account_disk(size)
+            with self._lock:
+                self.counters["stores"] += 1
+        finally:
+            if not f.closed:
+                f.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _remember(self, key, meta, data):
+        # Large outputs (print-size upscales) only live on disk.
+        if len(data) > self.memory_bytes // 8:
+            return
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = (meta, data)
+            self._memory_used += len(data)
+            while self._memory_used > self.memory_bytes:
+                _, (_, evicted) = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+    def _scan_disk(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _account_disk(self, size):
+        with self._lock:
+            if self._disk_used is None:
+                self._disk_used = sum(s for _, s, _ in self._scan_disk())
+            else:
+                self._disk_used += size
+            if self._disk_used <= self.disk_bytes:
+                return
+            # Evict least recently used files (reads touch mtime) down to 90% of the cap.
+            entries = sorted(self._scan_disk())
+            self._disk_used = sum(s for _, s, _ in entries)
+            for _, entry_size, path in entries:
+                if self._disk_used <= self.disk_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                    self._disk_used -= entry_size
+                    self.counters["evictions"] += 1
+                except OSError:
+                    continue
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                "enabled":        self.enabled,
+                "memory_entries": len(self._memory),
+                "memory_bytes":   self._memory_used,
+                "disk_bytes":     self._disk_used,
+            })
+            return stats
+
+
+result_cache = ResultCache()
+
+
+def etag_for(key, binary):
+    """
+    ETag for one representation of a cached result; JSON and binary bodies differ.
+    """
+    return key if binary else f"{key}-json"
+
+
+def not_modified(req, etag):
+    """
+    304 response when the client's If-None-Match already names this result.
+    """
+    if etag in req.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers["Vary"] = "Accept"
+        return response
+    return None
+
+
+def cache_headers(etag, hit, headers=None):
+    headers = dict(headers or {})
+    headers.update({"ETag": f'"{etag}"', "Vary": "Accept", "X-Cache": "HIT" if hit else "MISS"})
+    return headers
@@ -0,0 +1,141 @@
+import base64
+import collections
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+from PIL import Image
+
+TEMPLATE_CACHE_MAX_BYTES = int(os.environ.get("TEMPLATE_CACHE_MAX_MB", 512)) * 1024 * 1024
+TEMPLATE_REGISTRY_DIR    = os.environ.get("TEMPLATE_REGISTRY_DIR", os.path.join(tempfile.gettempdir(), "lystics-templates"))
+TEMPLATE_REF_PREFIX      = "template:"
+
+# Starts with a letter or digit, so "." and ".." can never name a template file.
+_TEMPLATE_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}\Z")
+
+
+class TemplateCache:
+    """
+    Process-wide LRU of decoded RGBA mockup templates, keyed by a SHA-256 of the
+    payload (base64 text or raw image bytes from a multipart upload) and capped
+    by decoded size (width * height * 4 bytes).
+
+    Cached images are shared: callers must .copy() before mutating (e.g. paste).
+    """
+    def __init__(self, max_bytes=TEMPLATE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def content_hash(data):
+        if isinstance(data, str):
+            data = data.encode("ascii")
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, data):
+        key = self.content_hash(data)
+        with self._lock:
+            img = self._entries.get(key)
+            if img is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return img
+            self.misses += 1
+
+        raw = bytes(data) if isinstance(data, (bytes, bytearray)) else base64.b64decode(data)
+        img = Image.open(io.BytesIO(raw)).convert("RGBA")
+        self._put(key, img)
+        return img
+
+    def _put(self, key, img):
+        size = img.width * img.height * 4
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = img
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.width * evicted.height * 4
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits":      self.hits,
+                "misses":    self.misses,
+                "hit_rate":  round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries":   len(self._entries),
+                "bytes":     self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+template_cache = TemplateCache()
+
+
+def register_template(template_id, b64_data):
+    """
+    Stores a template under an ID so callers can send "template:<id>" instead of
+    the base64 image. The payload is written to TEMPLATE_REGISTRY_DIR, so every
+    worker process on the host can resolve it, and decoded into the cache.
+    """
+    if not _TEMPLATE_ID.match(template_id or ""):
+        raise ValueError(f"Invalid template id: {template_id!r}")
+
+    img = template_cache.get(b64_data)
+    os.makedirs(TEMPLATE_REGISTRY_DIR, exist_ok=True)
+    path = os.path.join(TEMPLATE_REGISTRY_DIR, template_id)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="ascii") as f:
+            f.write(b64_data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    return {"hash": template_cache.content_hash(b64_data), "width": img.width, "height": img.height}
+
+
+def _resolve(value):
+    if isinstance(value, str) and value.startswith(TEMPLATE_REF_PREFIX):
+        template_id = value[len(TEMPLATE_REF_PREFIX):]
+        if not _TEMPLATE_ID.match(template_id):
+            raise ValueError(f"Invalid template id: {template_id!r}")
+        try:
+            with open(os.path.join(TEMPLATE_REGISTRY_DIR, template_id), encoding="ascii") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(f"Unknown template: {template_id}")
+    return value
+
+
+def load_template(value):
+    """
+    Returns the decoded RGBA image for either inline base64 data or a
+    "template:<id>" reference to a registered template.
+    """
+    return template_cache.get(_resolve(value))
+
+
+def template_hash(value):
+    """
+    Content hash of a template without decoding it. A "template:<id>" reference
+    hashes the registered payload, so re-registering an ID changes the hash.
+    """
+    return template_cache.content_hash(_resolve(value))
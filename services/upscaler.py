@@ -1,40 +1,241 @@
-from flask import request, jsonify
-from PIL import Image
+from flask import Response, request, jsonify
+from PIL import Image, ImageChops
 import io
+import os
 import base64
 import logging
+import struct
+import threading
+import zlib
+from services.image_io import read_image_request, wants_binary, stream_encoded, source_size
+from services.result_cache import result_cache, hash_source, make_key, etag_for, not_modified, cache_headers
+from api.metrics import record_image, count_stream
+
+UPSCALE_REQUEST_BUDGET_MB = int(os.environ.get("UPSCALE_REQUEST_BUDGET_MB", 256))
+UPSCALE_MEMORY_BUDGET_MB  = int(os.environ.get("UPSCALE_MEMORY_BUDGET_MB", 768))
+UPSCALE_ADMISSION_TIMEOUT = float(os.environ.get("UPSCALE_ADMISSION_TIMEOUT", 30))
+UPSCALE_BAND_HEIGHT       = int(os.environ.get("UPSCALE_BAND_HEIGHT", 256))
+PNG_IDAT_SIZE             = 256 * 1024
+
+class MemoryAdmission:
+    """
+    Process-wide memory budget for upscales. Requests reserve their estimated
+    footprint before decoding and wait (up to a timeout) while the budget is used
+    up, instead of all allocating at once and taking the worker down.
+    """
+    def __init__(self, capacity_bytes):
+        self.capacity = capacity_bytes
+        self.in_use = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, nbytes, timeout):
+        # A single request larger than the whole budget may still run, alone.
+        nbytes = min(nbytes, self.capacity)
+        with self._cond:
+            self.waiting += 1
+            try:
+                if not self._cond.wait_for(lambda: self.in_use + nbytes <= self.capacity, timeout):
+                    self.rejected += 1
+                    return None
+            finally:
+                self.waiting -= 1
+            self.in_use += nbytes
+            self.admitted += 1
+            return nbytes
+
+    def release(self, nbytes):
+        with self._cond:
+            self.in_use -= nbytes
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {"capacity": self.capacity, "in_use": self.in_use, "waiting": self.waiting,
+                    "admitted": self.admitted, "rejected": self.rejected}
+
+admission = MemoryAdmission(UPSCALE_MEMORY_BUDGET_MB * 1024 * 1024)
+
+def target_size(size, dpi, width_in):
+    original_width, original_height = size
+    aspect_ratio = original_height / original_width
+    target_width = int(width_in * dpi)
+    target_height = int(target_width * aspect_ratio)
+    return target_width, target_height
+
+def upscale_image(img, format, dpi, width_in):
+    """
+    Resamples img to width_in inches at dpi, keeping the aspect ratio.
+    """
+    img = img.convert("RGBA") if format == "PNG" else img.convert("RGB")
+    return img.resize(target_size(img.size, dpi, width_in), Image.Resampling.LANCZOS)
+
+def upscale_save_kwargs(format, dpi):
+    save_kwargs = {"format": format, "dpi": (dpi, dpi)}
+    if format == "JPEG":
+        save_kwargs["quality"] = 95
+    return save_kwargs
+
+def estimate_upscale_bytes(size, out_size, format, tiled, band_height=UPSCALE_BAND_HEIGHT):
+    """
+    Rough peak memory for one upscale: the decoded and mode-converted source plus
+    either the whole output and its encoded copy or, for a tiled PNG, one band at
+    a time. Only PNG is encoded band by band, so JPEG is always charged in full.
+    """
+    channels = 4 if format == "PNG" else 3
+    src = size[0] * size[1] * 4 * 2
+    out = out_size[0] * out_size[1] * channels
+    if not tiled or format != "PNG":
+        return src + out * 2
+    band = out_size[0] * min(band_height, out_size[1]) * channels * 3
+    return src + band
+
+def iter_bands(src, out_size, band_height=UPSCALE_BAND_HEIGHT):
+    """
+    Yields (y, band) horizontal strips of the resampled output. Each strip is
+    resized from its matching source box, and Pillow reads the filter support
+    from outside the box, so strip edges match a single full-size resize.
+    """
+    out_width, out_height = out_size
+    scale_y = src.height / out_height
+    for y0 in range(0, out_height, band_height):
+        y1 = min(out_height, y0 + band_height)
+        box = (0, y0 * scale_y, src.width, y1 * scale_y)
+        yield y0, src.resize((out_width, y1 - y0), Image.Resampling.LANCZOS, box=box)
+
+def _png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+def iter_png_tiled(src, out_size, dpi, band_height=UPSCALE_BAND_HEIGHT):
+    """
+    Encodes the upscaled image as PNG band by band, yielding bytes as they are
+    compressed, so neither the full output nor its encoding is ever held in memory.
+    Rows use the PNG "Up" filter, computed per band with ImageChops.
+    """
+    mode = "RGBA" if src.mode == "RGBA" else "RGB"
+    color_type, channels = (6, 4) if mode == "RGBA" else (2, 3)
+    out_width, out_height = out_size
+    stride = out_width * channels
+    ppm = int(round(dpi / 0.0254))
+
+    yield b"\x89PNG\r\n\x1a\n"
+    yield _png_chunk(b"IHDR", struct.pack(">IIBBBBB", out_width, out_height, 8, color_type, 0, 0, 0))
+    yield _png_chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1))
+
+    compressor = zlib.compressobj(6)
+    pending = bytearray()
+    previous_row = Image.new(mode, (out_width, 1), (0,) * channels)
+
+    for _, band in iter_bands(src, out_size, band_height):
+        # Image shifted down one row: row i of `above` is row i-1 of the output.
+        above = Image.new(mode, band.size)
+        above.paste(previous_row, (0, 0))
+        if band.height > 1:
+            above.paste(band.crop((0, 0, out_width, band.height - 1)), (0, 1))
+        previous_row = band.crop((0, band.height - 1, out_width, band.height))
+
+        raw = ImageChops.subtract_modulo(band, above).tobytes()
+        filtered = b"".join(b"\x02" + raw[i:i + stride] for i in range(0, len(raw), stride))
+        pending += compressor.compress(filtered)
+        if len(pending) >= PNG_IDAT_SIZE:
+            yield _png_chunk(b"IDAT", bytes(pending))
+            pending.clear()
+
+    pending += compressor.flush()
+    yield _png_chunk(b"IDAT", bytes(pending))
+    yield _png_chunk(b"IEND", b"")
+
+def save_png_tiled(src, out_size, dpi, fp, band_height=UPSCALE_BAND_HEIGHT):
+    for chunk in iter_png_tiled(src, out_size, dpi, band_height):
+        fp.write(chunk)
 
 def upscaleImage():
+    reserved = None
     try:
-        data = request.get_json(force=True)
-        base64_image = data.get('image')
-        format = data.get('format', 'JPEG').upper()
-        dpi = int(data.get('dpi', 300))
-        width_in = float(data['widthInches'])
+        source, params = read_image_request(request)
+        format = params.get('format', 'JPEG').upper()
+        dpi = int(params.get('dpi', 300))
+        width_in = float(params['widthInches'])
 
-        if not base64_image:
+        if not source:
             raise ValueError("Missing image data")
 
-        image_bytes = base64.b64decode(base64_image)
-        img = Image.open(io.BytesIO(image_bytes))
-        img = img.convert("RGBA") if format == "PNG" else img.convert("RGB")
+        record_image("upscale", "in", nbytes=source_size(source))
+
+        # Tiled and full encodes are interchangeable, so the mode is not part of the key.
+        binary = wants_binary(request)
+        key = make_key("upscale", hash_source(source), {"format": format, "dpi": dpi, "widthInches": width_in})
+        etag = etag_for(key, binary)
+        unchanged = not_modified(request, etag)
+        if unchanged:
+            return unchanged
+
+        cached = result_cache.get(key)
+        if cached:
+            meta, data = cached
+            record_image("upscale", "out", nbytes=len(data))
+            if binary:
+                return Response(data, mimetype=Image.MIME.get(format, "application/octet-stream"),
+                                headers=cache_headers(etag, True, {"X-Image-Dimensions": meta["dimensions"]}))
+            upscaled_base64 = base64.b64encode(data).decode("utf-8")
+            return jsonify({"image": upscaled_base64, "dimensions": meta["dimensions"]}), 200, cache_headers(etag, True)
+
+        img = Image.open(source)
+        out_size = target_size(img.size, dpi, width_in)
+        record_image("upscale", "in", size=img.size)
+        record_image("upscale", "out", size=out_size)
+        dimensions = f"{out_size[0]}x{out_size[1]}"
+        save_kwargs = upscale_save_kwargs(format, dpi)
+        budget = UPSCALE_REQUEST_BUDGET_MB * 1024 * 1024
+
+        # Only PNG can be encoded band by band; JPEG always needs the full canvas.
+        tiled = format == "PNG" and (
+            str(params.get('tiled', '')).lower() in ('1', 'true', 'yes') or
+            estimate_upscale_bytes(img.size, out_size, format, tiled=False) > budget)
+        estimate = estimate_upscale_bytes(img.size, out_size, format, tiled)
+        if estimate > budget:
+            return jsonify({"error": f"Upscale to {dimensions} needs ~{estimate // 2**20} MB, over the "
+                                     f"{UPSCALE_REQUEST_BUDGET_MB} MB per-request budget"}), 413
+
+        reserved = admission.acquire(estimate, UPSCALE_ADMISSION_TIMEOUT)
+        if reserved is None:
+            return jsonify({"error": "Upscaler is at its memory budget, retry shortly"}), 503, {"Retry-After": "5"}
+
+        if not tiled:
+            upscaled_img = upscale_image(img, format, dpi, width_in)
+            img.close()
+            encode = lambda fp: upscaled_img.save(fp, **save_kwargs)
+        else:
+            src = img.convert("RGBA")
+            img.close()
+            encode = lambda fp: save_png_tiled(src, out_size, dpi, fp)
 
-        original_width, original_height = img.size
-        aspect_ratio = original_height / original_width
-        target_width = int(width_in * dpi)
-        target_height = int(target_width * aspect_ratio)
+        meta = {"dimensions": dimensions}
+        headers = cache_headers(etag, False, {"X-Image-Dimensions": dimensions, "X-Upscale-Mode": "tiled" if tiled else "full"})
+        if binary:
+            if tiled:
+                chunks = iter_png_tiled(src, out_size, dpi)
+            else:
+                chunks = stream_encoded(encode)
+            response = Response(count_stream(result_cache.tee(key, meta, chunks), "upscale"),
+                                mimetype=Image.MIME.get(format, "application/octet-stream"), headers=headers)
+            held, reserved = reserved, None
+            response.call_on_close(lambda: admission.release(held))
+            return response
 
-        upscaled_img = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
         out_buffer = io.BytesIO()
-        save_kwargs = {"format": format, "dpi": (dpi, dpi)}
-        if format == "JPEG":
-            save_kwargs["quality"] = 95
-        upscaled_img.save(out_buffer, **save_kwargs)
+        encode(out_buffer)
+        record_image("upscale", "out", nbytes=out_buffer.tell())
+        result_cache.put(key, meta, out_buffer.getvalue())
         out_buffer.seek(0)
         upscaled_base64 = base64.b64encode(out_buffer.read()).decode("utf-8")
-        dimensions = f"{target_width}x{target_height}"
-        return jsonify({"image": upscaled_base64, "dimensions": dimensions}), 200
+        return jsonify({"image": upscaled_base64, "dimensions": dimensions}), 200, headers
 
     except Exception as e:
         logging.error(f"Upscale failed: {e}")
-        return jsonify({"error": f"Upscale failed: {e}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Upscale failed: {e}"}), 500
+    finally:
+        if reserved:
+            admission.release(reserved)
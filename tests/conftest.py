@@ -0,0 +1,53 @@
+import json
+import os
+import tempfile
+
+# Module-level settings are read at import time, so point every shared file at a
+# throwaway directory and switch off rate limiting before anything is imported.
+_scratch = tempfile.mkdtemp(prefix="lystics-tests-")
+os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+os.environ.setdefault("LEASE_BACKEND", "memory")
+os.environ.setdefault("LEASE_DB", os.path.join(_scratch, "leases.db"))
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(_scratch, "jobs.db"))
+os.environ.setdefault("LOG_SPILL_DIR", os.path.join(_scratch, "log-spill"))
+os.environ.setdefault("METRICS_DIR", os.path.join(_scratch, "metrics"))
+os.environ.setdefault("RESULT_CACHE_ENABLED", "false")
+os.environ.setdefault("GAS_BACKOFF_BASE", "0.01")
+os.environ.setdefault("GAS_BACKOFF_MAX", "0.05")
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fresh_gateway_state(monkeypatch):
+    """
+    Breakers, rate buckets, leases and the unsupported-function memory are
+    process-wide; start every test from a clean slate.
+    """
+    import api.api_gateway as gateway
+    import agents.leases as leases
+    import agents.queue_gas_call as rate_limits
+    from agents.workflow_config import gas_rate_limits
+
+    monkeypatch.setenv("GAS_RATE_LIMITS", json.dumps({name: {"rate": 1e9, "burst": 1e9} for name in gas_rate_limits}))
+    gateway._breakers.clear()
+    gateway._unsupported_functions.clear()
+    rate_limits._backend = None
+    leases._backend = None
+    yield
+
+
+@pytest.fixture
+def gas(monkeypatch):
+    """
+    A running GAS stand-in with five "Download Image" rows, wired into the gateway.
+    """
+    import api.api_gateway as gateway
+    from tools.gas_standin import GasStandIn, synthetic_rows
+
+    standin = GasStandIn(synthetic_rows(5))
+    monkeypatch.setattr(gateway, "GAS_BASE_URL", standin.start())
+    yield standin
+    gateway.get_log_shipper().flush()
+    standin.stop()
+
@@ -0,0 +1,179 @@
+import json
+from api.api_gateway import get_log_shipper
+from agents.agent_manager import runManagerPipeline
+from agents.pipeline_runs import PipelineRun
+from agents.workflow_config import gas_rate_limits
+
+
+def test_rate_limited_rows_are_deferred_not_processed(gas, monkeypatch):
+    limits = {name: {"rate": 1e9, "burst": 1e9} for name in gas_rate_limits}
+    limits["downloadImagesToDrive"] = {"rate": 0.001, "burst": 1}
+    monkeypatch.setenv("GAS_RATE_LIMITS", json.dumps(limits))
+
+    run = PipelineRun()
+    runManagerPipeline(run)
+
+    assert gas.call_counts["downloadImagesToDrive"] == 1
+    assert run.rows_processed == 1
+    assert run.rows_deferred == 4
+    assert run.rows_failed == 0
+    statuses = sorted(row["Status"] for row in gas.rows.values())
+    assert statuses.count("Download Image") == 4
+    assert sum(gas.error_counts.values()) == 0
+
+
+def _fail_row(gas, function_name, row_id):
+    run_task = gas.handlers[function_name]
+
+    def handler(params):
+        if params["row"] == row_id:
+            raise RuntimeError("Drive quota exceeded")
+        return run_task(params)
+    gas.handlers[function_name] = handler
+
+
+def test_third_failure_goes_to_supervisor_in_the_same_run(gas):
+    gas.rows[2]["Error Count"] = 2
+    _fail_row(gas, "downloadImagesToDrive", 2)
+
+    run = PipelineRun()
+    runManagerPipeline(run)
+
+    assert run.rows_failed == 1
+    assert gas.error_counts[2] == 1
+    assert gas.rows[2]["Status"] == "Supervisor"
+    assert gas.rows[3]["Status"] != "Supervisor"
+
+
+def test_error_counts_fall_back_to_single_reads(gas):
+    from agents.agent_manager import getProgressErrorCounts
+    from models.job_model import LysticsJob
+
+    gas.remove_functions("getProgressErrorCounts")
+    gas.error_counts[3] = 4
+    jobs = [LysticsJob.from_row(row) for row in gas.rows.values()]
+
+    assert getProgressErrorCounts(jobs) == {2: 0, 3: 4, 4: 0, 5: 0, 6: 0}
+    assert getProgressErrorCounts(jobs)[3] == 4
+    assert gas.call_counts["getProgressErrorCounts"] == 1
+    assert gas.call_counts["getProgressErrorCount"] == 10
+
+
+def test_pipeline_runs_without_any_bulk_function(gas):
+    gas.remove_functions("runBatch", "logAgentActions", "getProgressErrorCounts", "updateRowAssignmentsBulk")
+
+    run = PipelineRun()
+    runManagerPipeline(run)
+
+    assert run.errors == []
+    assert run.rows_processed == 5
+    assert all(row["Assigned Worker"] for row in gas.rows.values())
+    assert all(row["Status"] != "Download Image" for row in gas.rows.values())
+
+
+def test_failed_bulk_assignment_falls_back_to_single_rows(gas):
+    gas.handlers["updateRowAssignmentsBulk"] = lambda params: (_ for _ in ()).throw(RuntimeError("Service timed out"))
+
+    run = PipelineRun()
+    runManagerPipeline(run)
+
+    assert any("updateRowAssignmentsBulk failed" in e["error"] for e in run.errors)
+    assert gas.call_counts["updateRowAssignments"] == 5
+    assert all(row["Assigned Worker"] for row in gas.rows.values())
+    assert run.rows_processed == 5
+
+
+def test_unleased_claims_wait_for_the_grace_period(gas):
+    import datetime
+    from agents.agent_manager import run_diagnostics, UNLEASED_CLAIM_GRACE
+    from models.job_model import LysticsJob
+
+    now = datetime.datetime.utcnow()
+    recent = (now - datetime.timedelta(minutes=5)).isoformat()
+    old = (now - datetime.timedelta(seconds=UNLEASED_CLAIM_GRACE + 60)).isoformat()
+    gas.rows[2].update({"Status": "Processing: Download Image", "Last Attempted": recent})
+    gas.rows[3].update({"Status": "Processing: Download Image", "Last Attempted": old})
+
+    run_diagnostics([LysticsJob.from_row(row) for row in gas.rows.values()])
+
+    assert UNLEASED_CLAIM_GRACE >= 900
+    assert gas.rows[2]["Status"] == "Processing: Download Image"
+    assert gas.rows[3]["Status"] == "Download Image"
+
+    get_log_shipper().flush()
+    resets = [entry for entry in gas.logs if entry["outcome"] == "Claim Reset"]
+    assert [(entry["action"], entry["notes"]) for entry in resets] == \
+        [("Row 3", "Claimed without a lease. New status: Download Image")]
+
+
+def test_escalations_are_logged_with_their_reason(gas):
+    from agents.agent_manager import run_diagnostics
+    from models.job_model import LysticsJob
+
+    gas.error_counts[4] = 3
+
+    run_diagnostics([LysticsJob.from_row(row) for row in gas.rows.values()])
+    get_log_shipper().flush()
+
+    assert gas.rows[4]["Status"] == "Supervisor"
+    escalated = [entry for entry in gas.logs if entry["outcome"] == "Escalated"]
+    assert [(entry["action"], entry["notes"]) for entry in escalated] == \
+        [("Row 4", "Task 'Download Image' failed 3 times. New status: Supervisor")]
+
+
+def _record_status_writes(gas):
+    writes = {}
+    update_row_status = gas.handlers["updateRowStatus"]
+
+    def handler(params):
+        writes.setdefault(params["row"], []).append(params["new_status"])
+        return update_row_status(params)
+    gas.handlers["updateRowStatus"] = handler
+    return writes
+
+
+def _run_worker(gas, **kwargs):
+    from agents.agent_manager import run_worker_on_assigned_jobs
+    from models.job_model import LysticsJob
+
+    jobs = [LysticsJob.from_row(dict(row, **{"Assigned Worker": "worker1"})) for row in gas.rows.values()]
+    return {o["row"]: o for o in run_worker_on_assigned_jobs("worker1", jobs, **kwargs)}
+
+
+def test_rows_advance_through_every_step_in_one_run(gas):
+    from agents.task_map import fn_map
+    from agents.workflow_config import workflow_steps
+
+    writes = _record_status_writes(gas)
+    steps = workflow_steps["POD Shirt"]
+
+    outcomes = _run_worker(gas, max_steps=20)
+
+    assert all(o["success"] and o["steps"] == steps for o in outcomes.values())
+    assert all(row["Status"] == "Completed" for row in gas.rows.values())
+    assert all(gas.call_counts[fn_map[step]] == 5 for step in steps)
+    assert writes == {row: ["Processing: Download Image", "Completed"] for row in gas.rows}
+    assert gas.call_counts["updateRowStatus"] == 2 * len(gas.rows)
+
+
+def test_rows_stop_at_the_step_budget(gas):
+    writes = _record_status_writes(gas)
+
+    outcomes = _run_worker(gas, max_steps=2)
+
+    assert all(o["steps"] == ["Download Image", "Upscale Image"] for o in outcomes.values())
+    assert all(row["Status"] == "Add Mockups" for row in gas.rows.values())
+    assert gas.call_counts["updateImagesFromMockupFolders"] == 0
+    assert writes == {row: ["Processing: Download Image", "Add Mockups"] for row in gas.rows}
+
+
+def test_rows_stop_at_the_time_budget(gas):
+    gas.function_latency["downloadImagesToDrive"] = 0.2
+    writes = _record_status_writes(gas)
+
+    outcomes = _run_worker(gas, max_steps=20, time_budget=0.1)
+
+    assert all(o["success"] and o["steps"] == ["Download Image"] for o in outcomes.values())
+    assert all(row["Status"] == "Upscale Image" for row in gas.rows.values())
+    assert gas.call_counts["copyUpscaleImageAndStoreVariants"] == 0
+    assert writes == {row: ["Processing: Download Image", "Upscale Image"] for row in gas.rows}
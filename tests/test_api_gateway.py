@@ -0,0 +1,102 @@
+import pytest
+from api.api_gateway import call_gas_function, call_gas_batch, GasBatch, function_supported, BATCH_FUNCTION, GAS_MAX_RETRIES
+from agents.agent_manager import runManagerPipeline
+from agents.pipeline_runs import PipelineRun
+
+
+def test_batch_runs_operations_in_one_call(gas):
+    results = call_gas_batch([
+        {"function": "updateRowStatus", "params": {"row": 2, "new_status": "Upscale Image"}},
+        {"function": "updateRowStatus", "params": {"row": 999, "new_status": "Upscale Image"}},
+    ])
+
+    assert [r["success"] for r in results] == [True, False]
+    assert "not found" in results[1]["error"]
+    assert gas.call_counts[BATCH_FUNCTION] == 1
+    assert gas.rows[2]["Status"] == "Upscale Image"
+
+
+def test_batch_falls_back_to_single_calls_without_run_batch(gas):
+    gas.remove_functions(BATCH_FUNCTION)
+
+    with GasBatch() as batch:
+        batch.add("updateRowStatus", {"row": 2, "new_status": "Upscale Image"})
+        batch.add("incrementProgressErrorCount", {"row": 3})
+
+    assert not batch.errors
+    assert gas.rows[2]["Status"] == "Upscale Image"
+    assert gas.error_counts[3] == 1
+    assert not function_supported(BATCH_FUNCTION)
+
+    # The missing function is remembered: the next batch goes straight to single calls.
+    call_gas_batch([{"function": "updateRowStatus", "params": {"row": 3, "new_status": "Upscale Image"}}])
+    assert gas.call_counts[BATCH_FUNCTION] == 1
+    assert gas.call_counts["updateRowStatus"] == 2
+
+
+def test_batch_reports_every_operation_when_the_request_fails(gas):
+    gas.function_failure_rates[BATCH_FUNCTION] = 1.0
+    gas.handlers[BATCH_FUNCTION] = lambda params: (_ for _ in ()).throw(RuntimeError("quota exceeded"))
+
+    results = call_gas_batch([{"function": "updateRowStatus", "params": {"row": 2, "new_status": "x"}}] * 2)
+
+    assert [r["success"] for r in results] == [False, False]
+    assert function_supported(BATCH_FUNCTION)
+    assert gas.rows[2]["Status"] == "Download Image"
+
+
+def test_pipeline_advances_rows_without_run_batch(gas):
+    gas.remove_functions(BATCH_FUNCTION)
+
+    run = PipelineRun()
+    runManagerPipeline(run)
+
+    assert run.errors == []
+    assert run.tasks_completed > 0
+    assert all(row["Status"] not in ("Download Image", "Processing: Download Image") for row in gas.rows.values())
+
+
+def test_pipeline_records_failed_writes_on_the_run(gas):
+    gas.remove_functions("updateRowStatus")
+
+    run = PipelineRun()
+    runManagerPipeline(run)
+
+    assert run.tasks_completed == 0
+    assert run.rows_failed == 5
+    assert any("updateRowStatus" in e["error"] for e in run.errors)
+
+
+def test_pipeline_records_failed_status_batch_operations(gas):
+    gas.function_failure_rates["downloadImagesToDrive"] = 1.0
+    gas.remove_functions("incrementProgressErrorCount")
+
+    run = PipelineRun()
+    runManagerPipeline(run)
+
+    batch_errors = [e["error"] for e in run.errors if e["error"].startswith("Worker ")]
+    assert len(batch_errors) == 5
+    assert all("incrementProgressErrorCount failed" in e for e in batch_errors)
+
+
+def test_server_errors_are_only_retried_for_read_only_functions(gas):
+    gas.http_error_rate = 1.0
+    gas.http_error_status = 500
+
+    with pytest.raises(Exception):
+        call_gas_function("incrementProgressErrorCount", {"row": 2})
+    assert gas.call_counts["incrementProgressErrorCount"] == 0
+    assert gas.request_count == 1
+
+    with pytest.raises(Exception):
+        call_gas_function("getRowsNeedingProcessing", {})
+    assert gas.request_count == 2 + GAS_MAX_RETRIES
+
+
+def test_throttling_is_retried_for_every_function(gas):
+    gas.http_error_rate = 1.0
+    gas.http_error_status = 429
+
+    with pytest.raises(Exception):
+        call_gas_function("updateRowStatus", {"row": 2, "new_status": "x"})
+    assert gas.request_count == 1 + GAS_MAX_RETRIES
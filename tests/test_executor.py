@@ -0,0 +1,39 @@
+import threading
+import time
+from agents.executor import RowExecutor
+
+
+def test_tasks_for_one_row_run_in_order():
+    seen = []
+    with RowExecutor(max_threads=4) as executor:
+        futures = [executor.submit("worker1", 2, "fn", seen.append, i) for i in range(20)]
+        assert all(f.result(timeout=5)["success"] for f in futures)
+    assert seen == list(range(20))
+
+
+def test_failing_task_is_recorded_not_raised():
+    with RowExecutor() as executor:
+        outcome = executor.submit("worker1", 2, "fn", lambda: 1 / 0).result(timeout=5)
+    assert not outcome["success"]
+    assert "division" in outcome["error"]
+
+
+def test_delayed_task_does_not_hold_a_worker_slot():
+    with RowExecutor(worker_limits={"default": 1}) as executor:
+        delayed = executor.submit("worker1", 2, "fn", time.monotonic, delay=0.5)
+        started = time.monotonic()
+        other = executor.submit("worker1", 3, "fn", time.monotonic).result(timeout=5)
+        assert other["result"] - started < 0.25
+        assert delayed.result(timeout=5)["result"] - started >= 0.45
+
+
+def test_shutdown_resolves_pending_delayed_tasks():
+    ran = threading.Event()
+    executor = RowExecutor()
+    future = executor.submit("worker1", 2, "fn", ran.set, delay=30)
+    executor.shutdown()
+
+    outcome = future.result(timeout=1)
+    assert not outcome["success"]
+    assert "shut down" in outcome["error"]
+    assert not ran.is_set()
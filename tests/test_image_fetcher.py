@@ -0,0 +1,104 @@
+import os
+import threading
+import pytest
+from services.image_fetcher import ImageFetcher, ImageFetchError
+from tools.image_fixture_server import ImageFixtureServer, fixture_png
+
+
+@pytest.fixture
+def origin():
+    server = ImageFixtureServer()
+    base_url = server.start()
+    server.base_url = base_url
+    yield server
+    server.stop()
+
+
+def _fetcher(tmp_path, **kwargs):
+    kwargs.setdefault("fresh_seconds", 0)
+    return ImageFetcher(cache_dir=str(tmp_path / "downloads"), **kwargs)
+
+
+def _cached_bodies(fetcher):
+    if not os.path.isdir(fetcher.cache_dir):
+        return []
+    return [name for name in os.listdir(fetcher.cache_dir) if name.endswith(".bin")]
+
+
+@pytest.mark.parametrize("validator", ["etag", "last_modified"])
+def test_304_revalidation_reuses_the_disk_copy(origin, tmp_path, validator):
+    origin.etags = validator == "etag"
+    origin.last_modified = validator == "last_modified"
+    fetcher = _fetcher(tmp_path)
+    url = f"{origin.base_url}/img/mug"
+
+    assert fetcher.fetch(url) == fixture_png("mug")
+    assert fetcher.fetch(url) == fixture_png("mug")
+    assert (origin.request_count, origin.not_modified_count) == (2, 1)
+
+    # A second fetcher over the same directory revalidates what the first stored.
+    assert _fetcher(tmp_path).fetch(url) == fixture_png("mug")
+    assert origin.not_modified_count == 2
+
+    origin.update("mug")
+    assert fetcher.fetch(url) == fixture_png("mug", version=1)
+    stats = fetcher.stats()
+    assert (stats["downloads"], stats["revalidated"], stats["errors"]) == (2, 1, 0)
+
+
+def test_fresh_copy_is_served_without_a_request(origin, tmp_path):
+    fetcher = _fetcher(tmp_path, fresh_seconds=300)
+    url = f"{origin.base_url}/img/mug"
+
+    fetcher.fetch(url)
+    fetcher.fetch(url)
+
+    assert origin.request_count == 1
+    assert fetcher.stats()["fresh_hits"] == 1
+
+
+def test_concurrent_fetches_share_one_upstream_request(origin, tmp_path):
+    origin.latency = 0.3
+    fetcher = _fetcher(tmp_path)
+    url = f"{origin.base_url}/img/poster"
+    start = threading.Barrier(8)
+    results = []
+
+    def fetch():
+        start.wait()
+        results.append(fetcher.fetch(url))
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert results == [fixture_png("poster")] * 8
+    assert origin.request_count == 1
+    stats = fetcher.stats()
+    assert (stats["downloads"], stats["deduplicated"], stats["inflight"]) == (1, 7, 0)
+
+
+@pytest.mark.parametrize("query, message", [("kb=64", "over the"), ("kb=64&chunked=1", "exceeds the")],
+                         ids=["content-length", "chunked"])
+def test_size_limit_aborts_oversized_bodies(origin, tmp_path, query, message):
+    fetcher = _fetcher(tmp_path, max_bytes=16 * 1024)
+
+    with pytest.raises(ImageFetchError, match=message):
+        fetcher.fetch(f"{origin.base_url}/img/banner?{query}")
+
+    assert _cached_bodies(fetcher) == []
+    assert fetcher.stats()["errors"] == 1
+    assert fetcher.fetch(f"{origin.base_url}/img/banner?kb=8")
+
+
+def test_slow_origin_times_out(origin, tmp_path):
+    origin.latency = 1.0
+    fetcher = _fetcher(tmp_path, timeout=(1, 0.1))
+
+    with pytest.raises(ImageFetchError, match="Failed to fetch"):
+        fetcher.fetch(f"{origin.base_url}/img/mug")
+
+    assert _cached_bodies(fetcher) == []
+    stats = fetcher.stats()
+    assert (stats["errors"], stats["downloads"], stats["inflight"]) == (1, 0, 0)
@@ -0,0 +1,82 @@
+import base64
+import io
+import json
+from email.parser import BytesParser
+import pytest
+from flask import Flask
+from services.image_io import read_image_request, wants_binary, multipart_response
+
+IMAGE = b"\x89PNG\r\n\x1a\nnot-really-a-png"
+
+app = Flask(__name__)
+
+
+def _multipart():
+    return {"content_type": "multipart/form-data",
+            "data": {"image": (io.BytesIO(IMAGE), "image.png"), "width": "300"}}
+
+
+def _raw():
+    return {"content_type": "image/png", "data": IMAGE, "query_string": {"width": "300"}}
+
+
+def _json():
+    return {"json": {"image": base64.b64encode(IMAGE).decode("ascii"), "width": "300"}}
+
+
+@pytest.mark.parametrize("request_kwargs", [_multipart, _raw, _json], ids=["multipart", "raw", "json"])
+def test_every_request_shape_yields_the_same_source_and_params(request_kwargs):
+    with app.test_request_context("/resizeJson", method="POST", **request_kwargs()):
+        from flask import request
+        source, params = read_image_request(request)
+
+        assert source.read() == IMAGE
+        assert params == {"width": "300"}
+
+
+@pytest.mark.parametrize("request_kwargs", [
+    {"content_type": "multipart/form-data", "data": {"width": "300"}},
+    {"content_type": "application/octet-stream", "data": b""},
+    {"json": {"width": "300"}},
+], ids=["multipart", "raw", "json"])
+def test_missing_image_gives_no_source(request_kwargs):
+    with app.test_request_context("/resizeJson", method="POST", **request_kwargs):
+        from flask import request
+        source, _ = read_image_request(request)
+
+        assert source is None
+
+
+@pytest.mark.parametrize("headers, query, expected", [
+    ({}, {}, False),
+    ({"Accept": "*/*"}, {}, False),
+    ({"Accept": "application/json"}, {}, False),
+    ({"Accept": "image/png"}, {}, True),
+    ({"Accept": "multipart/mixed"}, {}, True),
+    ({}, {"response": "binary"}, True),
+])
+def test_wants_binary_only_when_the_client_asks(headers, query, expected):
+    with app.test_request_context("/resizeJson", method="POST", headers=headers, query_string=query):
+        from flask import request
+        assert wants_binary(request) is expected
+
+
+def test_multipart_response_parts_round_trip():
+    response = multipart_response(
+        [("a@100", IMAGE, "image/png"), ("errors", {"b": "bad image"}, "application/json")],
+        headers={"X-Test": "1"},
+    )
+
+    assert response.headers["X-Test"] == "1"
+    body = response.get_data()
+    message = BytesParser().parsebytes(
+        f"Content-Type: {response.headers['Content-Type']}\r\n\r\n".encode("ascii") + body
+    )
+    parts = message.get_payload()
+
+    assert [p.get_param("name", header="Content-Disposition") for p in parts] == ["a@100", "errors"]
+    assert parts[0].get_content_type() == "image/png"
+    assert parts[0].get_payload(decode=True) == IMAGE
+    assert int(parts[0]["Content-Length"]) == len(IMAGE)
+    assert json.loads(parts[1].get_payload(decode=True)) == {"b": "bad image"}
+    assert body.endswith(f"--{response.mimetype_params['boundary']}--\r\n".encode("ascii"))
@@ -0,0 +1,77 @@
+import datetime
+import pytest
+from agents.agent_manager import determine_next_status
+from agents.workflow_config import workflow_steps, workflow_steps_with_priority
+from models.job_model import LysticsJob, parse_timestamp
+
+
+def test_from_row_with_every_column():
+    job = LysticsJob.from_row({
+        "Row": 7, "SKU": " SKU-7 ", "Job ID": 42, "Status": "Processing: Upscale Image",
+        "Workflow Type": "POD Shirt", "Assigned Worker": "Upscaler", "Last Attempted": "2026-03-01T12:30:00Z",
+        "Error Count": "2",
+    })
+
+    assert (job.row_id, job.sku, job.job_id, job.workflow_type, job.assigned_worker) == \
+        (7, "SKU-7", "42", "POD Shirt", "Upscaler")
+    assert (job.status, job.processing, job.sheet_status) == ("Upscale Image", True, "Processing: Upscale Image")
+    assert job.last_attempted == datetime.datetime(2026, 3, 1, 12, 30)
+    assert job.error_count == 2
+
+
+def test_from_row_with_missing_columns():
+    job = LysticsJob.from_row({"Row": 3, "Title": "Fallback title"})
+
+    assert (job.row_id, job.sku, job.job_id, job.status, job.workflow_type, job.assigned_worker) == \
+        (3, "Fallback title", "", "", "", "")
+    assert (job.last_attempted, job.error_count, job.processing) == (None, None, False)
+    assert job.sheet_status == ""
+
+
+def test_from_row_ignores_extra_columns_and_reads_a_custom_error_field():
+    row = {"Row": 4, "SKU": "SKU-4", "Status": "Create JSON", "Notes": "rush order", "Retries": "5",
+           "Error Count": "junk"}
+
+    job = LysticsJob.from_row(row, error_count_field="Retries")
+
+    assert job.error_count == 5
+    assert not hasattr(job, "Notes") and not hasattr(job, "__dict__")
+    assert LysticsJob.from_row(row).error_count is None
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2026-03-01T12:30:00Z", datetime.datetime(2026, 3, 1, 12, 30)),
+    ("2026-03-01T12:30:00.250Z", datetime.datetime(2026, 3, 1, 12, 30, 0, 250000)),
+    ("2026-03-01T14:30:00+02:00", datetime.datetime(2026, 3, 1, 12, 30)),
+    ("2026-03-01T12:30:00", datetime.datetime(2026, 3, 1, 12, 30)),
+    (" 2026-03-01 12:30:00 ", datetime.datetime(2026, 3, 1, 12, 30)),
+    (datetime.datetime(2026, 3, 1, 12, 30), datetime.datetime(2026, 3, 1, 12, 30)),
+    (datetime.datetime(2026, 3, 1, 7, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=-5))),
+     datetime.datetime(2026, 3, 1, 12, 30)),
+    ("", None),
+    ("   ", None),
+    (None, None),
+    ("not a date", None),
+    (12345, None),
+])
+def test_parse_timestamp_returns_naive_utc(value, expected):
+    parsed = parse_timestamp(value)
+
+    assert parsed == expected
+    assert parsed is None or parsed.tzinfo is None
+
+
+@pytest.mark.parametrize("workflow_type", sorted(workflow_steps))
+def test_transitions_walk_every_workflow(workflow_type):
+    steps = workflow_steps[workflow_type]
+
+    for step, following in zip(steps, steps[1:] + [None]):
+        assert determine_next_status(workflow_type, step) == following
+        assert determine_next_status(workflow_type, f"Processing: {step}") == following
+    assert determine_next_status(workflow_type, "Unknown step") == steps[0]
+    assert determine_next_status(workflow_type, "") == steps[0]
+    assert [entry["step"] for entry in workflow_steps_with_priority[workflow_type]] == steps
+
+
+def test_unknown_workflow_has_no_next_step():
+    assert determine_next_status("Not a workflow", "Download Image") is None
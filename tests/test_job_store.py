@@ -0,0 +1,125 @@
+import fcntl
+import os
+import time
+import pytest
+import agents.agent_manager as agent_manager
+import models.job_store as job_store
+from agents.pipeline_runs import PipelineRun
+
+
+@pytest.fixture
+def store(gas, tmp_path, monkeypatch):
+    """
+    A job store mirroring the stand-in sheet, used by the pipeline; the
+    background syncer is marked as started so only the test drives syncs.
+    """
+    store = job_store.JobStore(str(tmp_path / "jobs.db"))
+    syncer = job_store.JobSyncer(store)
+    syncer._pid = os.getpid()
+    monkeypatch.setattr(job_store, "_job_store", store)
+    monkeypatch.setattr(job_store, "_job_syncer", syncer)
+    monkeypatch.setattr(agent_manager, "JOB_STORE_ENABLED", True)
+    return store
+
+
+def test_third_failure_goes_to_supervisor_in_the_same_run(gas, store):
+    gas.rows[2]["Error Count"] = 2
+    run_task = gas.handlers["downloadImagesToDrive"]
+    gas.handlers["downloadImagesToDrive"] = lambda params: (
+        (_ for _ in ()).throw(RuntimeError("Drive quota exceeded")) if params["row"] == 2 else run_task(params))
+
+    run = PipelineRun()
+    agent_manager.runManagerPipeline(run)
+
+    assert run.rows_failed == 1
+    assert gas.rows[2]["Status"] == "Supervisor"
+    assert store.pending_count() == 0
+
+
+def test_pipeline_skips_when_the_sync_lock_is_held(gas, store, monkeypatch):
+    with open(f"{store.path}.sync.lock", "w") as other_process:
+        fcntl.flock(other_process, fcntl.LOCK_EX)
+        assert store.sync(wait=0.2) is False
+
+        run = PipelineRun()
+        monkeypatch.setattr(store, "sync", lambda: job_store.JobStore.sync(store, wait=0.2))
+        agent_manager.runManagerPipeline(run)
+
+    assert run.status == "skipped"
+    assert run.errors
+    assert gas.call_counts["getRowsNeedingProcessing"] == 0
+    assert all(row["Status"] == "Download Image" for row in gas.rows.values())
+
+
+def test_syncer_pushes_without_pulling(gas, store):
+    store.sync()
+    with store.batch() as batch:
+        batch.add("updateRowStatus", {"row": 2, "new_status": "Upscale Image"})
+    pulls = gas.call_counts["getRowsNeedingProcessing"]
+
+    job_store.JobSyncer(store, interval=0.05).ensure_started()
+    for _ in range(50):
+        if gas.rows[2]["Status"] == "Upscale Image":
+            break
+        time.sleep(0.05)
+
+    assert gas.rows[2]["Status"] == "Upscale Image"
+    assert gas.call_counts["getRowsNeedingProcessing"] == pulls
+
+
+def test_push_falls_back_to_single_assignments(gas, store):
+    gas.remove_functions("updateRowAssignmentsBulk")
+    store.sync()
+    with store.batch() as batch:
+        batch.add("updateRowAssignmentsBulk", {"assignments": [
+            {"row": 2, "assigned_worker": "worker1", "job_id": "j2"},
+            {"row": 3, "assigned_worker": "worker2", "job_id": "j3"}]})
+
+    store.push()
+    assert store.pending_count() == 2
+    store.push()
+
+    assert store.pending_count() == 0
+    assert (gas.rows[2]["Assigned Worker"], gas.rows[3]["Job ID"]) == ("worker1", "j3")
+
+
+def test_local_changes_are_pushed_and_coalesced(gas, store):
+    store.sync()
+    with store.batch() as batch:
+        batch.add("updateRowStatus", {"row": 3, "new_status": "Processing: Download Image"})
+        batch.add("updateRowStatus", {"row": 3, "new_status": "Upscale Image"})
+        batch.add("incrementProgressErrorCount", {"row": 3})
+        batch.add("incrementProgressErrorCount", {"row": 3})
+    assert store.pending_count() == 4
+
+    assert store.sync()
+
+    assert store.pending_count() == 0
+    assert gas.rows[3]["Status"] == "Upscale Image"
+    assert gas.call_counts["updateRowStatus"] == 1
+    assert gas.error_counts[3] == 2
+    assert {job.row_id: job.error_count for job in store.load_jobs()}[3] == 2
+
+
+def test_sheet_edit_wins_over_an_unpushed_local_change(gas, store):
+    store.sync()
+    with store.batch() as batch:
+        batch.add("updateRowStatus", {"row": 2, "new_status": "Upscale Image"})
+    gas.rows[2]["Status"] = "Remove Background"
+    gas.function_failure_rates["updateRowStatus"] = 1.0
+
+    store.sync()
+
+    assert store.pending_count() == 0
+    assert store.counters["conflicts"] == 1
+    assert {job.row_id: job.status for job in store.load_jobs()}[2] == "Remove Background"
+
+
+def test_rows_finished_in_the_sheet_leave_the_store(gas, store):
+    store.sync()
+    gas.rows[4]["Status"] = "Completed"
+
+    store.sync()
+
+    assert 4 not in {job.row_id for job in store.load_jobs()}
+    assert store.stats()["active_jobs"] == 4
@@ -0,0 +1,72 @@
+import os
+import time
+import pytest
+from agents.leases import MemoryLeaseBackend, SqliteLeaseBackend, RedisLeaseBackend, LeaseKeeper, row_lease
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryLeaseBackend()
+        return
+    if request.param == "sqlite":
+        yield SqliteLeaseBackend(str(tmp_path / "leases.db"))
+        return
+    url = os.environ.get("TEST_LEASE_REDIS_URL")
+    if not url:
+        pytest.skip("TEST_LEASE_REDIS_URL not set")
+    pytest.importorskip("redis")
+    backend = RedisLeaseBackend(url, key=f"lystics-test:{tmp_path.name}")
+    yield backend
+    backend._client.delete(backend.key)
+
+
+def test_lease_is_exclusive_until_it_expires(backend):
+    assert backend.acquire(["row:2", "row:3"], "a", 0.3) == ["row:2", "row:3"]
+    assert backend.acquire(["row:2", "row:4"], "b", 10) == ["row:4"]
+    assert backend.acquire(["row:2"], "a", 0.3) == ["row:2"]
+
+    time.sleep(0.4)
+    assert backend.acquire(["row:2"], "b", 10) == ["row:2"]
+    assert backend.renew(["row:2", "row:3"], "a", 10) == []
+
+
+def test_renew_extends_only_the_holders_leases(backend):
+    backend.acquire(["row:2"], "a", 0.3)
+    backend.acquire(["row:3"], "b", 0.3)
+    assert backend.renew(["row:2", "row:3"], "a", 10) == ["row:2"]
+
+    time.sleep(0.4)
+    assert backend.acquire(["row:2", "row:3"], "c", 10) == ["row:3"]
+
+
+def test_release_leaves_a_tombstone(backend):
+    backend.acquire(["row:2"], "a", 10)
+    backend.release(["row:2"], "b")
+    assert [lease["holder"] for lease in backend.list("row:")] == ["a"]
+
+    backend.release(["row:2"], "a")
+    assert backend.list("row:") == []
+    assert backend.known(["row:2", "row:3"]) == {"row:2"}
+    assert backend.acquire(["row:2"], "b", 10) == ["row:2"]
+
+
+def test_reclaim_returns_expired_holders_once(backend):
+    backend.acquire(["row:2", "pipeline:manager"], "a", 0.2)
+    backend.acquire(["row:3"], "b", 10)
+    time.sleep(0.3)
+
+    assert [tuple(r) for r in backend.reclaim_expired("row:")] == [("row:2", "a")]
+    assert backend.reclaim_expired("row:") == []
+    assert backend.known(["row:2"]) == {"row:2"}
+    assert [lease["name"] for lease in backend.list()] == ["pipeline:manager", "row:3"]
+
+
+def test_keeper_heartbeat_keeps_leases_alive():
+    backend = MemoryLeaseBackend()
+    with LeaseKeeper(0.3, holder="a", backend=backend) as keeper:
+        keeper.acquire([row_lease(2)])
+        time.sleep(0.5)
+        assert keeper.holds(row_lease(2))
+        assert backend.acquire([row_lease(2)], "b", 10) == []
+    assert backend.acquire([row_lease(2)], "b", 10) == [row_lease(2)]
@@ -0,0 +1,88 @@
+import json
+import os
+from api.api_gateway import LogShipper, LOG_BULK_FUNCTION, LOG_FUNCTION, function_supported
+
+
+def _shipper(tmp_path, **kwargs):
+    return LogShipper(flush_interval=60, spill_dir=str(tmp_path / "spill"), **kwargs)
+
+
+def test_entries_ship_in_one_bulk_call(gas, tmp_path):
+    shipper = _shipper(tmp_path)
+    for i in range(3):
+        shipper.submit({"action": f"a{i}"})
+    assert shipper.flush()
+
+    assert [entry["action"] for entry in gas.logs] == ["a0", "a1", "a2"]
+    assert gas.call_counts[LOG_BULK_FUNCTION] == 1
+    assert shipper.stats()["shipped"] == 3
+    shipper.shutdown()
+
+
+def test_falls_back_to_single_entries_without_bulk_function(gas, tmp_path):
+    gas.remove_functions(LOG_BULK_FUNCTION)
+    shipper = _shipper(tmp_path)
+    for i in range(3):
+        shipper.submit({"action": f"a{i}"})
+    assert shipper.flush()
+
+    assert [entry["action"] for entry in gas.logs] == ["a0", "a1", "a2"]
+    assert gas.call_counts[LOG_FUNCTION] == 3
+    assert not function_supported(LOG_BULK_FUNCTION)
+    stats = shipper.stats()
+    assert (stats["shipped"], stats["spilled"], stats["dropped"]) == (3, 0, 0)
+
+    shipper.submit({"action": "a3"})
+    assert shipper.flush()
+    assert gas.call_counts[LOG_BULK_FUNCTION] == 1
+    shipper.shutdown()
+
+
+def test_failed_entries_spill_and_replay(gas, tmp_path):
+    gas.remove_functions(LOG_BULK_FUNCTION, LOG_FUNCTION)
+    shipper = _shipper(tmp_path)
+    shipper.submit({"action": "kept"})
+    assert shipper.flush()
+
+    spilled = [json.loads(line) for name in os.listdir(tmp_path / "spill")
+               for line in open(tmp_path / "spill" / name)]
+    assert spilled == [{"action": "kept"}]
+
+    gas.handlers[LOG_FUNCTION] = gas.log_agent_action
+    assert shipper.flush()
+    assert [entry["action"] for entry in gas.logs] == ["kept"]
+    assert shipper.stats()["replayed"] == 1
+    shipper.shutdown()
+
+
+def _dead_pid():
+    import subprocess
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+def test_replay_skips_truncated_lines_and_removes_the_file(gas, tmp_path):
+    spill = tmp_path / "spill"
+    spill.mkdir()
+    (spill / f"spill-{_dead_pid()}.jsonl").write_text('{"action": "a"}\n{"action": "b"}\n{"act')
+    (spill / f"spill-1.jsonl.claimed-{_dead_pid()}").write_text('{"action": "c"}\n')
+    shipper = _shipper(tmp_path)
+    assert shipper.flush()
+
+    assert sorted(entry["action"] for entry in gas.logs) == ["a", "b", "c"]
+    assert os.listdir(spill) == []
+    shipper.shutdown()
+
+
+def test_live_workers_spill_files_are_left_alone(gas, tmp_path):
+    spill = tmp_path / "spill"
+    spill.mkdir()
+    live = spill / f"spill-{os.getppid()}.jsonl"
+    live.write_text('{"action": "theirs"}\n')
+    shipper = _shipper(tmp_path)
+    assert shipper.flush()
+
+    assert gas.logs == []
+    assert live.read_text() == '{"action": "theirs"}\n'
+    shipper.shutdown()
@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import pytest
+from api.metrics import metrics, METRICS, LATENCY_BUCKETS
+
+
+def _dead_pid():
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+def _snapshot(directory, pid, runs, phase_seconds, breaker_open):
+    counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    counts[LATENCY_BUCKETS.index(1)] = 1
+    (directory / f"{pid}.json").write_text(json.dumps({
+        "pid": pid,
+        "written_at": 0,
+        "counters": [["pipeline_runs_total", {"status": "aggregated"}, runs]],
+        "histograms": [["pipeline_phase_duration_seconds", {"phase": "aggregated"}, counts, phase_seconds, 1]],
+        "gauges": [["gas_breaker_open", {"function": f"fn-{pid}"}, breaker_open]],
+    }))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "directory", str(tmp_path))
+    from app import app
+    return app.test_client()
+
+
+def test_metrics_sum_every_worker_and_keep_gauges_of_live_ones(client, tmp_path):
+    live, dead = os.getppid(), _dead_pid()
+    _snapshot(tmp_path, live, runs=3, phase_seconds=0.5, breaker_open=1)
+    _snapshot(tmp_path, dead, runs=5, phase_seconds=0.75, breaker_open=1)
+    metrics.inc("pipeline_runs_total", 2, status="aggregated")
+
+    body = client.get("/metrics").get_data(as_text=True)
+    lines = body.splitlines()
+
+    assert 'lystics_pipeline_runs_total{status="aggregated"} 10' in lines
+    assert 'lystics_pipeline_phase_duration_seconds_count{phase="aggregated"} 2' in lines
+    assert 'lystics_pipeline_phase_duration_seconds_sum{phase="aggregated"} 1.25' in lines
+    assert 'lystics_pipeline_phase_duration_seconds_bucket{phase="aggregated",le="1"} 2' in lines
+    assert f'lystics_gas_breaker_open{{function="fn-{live}",pid="{live}"}} 1' in lines
+    assert f"fn-{dead}" not in body
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+    assert set(METRICS) <= {line.split()[2][len("lystics_"):] for line in lines if line.startswith("# TYPE")}
@@ -0,0 +1,54 @@
+import base64
+import io
+import json
+import pytest
+from PIL import Image
+from services.mockup_generator import generate_mockups
+
+LAYERS = [{"name": "BASE"}, {"name": "IMAGE", "x": 20, "y": 10, "width": 40, "height": 30}, {"name": "TOP"}]
+
+
+def _png(size, color):
+    buffer = io.BytesIO()
+    Image.new("RGBA", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _request(names):
+    mockup_json = json.dumps({"mockups": {name: {"layers": LAYERS} for name in names}})
+    images = {name: {"base.png": base64.b64encode(_png((120, 80), "white")).decode("ascii"),
+                     "top.png": base64.b64encode(_png((120, 80), (0, 0, 0, 0))).decode("ascii")}
+              for name in names}
+    return mockup_json, images
+
+
+@pytest.mark.parametrize("mode", ["process", "thread"])
+def test_parallel_modes_match_serial_output(mode):
+    names = ["front", "back", "side"]
+    mockup_json, images = _request(names)
+    user_image = _png((64, 64), "red")
+
+    serial = generate_mockups("SKU-1", None, mockup_json, images, names, mode="serial", image_bytes=user_image, raw=True)
+    errors = {}
+    parallel = generate_mockups("SKU-1", None, mockup_json, images, names, errors=errors, mode=mode,
+                                image_bytes=user_image, raw=True)
+
+    assert errors == {}
+    assert list(parallel) == names
+    assert parallel == serial
+    composite = Image.open(io.BytesIO(parallel["front"])).convert("RGB")
+    assert composite.size == (120, 80)
+    assert composite.getpixel((40, 25))[0] > 200 and composite.getpixel((5, 5)) == (255, 255, 255)
+
+
+def test_process_mode_reports_per_mockup_errors():
+    names = ["front", "missing"]
+    mockup_json, images = _request(names)
+    images["missing"] = {"base.png": "template:not-registered"}
+    errors = {}
+
+    results = generate_mockups("SKU-1", None, mockup_json, images, names, errors=errors, mode="process",
+                               image_bytes=_png((64, 64), "red"), raw=True)
+
+    assert list(results) == ["front"]
+    assert "not-registered" in errors["missing"]
@@ -0,0 +1,73 @@
+import threading
+import time
+import pytest
+from agents.pipeline_runs import PipelineRun, PipelineRunner, SqliteRunStore, MemoryRunStore
+
+
+def _wait_for(predicate, timeout=5):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store_factory(request, tmp_path):
+    if request.param == "memory":
+        shared = MemoryRunStore()
+        return lambda **kwargs: shared if not kwargs else MemoryRunStore(**kwargs)
+    return lambda **kwargs: SqliteRunStore(str(tmp_path / "runs.db"), **kwargs)
+
+
+def test_runs_are_shared_between_worker_processes(store_factory):
+    release = threading.Event()
+
+    def target(run):
+        run.rows_total = 3
+        release.wait(5)
+        run.add_rows(processed=3)
+
+    # Two runners over one store stand in for two gunicorn workers.
+    first = PipelineRunner(target, store_factory(), save_interval=0.01)
+    second = PipelineRunner(target, store_factory(), save_interval=0.01)
+
+    run, coalesced = first.trigger()
+    assert not coalesced
+    joined, coalesced = second.trigger()
+    assert coalesced and joined["run_id"] == run["run_id"]
+    assert second.active["run_id"] == run["run_id"]
+    assert _wait_for(lambda: second.get(run["run_id"])["rows_total"] == 3)
+
+    release.set()
+    assert _wait_for(lambda: second.get(run["run_id"])["status"] == "completed")
+    finished = second.get(run["run_id"])
+    assert (finished["rows_processed"], finished["triggers"]) == (3, 2)
+    assert second.active is None
+    assert [r["run_id"] for r in first.list()] == [run["run_id"]]
+
+
+def test_run_whose_owner_stopped_saving_is_abandoned(store_factory):
+    store = store_factory(stale_seconds=0.05)
+    stuck = PipelineRun().to_dict()
+    store.trigger(stuck)
+    time.sleep(0.1)
+
+    assert store.get(stuck["run_id"])["status"] == "abandoned"
+    fresh, coalesced = store.trigger(PipelineRun().to_dict())
+    assert not coalesced and fresh["run_id"] != stuck["run_id"]
+
+
+def test_run_endpoints(gas):
+    from app import app
+    client = app.test_client()
+
+    accepted = client.post("/agent/runManagerPipeline")
+    assert accepted.status_code == 202
+    run_id = accepted.json["run_id"]
+
+    assert _wait_for(lambda: client.get(f"/agent/runs/{run_id}").json["status"] == "completed", timeout=30)
+    listed = client.get("/agent/runs").json
+    assert listed["runs"][0]["run_id"] == run_id
+    assert client.get("/agent/runs/unknown").status_code == 404
@@ -0,0 +1,136 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import services.price_checker as price_checker
+from services.price_checker import PriceChecker, PriceCheckError, check_url_allowed
+
+
+def _resolves_to(monkeypatch, *addresses):
+    monkeypatch.setattr(socket, "getaddrinfo", lambda host, port, **kwargs: [
+        (socket.AF_INET6 if ":" in a else socket.AF_INET, socket.SOCK_STREAM, 6, "", (a, port)) for a in addresses])
+
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.1.2.3", "192.168.0.10", "169.254.169.254",
+                                     "100.64.0.1", "0.0.0.0", "::1", "fe80::1", "::ffff:127.0.0.1", "224.0.0.1"])
+def test_rejects_hosts_resolving_to_internal_addresses(monkeypatch, address):
+    _resolves_to(monkeypatch, "93.184.216.34", address)
+    with pytest.raises(PriceCheckError, match="non-public"):
+        check_url_allowed("https://shop.example/p/1")
+
+
+@pytest.mark.parametrize("url", ["file:///etc/passwd", "gopher://shop.example/", "ftp://shop.example/x", "https:///p"])
+def test_rejects_non_http_urls(url):
+    with pytest.raises(PriceCheckError):
+        check_url_allowed(url)
+
+
+def test_allowed_hosts_include_subdomains(monkeypatch):
+    _resolves_to(monkeypatch, "93.184.216.34")
+    monkeypatch.setattr(price_checker, "PRICE_CHECK_ALLOWED_HOSTS", "shop.example, .etsy.com")
+
+    check_url_allowed("https://shop.example/p/1")
+    check_url_allowed("https://www.etsy.com/listing/1")
+    with pytest.raises(PriceCheckError, match="ALLOWED_HOSTS"):
+        check_url_allowed("https://evilshop.example/p/1")
+
+
+@pytest.fixture
+def redirecting_server():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(302)
+            self.send_header("Location", "http://169.254.169.254/computeMetadata/v1/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/p/1"
+    server.shutdown()
+    server.server_close()
+
+
+def test_redirects_are_checked_hop_by_hop(monkeypatch, redirecting_server):
+    monkeypatch.setattr(price_checker, "_public_address", lambda address: address == "127.0.0.1")
+
+    result = PriceChecker(threads=2).check(redirecting_server).result(timeout=10)
+
+    assert result["status"] == "error"
+    assert "169.254.169.254" in result["error"]
+
+
+def test_rebound_dns_is_caught_at_connect_time(monkeypatch):
+    from tools.price_fixture_server import PriceFixtureServer
+
+    server = PriceFixtureServer()
+    port = int(server.start().split(":")[2].split("/")[0])
+    real_getaddrinfo = socket.getaddrinfo
+    answers = iter(["93.184.216.34"])
+
+    def rebinding(host, port, *args, **kwargs):
+        # The first lookup (the URL check) sees a public address, later ones loopback.
+        if host != "shop.example":
+            return real_getaddrinfo(host, port, *args, **kwargs)
+        address = next(answers, "127.0.0.1")
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))]
+    monkeypatch.setattr(socket, "getaddrinfo", rebinding)
+    try:
+        result = PriceChecker(threads=2).check(f"http://shop.example:{port}/p/SKU-1").result(timeout=10)
+    finally:
+        server.stop()
+
+    assert result["status"] == "error"
+    assert "connected to a non-public address (127.0.0.1)" in result["error"]
+    assert server.request_count == 0
+
+
+def test_fetches_fixture_pages_when_private_hosts_are_allowed(monkeypatch):
+    from tools.price_fixture_server import PriceFixtureServer, fixture_price
+
+    monkeypatch.setattr(price_checker, "PRICE_CHECK_ALLOW_PRIVATE", True)
+    server = PriceFixtureServer()
+    url = server.start().format(sku="SKU-1")
+    try:
+        result = PriceChecker(threads=2).check(url).result(timeout=10)
+    finally:
+        server.stop()
+
+    price, style = fixture_price("SKU-1")
+    assert result["status"] == ("not_found" if style == "none" else "ok")
+    if style != "none":
+        assert result["price"] == price
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+@pytest.mark.parametrize("body", [[{"url": "https://shop.example/p/1"}], {"urls": "https://shop.example/p/1"},
+                                  {"urls": ["https://shop.example/p/1"], "deadline": "soon"},
+                                  {"urls": ["https://shop.example/p/1"], "deadline": -5},
+                                  {"urls": ["https://shop.example/p/1"], "deadline": [1]}])
+def test_bad_requests_get_400(client, body):
+    response = client.post("/priceCheck", json=body)
+    assert response.status_code == 400
+    assert response.json["error"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("$1,299.00", (1299.0, "USD")),
+    ("1.299,00 €", (1299.0, "EUR")),
+    ("1 299,95 EUR", (1299.95, "EUR")),
+    ("USD 12", (12.0, "USD")),
+    ("A$ 20.5", (20.5, "AUD")),
+    ("12,50", (12.5, None)),
+    ("1,299", (1299.0, None)),
+    ("no price", (None, None)),
+    (None, (None, None)),
+])
+def test_parse_price_text(text, expected):
+    assert price_checker.parse_price_text(text) == expected
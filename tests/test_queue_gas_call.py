@@ -0,0 +1,40 @@
+import json
+import pytest
+import agents.queue_gas_call as rate_limits
+from agents.queue_gas_call import MemoryBucketBackend, SqliteBucketBackend, queue_gas_call
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def buckets(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBucketBackend()
+    return SqliteBucketBackend(str(tmp_path / "buckets.db"))
+
+
+def test_burst_is_free_then_calls_are_spaced_by_the_rate(buckets):
+    assert [buckets.reserve("fn", 10, 2, 5) for _ in range(2)] == [0.0, 0.0]
+    waits = [buckets.reserve("fn", 10, 2, 5) for _ in range(3)]
+
+    assert waits == pytest.approx([0.1, 0.2, 0.3], abs=0.02)
+    assert buckets.reserve("other", 10, 2, 5) == 0.0
+
+
+def test_slot_beyond_max_wait_is_deferred_without_taking_a_token(buckets):
+    buckets.reserve("fn", 1, 1, 5)
+    assert buckets.reserve("fn", 1, 1, 0.5) is None
+    assert buckets.reserve("fn", 1, 1, 5) == pytest.approx(1.0, abs=0.02)
+
+    stats = buckets.stats(lambda key: (1, 1))["fn"]
+    assert (stats["calls"], stats["waited"], stats["deferred"]) == (3, 1, 1)
+    assert stats["queue_depth"] == 1
+
+
+def test_queue_gas_call_defers_instead_of_waiting(monkeypatch):
+    monkeypatch.setenv("GAS_RATE_LIMITS", json.dumps({"slowFn": {"rate": 0.001, "burst": 1}}))
+    monkeypatch.setattr(rate_limits, "_backend", MemoryBucketBackend())
+    calls = []
+
+    assert queue_gas_call("slowFn", lambda name: calls.append(name) or {"status": "ok"}) == {"status": "ok"}
+    assert queue_gas_call("slowFn", calls.append)["status"] == "deferred"
+    assert queue_gas_call("slowFn", lambda name: {"status": "ok"}, force=True) == {"status": "ok"}
+    assert calls == ["slowFn"]
@@ -0,0 +1,95 @@
+import base64
+import io
+import json
+import pytest
+from PIL import Image
+import services.render_pipeline as render_pipeline
+from services.upscaler import MemoryAdmission
+
+
+def _png(size, color="white"):
+    buffer = io.BytesIO()
+    Image.new("RGBA", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+def _mockup_request(client, outputs):
+    payload = {"sku": "SKU-1", "mockups": ["front"], "outputs": outputs,
+               "mockupJson": json.dumps({"mockups": {"front": {"layers": [
+                   {"name": "BASE"}, {"name": "IMAGE", "x": 10, "y": 10, "width": 50, "height": 50}]}}})}
+    return client.post("/generateMockups", content_type="multipart/form-data", data={
+        "payload": json.dumps(payload),
+        "image": (io.BytesIO(_png((64, 64), "red")), "image.png"),
+        "front/base.png": (io.BytesIO(_png((400, 300))), "base.png"),
+    })
+
+
+def test_mockup_outputs_are_rendered_within_budget(client):
+    response = _mockup_request(client, [{"name": "thumb", "width": 100, "format": "PNG"}])
+
+    assert response.status_code == 200
+    thumb = response.json["results"]["front"]["thumb"]
+    assert Image.open(io.BytesIO(base64.b64decode(thumb["image"]))).size == (100, 75)
+
+
+def test_mockup_outputs_over_the_request_budget_get_413(client, monkeypatch):
+    monkeypatch.setattr(render_pipeline, "RENDER_REQUEST_BUDGET_MB", 1)
+
+    response = _mockup_request(client, [{"name": "print", "width": 4000}])
+
+    assert response.status_code == 413
+    assert "per-request budget" in response.json["error"]
+
+
+def test_mockup_outputs_wait_for_admission(client, monkeypatch):
+    busy = MemoryAdmission(64 * 1024 * 1024)
+    busy.in_use = busy.capacity
+    monkeypatch.setattr(render_pipeline, "admission", busy)
+    monkeypatch.setattr(render_pipeline, "UPSCALE_ADMISSION_TIMEOUT", 0.05)
+
+    response = _mockup_request(client, [{"name": "thumb", "width": 100}])
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert busy.in_use == busy.capacity
+
+
+def test_render_releases_its_reservation(client, monkeypatch):
+    admission = MemoryAdmission(512 * 1024 * 1024)
+    monkeypatch.setattr(render_pipeline, "admission", admission)
+
+    response = client.post("/render", content_type="multipart/form-data", data={
+        "image": (io.BytesIO(_png((200, 100))), "image.png"),
+        "outputs": json.dumps([{"name": "small", "width": 50}, {"name": "webp", "format": "WEBP"}]),
+    })
+
+    assert response.status_code == 200
+    assert set(response.json["outputs"]) == {"small", "webp"}
+    assert admission.in_use == 0
+    assert admission.admitted == 1
+
+
+def test_plan_resamples_reuses_targets_at_least_twice_as_large():
+    plan = render_pipeline.plan_resamples((4000, 3000), [(2000, 1500), (500, 375), (4000, 3000), (900, 675), (2000, 1500)])
+
+    assert plan == [((4000, 3000), None), ((2000, 1500), None), ((900, 675), (2000, 1500)), ((500, 375), (2000, 1500))]
+
+
+def test_plan_resamples_falls_back_to_the_source():
+    assert render_pipeline.plan_resamples((1000, 1000), [(600, 600), (400, 400)]) == [((600, 600), None), ((400, 400), None)]
+    assert render_pipeline.plan_resamples((1000, 1000), [(600, 600), (300, 300)], reuse_factor=1.5) == \
+        [((600, 600), None), ((300, 300), (600, 600))]
+
+
+def test_output_size_keeps_the_aspect_ratio():
+    spec = {"width": None, "height": None, "widthInches": None, "dpi": 300}
+    assert render_pipeline.output_size((400, 300), dict(spec, width=100)) == (100, 75)
+    assert render_pipeline.output_size((400, 300), dict(spec, width=100, height=100)) == (100, 75)
+    assert render_pipeline.output_size((400, 300), dict(spec, widthInches=2)) == (600, 450)
+    assert render_pipeline.output_size((400, 300), spec) == (400, 300)
@@ -0,0 +1,144 @@
+import base64
+import io
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from PIL import Image, ImageChops, ImageStat, JpegImagePlugin
+import services.resize_json_service as resize_service
+
+
+def _jpeg(size):
+    # A gradient with some texture, so resampling differences show up.
+    img = Image.linear_gradient("L").resize(size).convert("RGB")
+    img.paste(Image.effect_noise((size[0] // 4, size[1] // 4), 40).convert("RGB"), (size[0] // 8, size[1] // 8))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def _decode(data):
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return img
+
+
+def _spy_on_draft(monkeypatch):
+    """
+    Records the decode size JPEG sources end up with after draft().
+    """
+    drafts = []
+    original_draft = JpegImagePlugin.JpegImageFile.draft
+
+    def spy_draft(self, mode, size):
+        result = original_draft(self, mode, size)
+        drafts.append(self.size)
+        return result
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", spy_draft)
+    return drafts
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+def test_draft_decoding_keeps_sizes_and_quality(monkeypatch):
+    source = _jpeg((1600, 1200))
+    drafts = _spy_on_draft(monkeypatch)
+
+    variants = resize_service.resize_variants(source, [400, 200])
+
+    assert drafts == [(400, 300)]
+    assert [(v["width"], v["height"], v["format"]) for v in variants] == [(400, 300, "JPEG"), (200, 150, "JPEG")]
+    for v in variants:
+        img = _decode(v["data"])
+        reference = _decode(source).resize(img.size, Image.Resampling.LANCZOS)
+        mean_error = sum(ImageStat.Stat(ImageChops.difference(img, reference)).mean) / 3
+        assert img.size == (v["width"], v["height"])
+        assert mean_error < 3
+
+
+def test_targets_over_half_the_source_decode_at_full_size(monkeypatch):
+    drafts = _spy_on_draft(monkeypatch)
+
+    variants = resize_service.resize_variants(_jpeg((1600, 1200)), [900, 100])
+
+    assert drafts == [(1600, 1200)]
+    assert _decode(variants[0]["data"]).size == (900, 675)
+
+
+class _BrokenPool:
+    def __init__(self, fail_on_submit):
+        self.fail_on_submit = fail_on_submit
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        if self.fail_on_submit:
+            raise BrokenProcessPool("pool is gone")
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+    def shutdown(self, wait=True):
+        self.shut_down = True
+
+
+@pytest.mark.parametrize("fail_on_submit", [True, False], ids=["submit", "result"])
+def test_batch_falls_back_to_serial_when_the_pool_breaks(client, monkeypatch, fail_on_submit):
+    pool = _BrokenPool(fail_on_submit)
+    discarded = []
+    monkeypatch.setattr(resize_service, "IMAGE_POOL_WORKERS", 2)
+    monkeypatch.setattr(resize_service, "get_process_pool", lambda: pool)
+    monkeypatch.setattr(resize_service, "discard_process_pool", discarded.append)
+
+    response = client.post("/resizeBatch", json={"widths": [100, 50], "images": [
+        {"id": "a", "image": base64.b64encode(_jpeg((400, 300))).decode("ascii")},
+        {"id": "b", "image": base64.b64encode(_jpeg((200, 100))).decode("ascii")},
+    ]})
+
+    assert response.status_code == 200
+    assert discarded == [pool]
+    assert response.json["errors"] == {}
+    sizes = {image_id: [(v["width"], v["height"]) for v in variants]
+             for image_id, variants in response.json["results"].items()}
+    assert sizes == {"a": [(100, 75), (50, 37)], "b": [(100, 50), (50, 25)]}
+
+
+@pytest.mark.parametrize("workers", [1, 2], ids=["serial", "pool"])
+def test_batch_reports_per_item_errors(client, monkeypatch, workers):
+    monkeypatch.setattr(resize_service, "IMAGE_POOL_WORKERS", workers)
+
+    response = client.post("/resizeBatch", json={"widths": [64], "images": [
+        {"id": "good", "image": base64.b64encode(_jpeg((128, 128))).decode("ascii")},
+        {"id": "bad", "image": base64.b64encode(b"not an image").decode("ascii")},
+    ]})
+
+    assert response.status_code == 200
+    assert list(response.json["results"]) == ["good"]
+    assert _decode(base64.b64decode(response.json["results"]["good"][0]["image"])).size == (64, 64)
+    assert list(response.json["errors"]) == ["bad"]
+
+
+def test_binary_batch_sends_errors_as_a_json_part(client, monkeypatch):
+    monkeypatch.setattr(resize_service, "IMAGE_POOL_WORKERS", 1)
+
+    response = client.post("/resizeBatch", headers={"Accept": "multipart/mixed"}, json={"widths": [64], "images": [
+        {"id": "good", "image": base64.b64encode(_jpeg((128, 128))).decode("ascii")},
+        {"id": "bad", "image": base64.b64encode(b"not an image").decode("ascii")},
+    ]})
+    body = response.get_data()
+
+    assert response.mimetype == "multipart/mixed"
+    assert b'name="good@64"' in body
+    assert b'name="errors"' in body and b'"bad"' in body
+
+
+def test_batch_rejects_too_many_variants(client):
+    response = client.post("/resizeBatch", json={
+        "widths": list(range(1, resize_service.MAX_BATCH_VARIANTS + 2)),
+        "images": [{"id": "a", "image": base64.b64encode(_jpeg((64, 64))).decode("ascii")}],
+    })
+
+    assert response.status_code == 500
+    assert "Too many variants" in response.json["error"]
@@ -0,0 +1,96 @@
+import io
+import os
+import pytest
+from PIL import Image
+import services.resize_json_service as resize_service
+from services.result_cache import ResultCache, make_key
+
+
+def _png(size=(120, 80)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "teal").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _files(directory):
+    return sorted(name for _, _, names in os.walk(directory) for name in names)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(directory=str(tmp_path / "results"), enabled=True)
+
+
+@pytest.fixture
+def client(cache, monkeypatch):
+    monkeypatch.setattr(resize_service, "result_cache", cache)
+    from app import app
+    return app.test_client()
+
+
+def _resize(client, headers=None):
+    return client.post("/resizeJson", content_type="image/png", data=_png(),
+                       query_string={"width": "60"}, headers=headers)
+
+
+def test_repeated_request_with_matching_etag_gets_304(client):
+    first = _resize(client)
+    assert first.status_code == 200
+    assert first.headers["X-Cache"] == "MISS"
+
+    again = _resize(client, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == first.headers["ETag"]
+    assert again.get_data() == b""
+
+    hit = _resize(client)
+    assert hit.headers["X-Cache"] == "HIT"
+    assert hit.json == first.json
+
+
+def test_binary_and_json_responses_have_different_etags(client):
+    json_response = _resize(client)
+    binary_response = _resize(client, headers={"Accept": "image/png"})
+
+    assert binary_response.mimetype == "image/png"
+    assert binary_response.headers["ETag"] != json_response.headers["ETag"]
+    assert binary_response.headers["Vary"] == json_response.headers["Vary"] == "Accept"
+
+    crossed = _resize(client, headers={"Accept": "image/png", "If-None-Match": json_response.headers["ETag"]})
+    assert crossed.status_code == 200
+    assert Image.open(io.BytesIO(crossed.get_data())).size == (60, 40)
+
+
+def test_disk_tier_survives_a_cleared_memory_tier(cache):
+    key = make_key("resize", "abc", {"width": 60})
+    cache.put(key, {"format": "PNG"}, b"encoded")
+
+    restarted = ResultCache(directory=cache.directory, enabled=True)
+    assert restarted.stats()["memory_entries"] == 0
+    assert restarted.get(key) == ({"format": "PNG"}, b"encoded")
+    assert restarted.get(key) == ({"format": "PNG"}, b"encoded")
+
+    stats = restarted.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["memory_entries"]) == (1, 1, 1)
+
+
+def test_tee_only_caches_a_completed_stream(cache):
+    key = make_key("resize", "abc", {"width": 60})
+
+    partial = cache.tee(key, {"format": "PNG"}, iter([b"one", b"two", b"three"]))
+    assert next(partial) == b"one"
+    partial.close()
+    assert cache.get(key) is None
+    assert _files(cache.directory) == []
+
+    def failing():
+        yield b"one"
+        raise IOError("encoder failed")
+    with pytest.raises(IOError):
+        list(cache.tee(key, {"format": "PNG"}, failing()))
+    assert cache.get(key) is None
+    assert _files(cache.directory) == []
+
+    assert b"".join(cache.tee(key, {"format": "PNG"}, iter([b"one", b"two"]))) == b"onetwo"
+    assert cache.get(key) == ({"format": "PNG"}, b"onetwo")
+    assert cache.stats()["stores"] == 1
@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run_app(script, **env):
+    """
+    Runs `script` in a fresh interpreter after `import app`, so module loading
+    is observed from a real cold start; the script prints one JSON line.
+    """
+    result = subprocess.run([sys.executable, "-c", "import sys, json, app\n" + script],
+                            cwd=ROOT, env=dict(os.environ, **env), capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_health_and_metrics_do_not_load_image_services():
+    loaded = _run_app(
+        "client = app.app.test_client()\n"
+        "client.get('/healthz')\n"
+        "from api.metrics import metrics\n"
+        "metrics.snapshot()\n"
+        "before = [m for m in ('PIL', 'requests', 'services.resize_json_service') if m in sys.modules]\n"
+        "client.post('/resizeJson', json={})\n"
+        "print(json.dumps({'before': before, 'after': 'services.resize_json_service' in sys.modules}))\n"
+    )
+    assert loaded == {"before": [], "after": True}
+
+
+def test_startup_report():
+    assert _run_app("print(json.dumps(app.app.test_client().get('/startupReport').json))",
+                    STARTUP_REPORT="false") == {"enabled": False}
+
+    report = _run_app("print(json.dumps(app.app.test_client().get('/startupReport').json))",
+                      STARTUP_REPORT="true")
+    assert report["enabled"] is True
+    assert report["modules"] > 0
+    assert report["app_ready_seconds"] > 0
+    assert "flask" in report["by_package"]
@@ -0,0 +1,44 @@
+import base64
+import io
+import os
+import pytest
+from PIL import Image
+import services.template_cache as template_cache
+
+
+def _png(color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGBA", (4, 3), color).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(template_cache, "TEMPLATE_REGISTRY_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.parametrize("template_id", [".", "..", ".hidden", "-x", "a/b", "", "x" * 129, "abc\n", "abc\n\n"])
+def test_rejects_unsafe_template_ids(registry, template_id):
+    with pytest.raises(ValueError):
+        template_cache.register_template(template_id, _png())
+    with pytest.raises(ValueError):
+        template_cache.load_template(template_cache.TEMPLATE_REF_PREFIX + template_id)
+
+
+def test_registered_template_resolves_by_reference(registry):
+    info = template_cache.register_template("shirt-front_v2.png", _png())
+
+    assert (info["width"], info["height"]) == (4, 3)
+    assert template_cache.load_template("template:shirt-front_v2.png").size == (4, 3)
+    assert template_cache.template_hash("template:shirt-front_v2.png") == info["hash"]
+
+
+def test_failed_write_leaves_no_temp_file(registry, monkeypatch):
+    def fail(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(template_cache.os, "replace", fail)
+
+    with pytest.raises(OSError):
+        template_cache.register_template("shirt", _png())
+    assert os.listdir(registry) == []
@@ -0,0 +1,165 @@
+import io
+import threading
+import time
+import pytest
+from PIL import Image, ImageChops
+import services.upscaler as upscaler
+from services.upscaler import MemoryAdmission, iter_bands, iter_png_tiled, estimate_upscale_bytes
+
+
+def _noise(size, mode="RGB"):
+    img = Image.effect_noise(size, 60).convert(mode)
+    if mode == "RGBA":
+        img.putalpha(Image.linear_gradient("L").resize(size))
+    return img
+
+
+def _encoded(size, format="PNG"):
+    buffer = io.BytesIO()
+    _noise(size).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+# ------------------------------- #
+#          Band Resampling        #
+# ------------------------------- #
+@pytest.mark.parametrize("out_size", [(400, 251), (300, 200), (50, 31)])
+def test_bands_match_a_single_full_resize(out_size):
+    src = _noise((97, 61))
+    full = src.resize(out_size, Image.Resampling.LANCZOS)
+
+    canvas = Image.new("RGB", out_size)
+    offsets = []
+    for y, band in iter_bands(src, out_size, band_height=37):
+        assert band.width == out_size[0]
+        canvas.paste(band, (0, y))
+        offsets.append(y)
+
+    assert offsets == list(range(0, out_size[1], 37))
+    # Float box edges may round one level differently; anything more is a seam.
+    assert max(high for _, high in ImageChops.difference(full, canvas).getextrema()) <= 1
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_png_tiled_decodes_to_the_banded_image(monkeypatch, mode):
+    monkeypatch.setattr(upscaler, "PNG_IDAT_SIZE", 1024)
+    src = _noise((80, 50), mode)
+    out_size = (240, 150)
+
+    data = b"".join(iter_png_tiled(src, out_size, 300, band_height=16))
+    expected = Image.new(mode, out_size)
+    for y, band in iter_bands(src, out_size, band_height=16):
+        expected.paste(band, (0, y))
+    decoded = Image.open(io.BytesIO(data))
+    decoded.load()
+
+    assert data.count(b"IDAT") > 1
+    assert (decoded.format, decoded.mode, decoded.size) == ("PNG", mode, out_size)
+    assert tuple(round(d) for d in decoded.info["dpi"]) == (300, 300)
+    assert ImageChops.difference(decoded, expected).getbbox() is None
+
+
+def test_only_png_is_charged_per_band():
+    size, out_size = (1000, 1000), (4000, 4000)
+
+    assert estimate_upscale_bytes(size, out_size, "PNG", tiled=True) < \
+        estimate_upscale_bytes(size, out_size, "PNG", tiled=False)
+    assert estimate_upscale_bytes(size, out_size, "JPEG", tiled=True) == \
+        estimate_upscale_bytes(size, out_size, "JPEG", tiled=False)
+
+
+# ------------------------------- #
+#         Memory Admission        #
+# ------------------------------- #
+def test_admission_queues_until_memory_is_released():
+    gate = MemoryAdmission(100)
+    assert gate.acquire(70, timeout=1) == 70
+
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(gate.acquire(50, timeout=5)))
+    waiter.start()
+    deadline = time.time() + 2
+    while gate.stats()["waiting"] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert gate.stats()["waiting"] == 1 and not admitted
+
+    gate.release(70)
+    waiter.join(timeout=5)
+
+    assert admitted == [50]
+    assert gate.stats() == {"capacity": 100, "in_use": 50, "waiting": 0, "admitted": 2, "rejected": 0}
+
+
+def test_admission_times_out_and_caps_oversized_requests():
+    gate = MemoryAdmission(100)
+    assert gate.acquire(500, timeout=1) == 100
+
+    started = time.perf_counter()
+    assert gate.acquire(1, timeout=0.05) is None
+    assert time.perf_counter() - started >= 0.05
+
+    gate.release(100)
+    assert gate.stats()["rejected"] == 1 and gate.stats()["in_use"] == 0
+
+
+# ------------------------------- #
+#            /upscaleOne          #
+# ------------------------------- #
+def _upscale(client, format, width_in, headers=None, **params):
+    return client.post("/upscaleOne", content_type="multipart/form-data", headers=headers, data=dict(
+        image=(io.BytesIO(_encoded((100, 80))), "image.png"),
+        format=format, dpi="100", widthInches=str(width_in), **params))
+
+
+def test_png_over_budget_is_tiled(client, monkeypatch):
+    monkeypatch.setattr(upscaler, "UPSCALE_REQUEST_BUDGET_MB", 4)
+
+    response = _upscale(client, "PNG", 10)
+
+    assert response.status_code == 200
+    assert response.headers["X-Upscale-Mode"] == "tiled"
+    assert response.json["dimensions"] == "1000x800"
+
+
+def test_jpeg_is_never_tiled_and_gets_413_over_budget(client, monkeypatch):
+    response = _upscale(client, "JPEG", 3, tiled="true")
+    assert response.status_code == 200
+    assert response.headers["X-Upscale-Mode"] == "full"
+
+    monkeypatch.setattr(upscaler, "UPSCALE_REQUEST_BUDGET_MB", 4)
+    response = _upscale(client, "JPEG", 10)
+    assert response.status_code == 413
+    assert "per-request budget" in response.json["error"]
+
+
+def test_busy_admission_gives_503(client, monkeypatch):
+    busy = MemoryAdmission(64 * 1024 * 1024)
+    busy.in_use = busy.capacity
+    monkeypatch.setattr(upscaler, "admission", busy)
+    monkeypatch.setattr(upscaler, "UPSCALE_ADMISSION_TIMEOUT", 0.05)
+
+    response = _upscale(client, "PNG", 2)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert busy.stats()["rejected"] == 1 and busy.in_use == busy.capacity
+
+
+def test_streamed_upscale_releases_its_reservation(client, monkeypatch):
+    gate = MemoryAdmission(256 * 1024 * 1024)
+    monkeypatch.setattr(upscaler, "admission", gate)
+
+    response = _upscale(client, "PNG", 2, headers={"Accept": "image/png"}, tiled="true")
+    assert gate.stats()["in_use"] > 0
+    decoded = Image.open(io.BytesIO(response.get_data()))
+    response.close()
+
+    assert response.headers["X-Upscale-Mode"] == "tiled"
+    assert decoded.size == (200, 160)
+    assert gate.stats()["in_use"] == 0 and gate.stats()["admitted"] == 1
@@ -0,0 +1,263 @@
+"""
+Local stand-in for the Google Apps Script web app.
+
+Speaks the same POST contract as GAS_BASE_URL ({"function": ..., **params} in,
+{"success": ..., "result" | "error": ...} out) against an in-memory sheet, so the
+gateway and agents can be exercised without touching the live deployment:
+
+    python -m tools.gas_standin --port 8765 --rows 20
+    GAS_BASE_URL=http://127.0.0.1:8765/exec python app.py
+
+Latency and failures can be injected to mimic Apps Script under load:
+`latency`/`jitter` delay every HTTP request, `function_latency` adds per-function
+execution time (batched operations included), `failure_rate` makes functions
+answer {"success": false} and `http_error_rate` answers whole requests with
+`http_error_status` (503 by default).
+
+The bulk functions (runBatch, logAgentActions, getProgressErrorCounts,
+updateRowAssignmentsBulk) are optional in the live script; remove_functions()
+(or --without) mimics a deployment that lacks them.
+"""
+import argparse
+import collections
+import datetime
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agents.task_map import fn_map
+
+
+class GasStandIn:
+    """
+    In-memory sheet plus the Apps Script functions the agents call.
+    """
+    def __init__(self, rows=None, latency=0.0, jitter=0.0, function_latency=None,
+                 failure_rate=0.0, function_failure_rates=None, http_error_rate=0.0, http_error_status=503,
+                 seed=None):
+        self.rows = {}
+        self.error_counts = collections.Counter()
+        self.logs = []
+        self.call_counts = collections.Counter()
+        self.failure_counts = collections.Counter()
+        self.request_count = 0
+        self.http_errors = 0
+        self.latency = latency
+        self.jitter = jitter
+        self.function_latency = dict(function_latency or {})
+        self.failure_rate = failure_rate
+        self.function_failure_rates = dict(function_failure_rates or {})
+        self.http_error_rate = http_error_rate
+        self.http_error_status = http_error_status
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._server = None
+
+        self.handlers = {
+            "runBatch":                 self.run_batch,
+            "getRowsNeedingProcessing": self.get_rows_needing_processing,
+            "updateRowStatus":          self.update_row_status,
+            "updateRowAssignments":     self.update_row_assignments,
+            "updateRowAssignmentsBulk": self.update_row_assignments_bulk,
+            "logAgentAction":           self.log_agent_action,
+            "logAgentActions":          self.log_agent_actions,
+            "incrementProgressErrorCount": self.increment_progress_error_count,
+            "getProgressErrorCount":    self.get_progress_error_count,
+            "getProgressErrorCounts":   self.get_progress_error_counts,
+        }
+        for task_function_name in fn_map.values():
+            self.handlers.setdefault(task_function_name, self.run_task)
+        for row in rows or []:
+            self.rows[row["Row"]] = dict(row)
+
+    def remove_functions(self, *names):
+        """
+        Answers calls to the given functions with "Unknown function", like a
+        deployment that does not have them.
+        """
+        for name in names:
+            self.handlers.pop(name, None)
+        return self
+
+    # ---------- dispatch ---------- #
+    def dispatch(self, payload):
+        payload = dict(payload)
+        function_name = payload.pop("function", None)
+        with self._lock:
+            self.call_counts[function_name] += 1
+
+        handler = self.handlers.get(function_name)
+        if handler is None:
+            return {"success": False, "error": f"Unknown function: {function_name}"}
+
+        delay = self.function_latency.get(function_name, 0)
+        if delay:
+            time.sleep(delay)
+        # runBatch itself never fails; its operations roll their own dice.
+        if function_name != "runBatch" and \
+                self._chance(self.function_failure_rates.get(function_name, self.failure_rate)):
+            with self._lock:
+                self.failure_counts[function_name] += 1
+            return {"success": False, "error": f"Injected failure in {function_name}"}
+        try:
+            return {"success": True, "result": handler(payload)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def _chance(self, rate):
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def run_batch(self, params):
+        results = []
+        for op in params.get("operations", []):
+            results.append(self.dispatch(dict(op.get("params") or {}, function=op.get("function"))))
+        return {"results": results}
+
+    # ---------- sheet functions ---------- #
+    def _row(self, row_id):
+        if row_id not in self.rows:
+            raise KeyError(f"Row {row_id} not found")
+        return self.rows[row_id]
+
+    def get_rows_needing_processing(self, params):
+        with self._lock:
+            rows = [dict(r) for r in self.rows.values() if r.get("Status") not in ("Completed", "Supervisor")]
+        return {"rows": rows}
+
+    def update_row_status(self, params):
+        with self._lock:
+            row = self._row(params["row"])
+            row["Status"] = params["new_status"]
+            row["Last Attempted"] = datetime.datetime.utcnow().isoformat()
+        return {"row": params["row"], "status": params["new_status"]}
+
+    def update_row_assignments(self, params):
+        with self._lock:
+            row = self._row(params["row"])
+            row["Assigned Worker"] = params["assigned_worker"]
+            row["Job ID"] = params["job_id"]
+        return {"row": params["row"]}
+
+    def update_row_assignments_bulk(self, params):
+        with self._lock:
+            for assignment in params.get("assignments", []):
+                self.update_row_assignments(assignment)
+        return {"updated": len(params.get("assignments", []))}
+
+    def log_agent_action(self, params):
+        with self._lock:
+            self.logs.append(params)
+        return {"logged": 1}
+
+    def log_agent_actions(self, params):
+        entries = params.get("entries", [])
+        with self._lock:
+            self.logs.extend(entries)
+        return {"logged": len(entries)}
+
+    def increment_progress_error_count(self, params):
+        with self._lock:
+            self.error_counts[params["row"]] += 1
+            return {"count": self.error_counts[params["row"]]}
+
+    def get_progress_error_count(self, params):
+        with self._lock:
+            return {"count": self.error_counts[params["row"]]}
+
+    def get_progress_error_counts(self, params):
+        with self._lock:
+            return {"counts": {str(row): self.error_counts[row] for row in params.get("rows", [])}}
+
+    def run_task(self, params):
+        with self._lock:
+            self._row(params["row"])
+        return {"status": "ok", "row": params["row"]}
+
+    # ---------- HTTP server ---------- #
+    def start(self, host="127.0.0.1", port=0):
+        """
+        Serves the stand-in on a background thread and returns its URL.
+        """
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                status = 200
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                    status, body = standin.handle_request(payload)
+                except ValueError as e:
+                    body = {"success": False, "error": f"Invalid JSON: {e}"}
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}/exec"
+
+    def handle_request(self, payload):
+        """
+        Returns (http_status, body) for one POST, after the injected request latency.
+        """
+        with self._lock:
+            self.request_count += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if self._chance(self.http_error_rate):
+            with self._lock:
+                self.http_errors += 1
+            return self.http_error_status, {"success": False, "error": f"Injected HTTP {self.http_error_status}"}
+        return 200, self.dispatch(payload)
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def synthetic_rows(count, workflow_type="POD Shirt", status="Download Image"):
+    return [
+        {"Row": i, "Title": f"SKU-{i:05d}", "Status": status, "Workflow Type": workflow_type,
+         "Assigned Worker": "", "Last Attempted": ""}
+        for i in range(2, count + 2)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local Google Apps Script stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rows", type=int, default=10, help="Number of synthetic sheet rows")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay of up to this many seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of function calls that fail")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--without", default="", help="Comma-separated functions to leave out, e.g. runBatch")
+    args = parser.parse_args()
+
+    standin = GasStandIn(synthetic_rows(args.rows), latency=args.latency, jitter=args.jitter,
+                         failure_rate=args.failure_rate, http_error_rate=args.http_error_rate, seed=args.seed)
+    standin.remove_functions(*[name.strip() for name in args.without.split(",") if name.strip()])
+    url = standin.start(args.host, args.port)
+    print(f"🧪 GAS stand-in serving {args.rows} rows at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        standin.stop()
@@ -0,0 +1,172 @@
+"""
+Local image origin for exercising the image fetcher.
+
+Serves GET /img/<name> as a small PNG derived from the name, with an ETag and
+Last-Modified header, and answers conditional requests with 304 while the image
+is unchanged, so the download cache and its revalidation can be run end to end:
+
+    python -m tools.image_fixture_server --port 8767 --latency 0.05
+
+`?kb=N` pads the body to about N KB and `?chunked=1` sends it without a
+Content-Length, for the size limit. It records request counts, 304s and the
+peak number of concurrent requests, which shows whether concurrent fetches of
+one URL were collapsed into a single download.
+"""
+import argparse
+import hashlib
+import struct
+import threading
+import time
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+def _png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+
+def fixture_png(name, version=0, size=(16, 16)):
+    """
+    A solid-colour PNG whose colour is derived from the name and version.
+    """
+    color = hashlib.sha256(f"{name}:{version}".encode("utf-8")).digest()[:3]
+    rows = b"".join(b"\x00" + color * size[0] for _ in range(size[1]))
+    return (b"\x89PNG\r\n\x1a\n"
+            + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", size[0], size[1], 8, 2, 0, 0, 0))
+            + _png_chunk(b"IDAT", zlib.compress(rows))
+            + _png_chunk(b"IEND", b""))
+
+
+class ImageFixtureServer:
+    def __init__(self, latency=0.0, etags=True, last_modified=True):
+        self.latency = latency
+        self.etags = etags
+        self.last_modified = last_modified
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.active = 0
+        self.peak_active = 0
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self, host="127.0.0.1", port=0):
+        """
+        Serves images on a background thread and returns the base URL.
+        """
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, headers, body, chunked = fixture.handle(self.path, self.headers)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if chunked:
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for i in range(0, len(body), 4096):
+                        piece = body[i:i + 4096]
+                        self.wfile.write(f"{len(piece):x}\r\n".encode("ascii") + piece + b"\r\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def update(self, name):
+        """
+        Changes the image served under name, as if it were re-uploaded.
+        """
+        with self._lock:
+            version, _ = self._versions.get(name, (0, None))
+            # Last-Modified has one-second resolution; move it past the old value.
+            self._versions[name] = (version + 1, time.time() + 1)
+
+    def _version(self, name):
+        with self._lock:
+            return self._versions.setdefault(name, (0, time.time()))
+
+    def handle(self, path, request_headers):
+        with self._lock:
+            self.request_count += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            url = urlsplit(path)
+            if not url.path.startswith("/img/"):
+                return 404, {"Content-Type": "text/plain"}, b"Not found", False
+            name = url.path[len("/img/"):]
+            query = parse_qs(url.query)
+            version, modified_at = self._version(name)
+
+            headers = {"Content-Type": "image/png"}
+            etag = f'"{hashlib.sha256(f"{name}:{version}".encode("utf-8")).hexdigest()[:16]}"'
+            if self.etags:
+                headers["ETag"] = etag
+            if self.last_modified:
+                headers["Last-Modified"] = formatdate(int(modified_at), usegmt=True)
+
+            if self._unchanged(request_headers, etag, int(modified_at)):
+                with self._lock:
+                    self.not_modified_count += 1
+                return 304, headers, b"", False
+
+            body = fixture_png(name, version)
+            kb = int(query.get("kb", ["0"])[0])
+            if kb:
+                body += b"\x00" * max(0, kb * 1024 - len(body))
+            return 200, headers, body, query.get("chunked", ["0"])[0] == "1"
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _unchanged(self, request_headers, etag, modified_at):
+        if_none_match = request_headers.get("If-None-Match")
+        if self.etags and if_none_match:
+            return etag in [tag.strip() for tag in if_none_match.split(",")]
+        if_modified_since = request_headers.get("If-Modified-Since")
+        if self.last_modified and if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= modified_at
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve synthetic images with cache validators for the image fetcher.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--no-etag", action="store_true", help="Only send Last-Modified")
+    parser.add_argument("--no-last-modified", action="store_true", help="Only send ETag")
+    args = parser.parse_args()
+
+    fixture = ImageFixtureServer(args.latency, etags=not args.no_etag, last_modified=not args.no_last_modified)
+    url = fixture.start(args.host, args.port)
+    print(f"🧪 Image fixture serving {url}/img/<name>")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fixture.stop()
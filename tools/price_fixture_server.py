@@ -0,0 +1,134 @@
+"""
+Local product-page server for exercising the price checker.
+
+Serves GET /p/<sku> as a product page whose price is derived from the SKU, in
+one of several markup styles (JSON-LD, price meta tags, itemprop, a price class,
+or no price at all), so the parser and the fetch path can be run end to end:
+
+    python -m tools.price_fixture_server --port 8766 --latency 0.05
+    PRICE_CHECK_ALLOW_PRIVATE=true PRICE_CHECK_SKU_URL=http://127.0.0.1:8766/p/{sku} python app.py
+
+It records request counts and the peak number of concurrent requests, which
+shows whether the checker's per-host limit holds.
+"""
+import argparse
+import hashlib
+import html
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STYLES = ["json-ld", "meta", "itemprop", "class", "none"]
+
+
+def fixture_price(sku):
+    digest = int(hashlib.sha256(sku.encode("utf-8")).hexdigest(), 16)
+    return round(5 + (digest % 199500) / 100, 2), STYLES[digest % len(STYLES)]
+
+
+def product_page(sku, price, style, padding_kb=0):
+    title = f"Listing {html.escape(sku)}"
+    head, body = "", f"<h1>{title}</h1>"
+    if style == "json-ld":
+        data = {"@context": "https://schema.org", "@type": "Product", "name": title,
+                "offers": {"@type": "Offer", "price": f"{price:.2f}", "priceCurrency": "USD"}}
+        head = f'<script type="application/ld+json">{json.dumps(data)}</script>'
+    elif style == "meta":
+        head = (f'<meta property="product:price:amount" content="{price:.2f}">'
+                '<meta property="product:price:currency" content="USD">')
+    elif style == "itemprop":
+        body += f'<div itemscope><span itemprop="price">${price:,.2f}</span></div>'
+    elif style == "class":
+        body += f'<p class="wt-text price">USD {price:,.2f}+</p>'
+    filler = "<p>" + "lorem ipsum " * 80 + "</p>"
+    body += filler * (padding_kb * 1024 // len(filler))
+    return f"<!DOCTYPE html><html><head><title>{title}</title>{head}</head><body>{body}</body></html>"
+
+
+class PriceFixtureServer:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, padding_kb=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.padding_kb = padding_kb
+        self.request_count = 0
+        self.active = 0
+        self.peak_active = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self, host="127.0.0.1", port=0):
+        """
+        Serves pages on a background thread and returns the SKU URL template.
+        """
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body = fixture.handle(self.path)
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}/p/{{sku}}"
+
+    def handle(self, path):
+        with self._lock:
+            self.request_count += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            fail = self.error_rate and self._random.random() < self.error_rate
+        try:
+            if delay:
+                time.sleep(delay)
+            if not path.startswith("/p/"):
+                return 404, "<html><body>Not found</body></html>"
+            if fail:
+                return 503, "<html><body>Injected error</body></html>"
+            sku = path[len("/p/"):]
+            price, style = fixture_price(sku)
+            return 200, product_page(sku, price, style, self.padding_kb)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve synthetic product pages for the price checker.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503")
+    parser.add_argument("--padding-kb", type=int, default=0, help="Filler added to each page")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    fixture = PriceFixtureServer(args.latency, args.jitter, args.error_rate, args.padding_kb, args.seed)
+    url = fixture.start(args.host, args.port)
+    print(f"🧪 Price fixture serving {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fixture.stop()